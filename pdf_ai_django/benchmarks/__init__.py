@@ -0,0 +1,6 @@
+"""
+Benchmark scripts for the PDF AI pipeline
+
+Run from the pdf_ai_django directory, e.g.:
+    python -m benchmarks.bench_extraction
+"""
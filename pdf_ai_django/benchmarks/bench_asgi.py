@@ -0,0 +1,186 @@
+"""
+Load test: concurrent questions through the WSGI and the ASGI entry point
+
+Starts a fake Ollama (slow generations, no model needed) and serves the project twice:
+    wsgi - pdf_ai_project.wsgi on a server with a fixed thread pool (like gunicorn's gthread workers)
+    asgi - pdf_ai_project.asgi on uvicorn (one event loop)
+then fires --concurrency simultaneous POST /ask/ requests at each and reports
+throughput, p50/p99 latency, errors and the peak thread count of the server process.
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.bench_asgi --concurrency 50 200 --generation-delay 2 --wsgi-threads 8
+
+Every answered question is saved as a Question row, so point DJANGO_SETTINGS_MODULE at a
+settings module with a scratch database. Questions are unique so the answer cache never hits.
+OLLAMA_MAX_CONCURRENT is raised to --ollama-slots for both servers (the fake server has no limit).
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_ollama import start_in_thread
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# WSGI server whose request threads come from a fixed pool, like a gthread worker
+WSGI_SERVER_CODE = r'''
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    pool = ThreadPoolExecutor(max_workers=int(sys.argv[2]))
+    request_queue_size = 1024
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+from pdf_ai_project.wsgi import application
+make_server("127.0.0.1", int(sys.argv[1]), application, PooledWSGIServer, QuietHandler).serve_forever()
+'''
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int, ollama_url: str, args) -> subprocess.Popen:
+    env = dict(os.environ, OLLAMA_URL=ollama_url, OLLAMA_MAX_CONCURRENT=str(args.ollama_slots),
+               OLLAMA_QUEUE_TIMEOUT=str(args.timeout))
+    env.setdefault("DJANGO_SETTINGS_MODULE", "pdf_ai_project.settings")
+    if mode == "wsgi":
+        command = [sys.executable, "-c", WSGI_SERVER_CODE, str(port), str(args.wsgi_threads)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "pdf_ai_project.asgi:application",
+                   "--port", str(port), "--no-access-log", "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+
+
+def thread_count(pid: int) -> int:
+    """Threads of a process (Linux /proc; 0 elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 120) -> str:
+    """Wait for the server to answer; returns the CSRF token set by the home page"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get("/")
+            return response.cookies.get("csrftoken") or client.cookies.get("csrftoken")
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not start")
+            await asyncio.sleep(0.5)
+
+
+async def ask(client: httpx.AsyncClient, csrf_token: str, question: str) -> tuple:
+    """One question; returns (seconds, ok)"""
+    start = time.perf_counter()
+    try:
+        response = await client.post("/ask/", data={'question': question, 'top_k': 3},
+                                     headers={'X-Requested-With': 'XMLHttpRequest', 'X-CSRFToken': csrf_token})
+        ok = response.status_code == 200 and response.json().get('success', False)
+        ok = ok and not response.json()['answer'].startswith("Error getting response")
+    except httpx.HTTPError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+async def load_test(mode: str, port: int, pid: int, concurrency: int, run: int, args) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                 timeout=args.timeout) as client:
+        csrf_token = await wait_ready(client)
+        # Load the models (first request) before measuring
+        await ask(client, csrf_token, f"warm up {mode} {run}")
+
+        peak_threads = 0
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while True:
+                peak_threads = max(peak_threads, thread_count(pid))
+                await asyncio.sleep(0.05)
+
+        sampler = asyncio.create_task(sample_threads())
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            ask(client, csrf_token, f"{mode} run {run} question {i}: what does the document say?")
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+    latencies = [seconds * 1000 for seconds, ok in results if ok]
+    return {
+        'ok': len(latencies),
+        'errors': concurrency - len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50': float(np.percentile(latencies, 50)) if latencies else float('nan'),
+        'p99': float(np.percentile(latencies, 99)) if latencies else float('nan'),
+        'threads': peak_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+    parser.add_argument('--generation-delay', type=float, default=2.0,
+                        help='Seconds the fake Ollama takes per answer')
+    parser.add_argument('--wsgi-threads', type=int, default=8, help='Request threads of the WSGI server')
+    parser.add_argument('--ollama-slots', type=int, default=1000,
+                        help='OLLAMA_MAX_CONCURRENT of the servers under test')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout (seconds)')
+    parser.add_argument('--verbose', action='store_true', help='Show server logs')
+    args = parser.parse_args()
+
+    server, ollama_url = start_in_thread(first_token_delay=args.generation_delay)
+    print(f"Fake Ollama at {ollama_url}, {args.generation_delay:.1f}s per answer, "
+          f"WSGI threads={args.wsgi_threads}")
+    print(f"{'mode':>5} {'concurrent':>10} {'ok':>5} {'errors':>6} {'req/s':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'threads':>7}")
+
+    for mode in args.modes:
+        port = free_port()
+        process = start_server(mode, port, ollama_url, args)
+        try:
+            for run, concurrency in enumerate(args.concurrency):
+                result = asyncio.run(load_test(mode, port, process.pid, concurrency, run, args))
+                print(f"{mode:>5} {concurrency:>10} {result['ok']:>5} {result['errors']:>6} "
+                      f"{result['throughput']:>7.1f} {result['p50']:>8.0f} {result['p99']:>8.0f} "
+                      f"{result['threads']:>7}")
+        finally:
+            process.terminate()
+            process.wait()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
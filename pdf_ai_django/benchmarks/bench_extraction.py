@@ -0,0 +1,54 @@
+"""
+Serial vs page-parallel PDF text extraction (pages/sec)
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.bench_extraction --pages 200 400 --workers 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pdf_loader import PDFLoader
+from benchmarks.synthetic import write_pdf
+
+
+def time_extraction(pdf_path: str, method: str, workers: int) -> tuple:
+    """Return (seconds, pages, characters) for one full extraction"""
+    loader = PDFLoader(pdf_path, workers=workers)
+    start = time.perf_counter()
+    text = loader.extract_text(method=method)
+    return time.perf_counter() - start, loader.num_pages, len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[200, 500], help='Page counts to generate')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, os.cpu_count() or 4],
+                        help='Worker counts for the parallel runs')
+    parser.add_argument('--method', default='pdfplumber', choices=['pdfplumber', 'pypdf2'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"method={args.method} cpus={os.cpu_count()}")
+        print(f"{'pages':>6} {'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+
+        for num_pages in args.pages:
+            pdf_path = write_pdf(os.path.join(tmp, f"bench_{num_pages}.pdf"), num_pages, seed=num_pages)
+
+            serial_time, pages, serial_chars = time_extraction(pdf_path, args.method, workers=1)
+            print(f"{pages:>6} {1:>8} {serial_time:>9.2f} {pages / serial_time:>9.1f} {1.0:>8.2f}")
+
+            for workers in args.workers:
+                elapsed, pages, chars = time_extraction(pdf_path, args.method, workers=workers)
+                assert chars == serial_chars, "parallel extraction must return the same text"
+                print(f"{pages:>6} {workers:>8} {elapsed:>9.2f} {pages / elapsed:>9.1f} "
+                      f"{serial_time / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
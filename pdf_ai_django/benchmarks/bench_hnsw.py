@@ -0,0 +1,163 @@
+"""
+Chroma HNSW parameters: recall@k against exact search and query latency over a parameter grid
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.bench_hnsw --size 100000 --M 8 16 32 --construction-ef 100 200 --search-ef 10 50 100
+    python -m benchmarks.bench_hnsw --corpus embeddings.npy           # recorded embeddings (N x dim float32)
+    python -m benchmarks.bench_hnsw --from-index chroma_db            # the embeddings of an existing index
+
+Every grid point builds its own collection (Chroma fixes search_ef when a collection is
+created), so large corpora and grids take a while.
+The report lists recall@k, p50/p99 query latency, build time and index size per setting, and
+recommends the fastest setting (lowest p99) that reaches --target-recall, as settings to copy.
+Queries are perturbed corpus vectors, like questions about indexed passages.
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_store import VectorStore
+from benchmarks.synthetic import embedding_corpus, nearby_queries
+
+INSERT_BATCH = 5000
+
+SETTING_NAMES = {'M': 'VECTOR_HNSW_M', 'construction_ef': 'VECTOR_HNSW_CONSTRUCTION_EF',
+                 'search_ef': 'VECTOR_HNSW_SEARCH_EF'}
+
+
+def load_corpus(args) -> tuple:
+    """Return (vectors, description) for the chosen corpus"""
+    if args.corpus:
+        return np.load(args.corpus).astype(np.float32), f"recorded corpus {args.corpus}"
+    if args.from_index:
+        store = VectorStore(persist_directory=args.from_index, backend=args.from_backend)
+        stored = store.get_documents(include_embeddings=True)
+        return np.asarray(stored['embeddings'], dtype=np.float32), f"index {args.from_index} ({store.active_name})"
+    vectors = embedding_corpus(args.size, args.dimension, args.clusters)
+    return vectors, f"synthetic corpus (clustered={args.clusters})"
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> list:
+    """Brute-force cosine top-k ids, the recall reference"""
+    normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    results = []
+    for query in queries:
+        scores = normalized @ (query / max(np.linalg.norm(query), 1e-12))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        results.append([f"chunk_{i}" for i in best[np.argsort(-scores[best])]])
+    return results
+
+
+def build(directory: str, vectors: np.ndarray, hnsw: dict) -> tuple:
+    """Fill a Chroma collection; returns (store, build seconds)"""
+    store = VectorStore(persist_directory=directory, backend="chroma", hnsw=hnsw)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), INSERT_BATCH):
+        batch = vectors[offset:offset + INSERT_BATCH]
+        store.collection.add(ids=[f"chunk_{i}" for i in range(offset, offset + len(batch))],
+                             embeddings=batch.tolist(), metadatas=[{'source': "doc.pdf"}] * len(batch))
+    return store, time.perf_counter() - start
+
+
+def time_queries(store: VectorStore, queries: np.ndarray, top_k: int) -> tuple:
+    """Return (p50 ms, p99 ms, result ids per query)"""
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = store.collection.query(query_embeddings=[query.tolist()], n_results=top_k, include=['distances'])
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(result['ids'][0])
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99)), results
+
+
+def recall(results: list, exact: list) -> float:
+    """Mean overlap between approximate and exact top-k ids"""
+    return float(np.mean([len(set(r) & set(e)) / max(len(e), 1) for r, e in zip(results, exact)]))
+
+
+def directory_bytes(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def write_report(path: str, header: list, rows: list, best: dict, target_recall: float, top_k: int) -> None:
+    lines = ["# HNSW parameter benchmark", ""] + [f"- {line}" for line in header] + [""]
+    lines += [f"| M | construction_ef | search_ef | recall@{top_k} | p50 ms | p99 ms | build s | index MB |",
+              "|---:|---:|---:|---:|---:|---:|---:|---:|"]
+    for row in rows:
+        lines.append(f"| {row['M']} | {row['construction_ef']} | {row['search_ef']} | {row['recall']:.3f} "
+                     f"| {row['p50']:.2f} | {row['p99']:.2f} | {row['build']:.1f} | {row['size'] / 1e6:.1f} |")
+    lines.append("")
+    if best:
+        lines += [f"Fastest setting with recall@{top_k} >= {target_recall}: "
+                  f"M={best['M']}, construction_ef={best['construction_ef']}, search_ef={best['search_ef']}",
+                  "", "```"] + [f"{setting}={best[name]}" for name, setting in SETTING_NAMES.items()] + ["```"]
+    else:
+        lines.append(f"No setting reached recall@{top_k} >= {target_recall}; extend the grid.")
+    with open(path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='.npy file of recorded embeddings (default: synthetic vectors)')
+    parser.add_argument('--from-index', metavar='PERSIST_DIR', help='Use the embeddings of an existing index')
+    parser.add_argument('--from-backend', default='chroma', choices=VectorStore.BACKENDS,
+                        help='Backend of the --from-index store')
+    parser.add_argument('--size', type=int, default=100_000, help='Synthetic corpus size')
+    parser.add_argument('--dimension', type=int, default=384, help='Synthetic vector dimension')
+    parser.add_argument('--no-clusters', dest='clusters', action='store_false',
+                        help='Plain Gaussian vectors instead of clustered ones')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--M', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--construction-ef', type=int, nargs='+', default=[100, 200])
+    parser.add_argument('--search-ef', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--target-recall', type=float, default=0.95)
+    parser.add_argument('--report', default='hnsw_report.md', help='Markdown report path')
+    args = parser.parse_args()
+
+    vectors, description = load_corpus(args)
+    queries = nearby_queries(vectors, args.queries)
+    exact = exact_top_k(vectors, queries, args.top_k)
+    header = [description, f"{len(vectors)} vectors of dimension {vectors.shape[1]}",
+              f"{args.queries} queries, top_k={args.top_k}"]
+    print("\n".join(header))
+    print(f"{'M':>4} {'constr_ef':>9} {'search_ef':>9} {f'recall@{args.top_k}':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'index MB':>9}")
+
+    rows = []
+    for M, construction_ef, search_ef in itertools.product(args.M, args.construction_ef, args.search_ef):
+        hnsw = {'M': M, 'construction_ef': construction_ef, 'search_ef': search_ef}
+        with tempfile.TemporaryDirectory() as tmp:
+            store, build_time = build(tmp, vectors, hnsw)
+            p50, p99, results = time_queries(store, queries, args.top_k)
+            row = dict(hnsw, recall=recall(results, exact), p50=p50, p99=p99, build=build_time,
+                       size=directory_bytes(tmp))
+            rows.append(row)
+            print(f"{M:>4} {construction_ef:>9} {search_ef:>9} {row['recall']:>9.3f} "
+                  f"{p50:>8.2f} {p99:>8.2f} {build_time:>8.1f} {row['size'] / 1e6:>9.1f}")
+            del store
+
+    candidates = [row for row in rows if row['recall'] >= args.target_recall]
+    best = min(candidates, key=lambda row: (row['p99'], row['build'])) if candidates else None
+    write_report(args.report, header, rows, best, args.target_recall, args.top_k)
+    print(f"\nReport written to {args.report}")
+    if best:
+        print("Settings for the fastest setting that reaches the target recall:")
+        for name, setting in SETTING_NAMES.items():
+            print(f"  {setting}={best[name]}")
+    else:
+        print(f"No setting reached recall@{args.top_k} >= {args.target_recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Bulk ingestion throughput of VectorStore.add_documents (chunks/sec, peak RSS)
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.bench_ingest --chunks 100000 --batch-sizes 250 1000 5000 --backend chroma
+"""
+import argparse
+import random
+import sys
+import tempfile
+import resource
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_store import VectorStore
+from benchmarks.synthetic import random_sentence
+
+
+def make_chunks(count: int, dimension: int, seed: int = 0) -> list:
+    """Synthetic chunks shaped like process_pdf output"""
+    embeddings = np.random.default_rng(seed).standard_normal((count, dimension), dtype=np.float32)
+    rng = random.Random(seed)
+    return [
+        {'text': random_sentence(rng), 'embedding': embeddings[i], 'chunk_id': i}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=100_000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[250, 1000, 5000])
+    parser.add_argument('--backend', default='chroma', choices=VectorStore.BACKENDS)
+    parser.add_argument('--dimension', type=int, default=384)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.dimension)
+
+    print(f"backend={args.backend} chunks={args.chunks} dimension={args.dimension}")
+    print(f"{'batch':>6} {'seconds':>8} {'chunks/s':>9} {'peak RSS MB':>12} {'re-run s':>9}")
+
+    for batch_size in args.batch_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VectorStore(persist_directory=tmp, backend=args.backend)
+
+            result = store.add_documents(chunks, "bench.pdf", content_hash="bench", batch_size=batch_size)
+            # Process high-water mark so far (kilobytes on Linux)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+            # Same IDs again: upserts overwrite, nothing is duplicated
+            rerun = store.add_documents(chunks, "bench.pdf", content_hash="bench", batch_size=batch_size)
+            assert store.collection.count() == args.chunks
+
+            print(f"{batch_size:>6} {result['seconds']:>8.1f} {result['chunks_per_sec']:>9.0f} "
+                  f"{peak:>12.0f} {rerun['seconds']:>9.1f}")
+            del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Vector quantization of the NumPy backend: memory and recall@k against the float32 baseline
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.bench_quantization --sizes 100000 1000000 --top-k 5 10
+
+"scan MB" is what a full search reads (what has to stay in RAM for fast queries);
+"disk MB" includes the float32 vectors PQ keeps on disk for rescoring.
+Vectors are drawn around random topic centers, like document embeddings
+(--no-clusters uses plain Gaussian vectors, the hardest case for PQ).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_backends import NumpyCollection
+from benchmarks.synthetic import embedding_corpus, nearby_queries
+
+INSERT_BATCH = 5000
+
+
+def build(directory: str, quantization: str, vectors: np.ndarray) -> tuple:
+    """Fill a collection; returns (collection, insert seconds)"""
+    collection = NumpyCollection(directory, quantization=quantization)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), INSERT_BATCH):
+        batch = vectors[offset:offset + INSERT_BATCH]
+        collection.add(ids=[f"chunk_{i}" for i in range(offset, offset + len(batch))], embeddings=batch,
+                       documents=[""] * len(batch), metadatas=[{'source': "doc.pdf"}] * len(batch))
+    return collection, time.perf_counter() - start
+
+
+def disk_bytes(directory: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory)
+               if entry.is_file() and not entry.name.startswith("index.sqlite3"))
+
+
+def run_queries(collection: NumpyCollection, queries: np.ndarray, top_k: int) -> tuple:
+    """Return (p50 ms, result ids per query)"""
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=top_k, include=['distances'])
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(result['ids'][0])
+    return float(np.percentile(latencies, 50)), results
+
+
+def recall(results: list, exact: list) -> float:
+    """Mean overlap between quantized and float32 top-k ids"""
+    return float(np.mean([len(set(r) & set(e)) / max(len(e), 1) for r, e in zip(results, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, nargs='+', default=[5, 10])
+    parser.add_argument('--quantizations', nargs='+', default=list(NumpyCollection.QUANTIZATIONS),
+                        choices=NumpyCollection.QUANTIZATIONS)
+    parser.add_argument('--no-clusters', dest='clusters', action='store_false',
+                        help='Plain Gaussian vectors instead of clustered ones')
+    args = parser.parse_args()
+
+    max_k = max(args.top_k)
+    print(f"dimension={args.dimension} queries={args.queries} clustered={args.clusters}")
+    recall_columns = " ".join(f"{f'recall@{k}':>9}" for k in args.top_k)
+    print(f"{'chunks':>9} {'storage':>8} {'insert s':>9} {'scan MB':>8} {'disk MB':>8} {'p50 ms':>7} {recall_columns}")
+
+    for size in args.sizes:
+        vectors = embedding_corpus(size, args.dimension, args.clusters)
+        queries = nearby_queries(vectors, args.queries)
+
+        exact = None
+        for quantization in ['float32'] + [q for q in args.quantizations if q != 'float32']:
+            with tempfile.TemporaryDirectory() as tmp:
+                collection, insert_time = build(tmp, quantization, vectors)
+                p50, results = run_queries(collection, queries, max_k)
+                # float32 search is exact: it is the recall reference
+                if exact is None:
+                    exact = results
+                recalls = " ".join(
+                    f"{recall([r[:k] for r in results], [e[:k] for e in exact]):>9.3f}" for k in args.top_k
+                )
+                print(f"{size:>9} {quantization:>8} {insert_time:>9.1f} {collection.scan_bytes() / 1e6:>8.1f} "
+                      f"{disk_bytes(tmp) / 1e6:>8.1f} {p50:>7.2f} {recalls}")
+                del collection
+
+
+if __name__ == "__main__":
+    main()
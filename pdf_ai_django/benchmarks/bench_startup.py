@@ -0,0 +1,85 @@
+"""
+Worker cold-start benchmark: import time, warm-up time and peak RSS
+
+Each mode runs in a fresh interpreter:
+    import    - django.setup() + import documents.views (what every web worker does at boot)
+    warm      - import, then load the shared registry (model, Chroma, QA engine) once
+    separate  - import, then load a second embedding model / Chroma client next to the
+                registry, which is what QAEngine used to do on its own
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.bench_startup --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+CHILD_CODE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+
+import django
+django.setup()
+import documents.views
+imported = time.perf_counter()
+
+mode = sys.argv[1]
+if mode in ("warm", "separate"):
+    from documents.utils import warm_up
+    warm_up(("embedding_generator", "vector_store", "qa_engine"))
+if mode == "separate":
+    from django.conf import settings
+    from embeddings import EmbeddingGenerator
+    from vector_store import VectorStore
+    EmbeddingGenerator()
+    VectorStore(persist_directory=str(settings.CHROMA_PERSIST_DIR))
+done = time.perf_counter()
+
+print("RESULT " + json.dumps({
+    "import_s": imported - start,
+    "total_s": done - start,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_imported": sorted(m for m in ("torch", "sentence_transformers", "chromadb") if m in sys.modules),
+}))
+'''
+
+
+def run_mode(mode: str) -> dict:
+    """Run one mode in a fresh interpreter and return its measurements"""
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "pdf_ai_project.settings")
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, mode],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"No result from mode {mode}:\n{completed.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["import", "warm", "separate"],
+                        choices=["import", "warm", "separate"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'import s':>9} {'total s':>9} {'max RSS MB':>11}  heavy modules loaded")
+    for mode in args.modes:
+        runs = [run_mode(mode) for _ in range(args.repeat)]
+        print(f"{mode:<10} "
+              f"{statistics.median(r['import_s'] for r in runs):>9.2f} "
+              f"{statistics.median(r['total_s'] for r in runs):>9.2f} "
+              f"{statistics.median(r['max_rss_mb'] for r in runs):>11.1f}  "
+              f"{', '.join(runs[-1]['heavy_imported']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
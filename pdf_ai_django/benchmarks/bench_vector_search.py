@@ -0,0 +1,104 @@
+"""
+VectorStore.search latency: NumPy backend vs ChromaDB (p50/p99, with and without a source filter)
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.bench_vector_search --sizes 10000 100000 1000000 --chroma-max 100000
+
+Chroma inserts are slow at 1M chunks, so sizes above --chroma-max only run the NumPy backend.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_store import VectorStore
+
+CHUNKS_PER_SOURCE = 500
+INSERT_BATCH = 5000
+
+
+def make_corpus(size: int, dimension: int, seed: int = 0):
+    """Random vectors yielded in insert batches: (ids, embeddings, documents, metadatas)"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, size, INSERT_BATCH):
+        end = min(start + INSERT_BATCH, size)
+        ids = [f"chunk_{i}" for i in range(start, end)]
+        embeddings = rng.standard_normal((end - start, dimension), dtype=np.float32)
+        documents = [f"text of chunk {i}" for i in range(start, end)]
+        metadatas = [{'source': f"doc_{i // CHUNKS_PER_SOURCE}.pdf", 'chunk_id': i % CHUNKS_PER_SOURCE}
+                     for i in range(start, end)]
+        yield ids, embeddings, documents, metadatas
+
+
+def build_store(backend: str, directory: str, size: int, dimension: int) -> tuple:
+    """Create a store and fill it; returns (store, insert seconds)"""
+    store = VectorStore(persist_directory=directory, backend=backend)
+    start = time.perf_counter()
+    for ids, embeddings, documents, metadatas in make_corpus(size, dimension):
+        if backend == "numpy":
+            store.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        else:
+            store.collection.add(ids=ids, embeddings=embeddings.tolist(), documents=documents,
+                                 metadatas=metadatas)
+    return store, time.perf_counter() - start
+
+
+def time_queries(store: VectorStore, queries: np.ndarray, top_k: int, filter_source: str = None) -> tuple:
+    """Return (p50 ms, p99 ms, result ids per query)"""
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        result = store.search(query.tolist(), top_k=top_k, filter_source=filter_source)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(result['ids'][0])
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99)), results
+
+
+def recall(results: list, exact: list) -> float:
+    """Mean overlap between approximate and exact top-k ids"""
+    return float(np.mean([len(set(r) & set(e)) / max(len(e), 1) for r, e in zip(results, exact)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--chroma-max', type=int, default=100_000,
+                        help='Largest corpus size that is also loaded into Chroma')
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    queries = np.random.default_rng(1).standard_normal((args.queries, args.dimension), dtype=np.float32)
+
+    print(f"dimension={args.dimension} queries={args.queries} top_k={args.top_k}")
+    print(f"{'chunks':>9} {'backend':>8} {'insert s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'filt p50':>9} {'filt p99':>9} {'recall':>7}")
+
+    for size in args.sizes:
+        backends = ["numpy", "chroma"] if size <= args.chroma_max else ["numpy"]
+        exact = None
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                store, insert_time = build_store(backend, tmp, size, args.dimension)
+                p50, p99, results = time_queries(store, queries, args.top_k)
+                # Filter on a source in the middle of the corpus
+                source = f"doc_{(size // CHUNKS_PER_SOURCE) // 2}.pdf"
+                f50, f99, _ = time_queries(store, queries, args.top_k, filter_source=source)
+
+                # NumPy search is exact, so it is the recall reference for Chroma's HNSW
+                if exact is None:
+                    exact = results
+                print(f"{size:>9} {backend:>8} {insert_time:>9.1f} {p50:>8.2f} {p99:>8.2f} "
+                      f"{f50:>9.2f} {f99:>9.2f} {recall(results, exact):>7.3f}")
+                del store
+
+
+if __name__ == "__main__":
+    main()
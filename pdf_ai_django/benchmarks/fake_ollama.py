@@ -0,0 +1,156 @@
+"""
+Minimal fake Ollama server for local testing and load tests
+
+Implements GET /api/tags and POST /api/generate (streaming NDJSON and
+non-streaming) with a configurable time-to-first-token and per-token delay.
+The first fail_first generations can be answered with an error status (retry
+tests); the server counts generations and the most it saw in flight at once.
+
+Usage (from the pdf_ai_django directory):
+    python -m benchmarks.fake_ollama --port 11435 --first-token-delay 0.2 --token-delay 0.02
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Configured on the server class by make_server()
+    first_token_delay = 0.0
+    token_delay = 0.0
+    num_tokens = 20
+    fail_first = 0
+    fail_status = 503
+    models = ["llama3.2:latest"]
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name} for name in self.models]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.server.begin_generation() <= self.fail_first:
+            self.server.end_generation()
+            self._send_json({"error": "server busy"}, status=self.fail_status)
+            return
+        try:
+            self._generate(request)
+        finally:
+            self.server.end_generation()
+
+    def _generate(self, request):
+        tokens = [f" token{i}" for i in range(self.num_tokens)]
+        # Final message counts, like Ollama's (prompt tokens approximated as 4 characters each)
+        counts = {"prompt_eval_count": len(request.get("prompt", "")) // 4, "eval_count": len(tokens)}
+
+        time.sleep(self.first_token_delay)
+
+        if not request.get("stream", True):
+            time.sleep(self.token_delay * len(tokens))
+            self._send_json(dict(counts, model=request.get("model"), response="".join(tokens), done=True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            self._write_chunk({"model": request.get("model"), "response": token, "done": False})
+        self._write_chunk(dict(counts, model=request.get("model"), response="", done=True))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data):
+        line = (json.dumps(data) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # load tests open hundreds of connections at once
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.generations = 0    # POST /api/generate requests received
+        self.in_flight = 0
+        self.max_in_flight = 0  # most generations handled at the same time
+
+    def begin_generation(self):
+        """Count a generation request; returns its number (1 = first)"""
+        with self._stats_lock:
+            self.generations += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.generations
+
+    def end_generation(self):
+        with self._stats_lock:
+            self.in_flight -= 1
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close the connection mid-response: not a server error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(port=0, first_token_delay=0.0, token_delay=0.0, num_tokens=20, fail_first=0, fail_status=503):
+    """Create a fake Ollama server (port 0 picks a free port)"""
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {
+        "first_token_delay": first_token_delay,
+        "token_delay": token_delay,
+        "num_tokens": num_tokens,
+        "fail_first": fail_first,
+        "fail_status": fail_status,
+    })
+    return FakeOllamaServer(("127.0.0.1", port), handler)
+
+
+def start_in_thread(**kwargs):
+    """Start a fake server in a background thread, returns (server, base_url)"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--tokens", type=int, default=20)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.first_token_delay, args.token_delay, args.tokens)
+    print(f"Fake Ollama listening on http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
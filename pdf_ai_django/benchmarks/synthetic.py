@@ -0,0 +1,93 @@
+"""
+Synthetic data generators shared by the benchmarks
+"""
+import random
+from typing import List
+
+import numpy as np
+
+WORDS = (
+    "analysis data model system policy market process result method value "
+    "theory study effect level rate growth price risk report section table "
+    "figure sample control group response factor measure period change index"
+).split()
+
+
+def random_sentence(rng: random.Random, min_words: int = 6, max_words: int = 14) -> str:
+    """Random sentence built from a small vocabulary"""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def write_pdf(path: str, num_pages: int, lines_per_page: int = 45, seed: int = 0) -> str:
+    """
+    Write a plain-text PDF with num_pages pages (no external PDF library needed)
+    Args:
+        path: Output file path
+        num_pages: Number of pages to generate
+        lines_per_page: Text lines per page
+        seed: Random seed for reproducible content
+    Returns:
+        The output path
+    """
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    # 1: catalog, 2: page tree, 3: font, then (page, content) pairs
+    page_ids = [4 + 2 * i for i in range(num_pages)]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for page_id in page_ids:
+        lines = [random_sentence(rng) for _ in range(lines_per_page)]
+        text_ops = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 50 780 Td {text_ops} ET".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, 'wb') as f:
+        f.write(out)
+    return path
+
+
+def embedding_corpus(size: int, dimension: int, clusters: bool = True, seed: int = 0) -> np.ndarray:
+    """
+    Random float32 vectors standing in for chunk embeddings
+    Args:
+        size: Number of vectors
+        dimension: Vector dimension
+        clusters: Draw vectors around random topic centers, like document embeddings
+                  (False = plain Gaussian vectors, the hardest case for approximate search)
+        seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    if not clusters:
+        return rng.standard_normal((size, dimension), dtype=np.float32)
+    centers = rng.standard_normal((max(size // 500, 16), dimension), dtype=np.float32)
+    vectors = centers[rng.integers(0, len(centers), size)]
+    vectors += 0.6 * rng.standard_normal((size, dimension), dtype=np.float32)
+    return vectors
+
+
+def nearby_queries(corpus: np.ndarray, count: int, noise: float = 0.5, seed: int = 1) -> np.ndarray:
+    """Query vectors near stored ones, like questions about indexed passages"""
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.integers(0, len(corpus), count)]
+    return queries + noise * rng.standard_normal(queries.shape, dtype=np.float32)
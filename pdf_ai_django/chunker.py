@@ -0,0 +1,134 @@
+import re
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from context_packer import approximate_token_count
+
+# Sentence ends: . ! ? (optionally followed by quotes/brackets) then whitespace and an upper-case letter,
+# digit or opening quote/bracket. Keeps "e.g. the" and "3.5 mm" together.
+SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def split_sentences(paragraph: str) -> List[str]:
+    """Split a paragraph into sentences (whitespace inside each sentence is collapsed)"""
+    paragraph = " ".join(paragraph.split())
+    if not paragraph:
+        return []
+    return [sentence for sentence in SENTENCE_END.split(paragraph) if sentence]
+
+
+class SentenceChunker:
+    """
+    Split page texts into chunks that fit the embedding model's token limit
+
+    - Chunks are built from whole sentences and end at a paragraph break when one is near
+    - Sentences longer than the limit are split at word boundaries
+    - Consecutive chunks of the same paragraph share their last sentences (overlap)
+    - Every chunk records the pages it was taken from (page_start, page_end)
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 32,
+                 count_tokens: Callable[[str], int] = None, special_tokens: int = 2):
+        """
+        Args:
+            max_tokens: Token limit of the embedding model (all-MiniLM-L6-v2: 256)
+            overlap_tokens: Tokens of trailing sentences repeated in the next chunk
+            count_tokens: Callable returning the token count of a text (default: ~4 chars per token)
+            special_tokens: Tokens the model adds to every input ([CLS] and [SEP] for BERT models)
+        """
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens or approximate_token_count
+        self.budget = max_tokens - special_tokens
+        # A paragraph break this far into a chunk is a better place to stop than mid-paragraph
+        self.min_paragraph_tokens = self.budget // 2
+
+    def _split_long_sentence(self, sentence: str) -> List[Tuple[str, int]]:
+        """Split a sentence over the token budget into word runs that fit"""
+        pieces, words, used = [], [], 0
+        for word in sentence.split():
+            tokens = self.count_tokens(word)
+            if words and used + tokens > self.budget:
+                pieces.append((" ".join(words), used))
+                words, used = [], 0
+            words.append(word)
+            used += tokens
+        if words:
+            pieces.append((" ".join(words), used))
+        return pieces
+
+    def _units(self, pages: Iterable[Tuple[int, str]]) -> Iterable[Dict]:
+        """Sentences (or pieces of long sentences) with their page and paragraph number"""
+        paragraph = 0
+        for page_number, page_text in pages:
+            for paragraph_text in PARAGRAPH_BREAK.split(page_text or ""):
+                sentences = split_sentences(paragraph_text)
+                if not sentences:
+                    continue
+                paragraph += 1
+                for sentence in sentences:
+                    tokens = self.count_tokens(sentence)
+                    pieces = [(sentence, tokens)] if tokens <= self.budget else self._split_long_sentence(sentence)
+                    for text, piece_tokens in pieces:
+                        yield {'text': text, 'tokens': piece_tokens, 'page': page_number, 'paragraph': paragraph}
+
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]]) -> List[Dict[str, any]]:
+        """
+        Chunk a document given page by page
+        Args:
+            pages: (page_number, text) pairs in page order; blank lines in a text separate paragraphs
+        Returns:
+            List of dicts with 'text', 'chunk_id', 'page_start', 'page_end' and 'tokens'
+        """
+        chunks = []
+        current: List[Dict] = []
+        used = 0
+
+        def flush():
+            chunks.append({
+                'text': " ".join(unit['text'] for unit in current),
+                'chunk_id': len(chunks),
+                'page_start': current[0]['page'],
+                'page_end': current[-1]['page'],
+                'tokens': used,
+            })
+
+        for unit in self._units(pages):
+            new_paragraph = bool(current) and unit['paragraph'] != current[-1]['paragraph']
+            full = used + unit['tokens'] > self.budget
+            if current and (full or (new_paragraph and used >= self.min_paragraph_tokens)):
+                flush()
+                # Overlap only inside a paragraph: a paragraph break already is a clean boundary
+                carried = []
+                if not new_paragraph:
+                    carried_tokens = 0
+                    for previous in reversed(current):
+                        if carried_tokens + previous['tokens'] > self.overlap_tokens:
+                            break
+                        if carried_tokens + previous['tokens'] + unit['tokens'] > self.budget:
+                            break
+                        carried.insert(0, previous)
+                        carried_tokens += previous['tokens']
+                    # Never carry the whole chunk over (it would be repeated forever)
+                    if len(carried) == len(current):
+                        carried = []
+                current = carried
+                used = sum(previous['tokens'] for previous in current)
+            current.append(unit)
+            used += unit['tokens']
+
+        if current:
+            flush()
+        return chunks
+
+
+if __name__ == "__main__":
+    # Test the chunker on two short pages
+    pages = [
+        (1, "Introduction. Machine learning is a subset of AI. It learns from data.\n\n"
+            "Deep learning uses neural networks with many layers, e.g. transformers."),
+        (2, "Training needs data. " * 12 + "\n\nConclusion. The end."),
+    ]
+    for chunk in SentenceChunker(max_tokens=40, overlap_tokens=8).chunk_pages(pages):
+        print(f"[{chunk['chunk_id']}] pages {chunk['page_start']}-{chunk['page_end']} "
+              f"({chunk['tokens']} tokens): {chunk['text'][:70]}")
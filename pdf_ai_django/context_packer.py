@@ -0,0 +1,178 @@
+from typing import Callable, Dict, List, Optional
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough token count (~4 characters per token) when no tokenizer is available"""
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+class ContextPacker:
+    """
+    Fit retrieved chunks into a prompt token budget
+
+    - Adjacent chunks of the same document are merged and their overlap removed
+    - Near-duplicate chunks (e.g. the same passage from two overlapping chunks) are dropped
+    - Blocks are added in relevance order until the budget is full
+    """
+
+    def __init__(self, token_budget: int = 1500, count_tokens: Callable[[str], int] = None,
+                 duplicate_threshold: float = 0.8, min_block_tokens: int = 64):
+        """
+        Args:
+            token_budget: Maximum context tokens per prompt
+            count_tokens: Callable returning the token count of a text (default: ~4 chars per token)
+            duplicate_threshold: Share of a block's word shingles already in a kept block
+                                 above which it counts as a duplicate
+            min_block_tokens: Smallest truncated block worth adding when the budget is almost full
+        """
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens or approximate_token_count
+        self.duplicate_threshold = duplicate_threshold
+        self.min_block_tokens = min_block_tokens
+
+    @staticmethod
+    def _document_key(metadata: Dict) -> str:
+        return metadata.get('content_hash') or metadata.get('source', '')
+
+    @staticmethod
+    def _shingles(words: List[str], size: int = 3) -> set:
+        if len(words) < size:
+            return {tuple(words)}
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    @staticmethod
+    def _merge_words(first: List[str], second: List[str], max_overlap: int = 400) -> List[str]:
+        """Concatenate two word lists, dropping the longest suffix/prefix overlap"""
+        for size in range(min(len(first), len(second), max_overlap), 0, -1):
+            if first[-size:] == second[:size]:
+                return first + second[size:]
+        return first + second
+
+    def _merge_adjacent(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Merge runs of consecutive chunk_ids from the same document into one block
+        A block keeps the best (first) relevance rank of its members.
+        """
+        by_document: Dict[str, List[Dict]] = {}
+        for chunk in chunks:
+            by_document.setdefault(self._document_key(chunk['metadata']), []).append(chunk)
+
+        blocks = []
+        for document_chunks in by_document.values():
+            document_chunks.sort(key=lambda chunk: chunk['metadata'].get('chunk_id', 0))
+            current = None
+            for chunk in document_chunks:
+                chunk_id = chunk['metadata'].get('chunk_id')
+                if current is not None and chunk_id is not None and chunk_id == current['last_chunk_id'] + 1:
+                    current['words'] = self._merge_words(current['words'], chunk['text'].split())
+                    current['last_chunk_id'] = chunk_id
+                    current['rank'] = min(current['rank'], chunk['rank'])
+                    current['members'] += 1
+                    current['page_end'] = chunk['metadata'].get('page_end', current['page_end'])
+                    continue
+                current = {
+                    'words': chunk['text'].split(),
+                    'metadata': chunk['metadata'],
+                    'last_chunk_id': chunk_id if chunk_id is not None else -2,
+                    'rank': chunk['rank'],
+                    'members': 1,
+                    'page_start': chunk['metadata'].get('page_start'),
+                    'page_end': chunk['metadata'].get('page_end'),
+                }
+                blocks.append(current)
+
+        blocks.sort(key=lambda block: block['rank'])
+        return blocks
+
+    def _drop_duplicates(self, blocks: List[Dict]) -> tuple:
+        """Drop blocks mostly contained in a more relevant kept block"""
+        kept, kept_shingles, dropped = [], [], 0
+        for block in blocks:
+            shingles = self._shingles(block['words'])
+            duplicate = any(
+                len(shingles & other) / max(len(shingles), 1) >= self.duplicate_threshold
+                for other in kept_shingles
+            )
+            if duplicate:
+                dropped += 1
+                continue
+            kept.append(block)
+            kept_shingles.append(shingles)
+        return kept, dropped
+
+    def _truncate(self, words: List[str], max_tokens: int) -> Optional[str]:
+        """Longest word prefix within max_tokens (binary search over word count)"""
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(" ".join(words[:middle])) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return " ".join(words[:low]) if low else None
+
+    def pack(self, texts: List[str], metadatas: List[Dict]) -> Dict:
+        """
+        Select and merge chunks for the prompt
+        Args:
+            texts: Retrieved chunk texts, most relevant first
+            metadatas: Their metadata ('source', 'chunk_id', optional 'content_hash', 'page_start', 'page_end')
+        Returns:
+            Dict with 'blocks' (list of {'text', 'source', 'pages', 'tokens', 'rank'}; rank is the
+            position in texts of the block's most relevant chunk), 'tokens_used', 'token_budget',
+            'chunks_in', 'duplicates_dropped', 'chunks_merged' and 'truncated'
+        """
+        chunks = [
+            {'text': text, 'metadata': metadata or {}, 'rank': rank}
+            for rank, (text, metadata) in enumerate(zip(texts, metadatas))
+        ]
+        blocks = self._merge_adjacent(chunks)
+        blocks, duplicates = self._drop_duplicates(blocks)
+
+        packed, used, truncated = [], 0, False
+        for block in blocks:
+            remaining = self.token_budget - used
+            if remaining < self.min_block_tokens:
+                break
+
+            text = " ".join(block['words'])
+            tokens = self.count_tokens(text)
+            if tokens > remaining:
+                # Too long for what is left: keep its beginning rather than nothing
+                text = self._truncate(block['words'], remaining)
+                if text is None:
+                    continue
+                tokens = self.count_tokens(text)
+                truncated = True
+
+            pages = (block['page_start'], block['page_end']) if block['page_start'] is not None else None
+            packed.append({'text': text, 'source': block['metadata'].get('source', ''),
+                           'pages': pages, 'tokens': tokens, 'rank': block['rank']})
+            used += tokens
+
+        return {
+            'blocks': packed,
+            'tokens_used': used,
+            'token_budget': self.token_budget,
+            'chunks_in': len(chunks),
+            'duplicates_dropped': duplicates,
+            'chunks_merged': sum(block['members'] - 1 for block in blocks),
+            'truncated': truncated,
+        }
+
+
+if __name__ == "__main__":
+    # Test the packer with overlapping chunks
+    words = [f"w{i}" for i in range(60)]
+    texts = [" ".join(words[0:30]), " ".join(words[25:55]), " ".join(words[0:30]), "unrelated text here"]
+    metadatas = [
+        {'source': 'a.pdf', 'chunk_id': 0},
+        {'source': 'a.pdf', 'chunk_id': 1},
+        {'source': 'b.pdf', 'chunk_id': 7},
+        {'source': 'c.pdf', 'chunk_id': 3},
+    ]
+
+    result = ContextPacker(token_budget=80, min_block_tokens=4).pack(texts, metadatas)
+    for block in result['blocks']:
+        print(f"{block['source']} ({block['tokens']} tokens): {block['text'][:60]}")
+    print({key: value for key, value in result.items() if key != 'blocks'})
@@ -1,33 +1,49 @@
 from django.contrib import admin
-from .models import PDFDocument, Question, DocumentSummary
+from .models import PDFDocument, Question, DocumentSummary, IngestionJob, ReindexJob
 
 
 @admin.register(PDFDocument)
 class PDFDocumentAdmin(admin.ModelAdmin):
-    list_display = ['title', 'uploaded_at', 'uploaded_by', 'num_pages', 'num_chunks', 'processed']
-    list_filter = ['processed', 'uploaded_at']
+    list_display = ['title', 'uploaded_at', 'uploaded_by', 'num_pages', 'num_chunks', 'status', 'progress']
+    list_filter = ['status', 'processed', 'uploaded_at']
     search_fields = ['title']
-    readonly_fields = ['uploaded_at', 'file_size', 'num_pages', 'num_chunks']
+    readonly_fields = ['uploaded_at', 'file_size', 'num_pages', 'num_chunks', 'status', 'progress', 'content_hash',
+                       'ingest_trace']
 
     fieldsets = (
         ('Document Info', {
             'fields': ('title', 'file', 'uploaded_by')
         }),
         ('Processing Status', {
-            'fields': ('processed', 'processing_error')
+            'fields': ('processed', 'status', 'progress', 'processing_error')
         }),
         ('Statistics', {
-            'fields': ('file_size', 'num_pages', 'num_chunks', 'uploaded_at')
+            'fields': ('file_size', 'content_hash', 'num_pages', 'num_chunks', 'uploaded_at', 'ingest_trace')
         }),
     )
 
 
+@admin.register(IngestionJob)
+class IngestionJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'document', 'status', 'stage', 'progress', 'attempts', 'worker', 'created_at']
+    list_filter = ['status', 'stage', 'created_at']
+    search_fields = ['document__title', 'worker']
+    readonly_fields = ['created_at', 'started_at', 'heartbeat_at', 'finished_at']
+
+
+@admin.register(ReindexJob)
+class ReindexJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'progress', 'attempts', 'version', 'worker', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['created_at', 'started_at', 'heartbeat_at', 'finished_at', 'version']
+
+
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ['short_question', 'document', 'asked_at', 'asked_by', 'response_time']
     list_filter = ['asked_at', 'document']
     search_fields = ['question_text', 'answer_text']
-    readonly_fields = ['asked_at', 'response_time']
+    readonly_fields = ['asked_at', 'response_time', 'trace']
 
     def short_question(self, obj):
         return obj.question_text[:50] + '...' if len(obj.question_text) > 50 else obj.question_text
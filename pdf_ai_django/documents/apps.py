@@ -1,7 +1,31 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
-    verbose_name = 'PDF Documents'
\ No newline at end of file
+    verbose_name = 'PDF Documents'
+
+    def ready(self):
+        """Optionally preload heavy components so the first request doesn't pay for them"""
+        if not getattr(settings, 'WARM_UP_ON_START', False):
+            return
+
+        # Only web servers need it: skip management commands (migrate, shell, ingest_worker, ...)
+        # and the autoreloader's parent process of runserver
+        if os.path.basename(sys.argv[0]) == 'manage.py':
+            command = sys.argv[1] if len(sys.argv) > 1 else ''
+            if command != 'runserver':
+                return
+            if '--noreload' not in sys.argv and os.environ.get('RUN_MAIN') != 'true':
+                return
+
+        from .utils import warm_up
+
+        components = getattr(settings, 'WARM_UP_COMPONENTS', ('embedding_generator', 'vector_store'))
+        threading.Thread(target=warm_up, args=(components,), name='warm-up', daemon=True).start()
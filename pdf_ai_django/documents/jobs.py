@@ -0,0 +1,386 @@
+"""
+DB-backed ingestion job queue for the documents app
+
+Uploads only enqueue an IngestionJob row; local worker processes
+(`python manage.py ingest_worker`) claim queued jobs from the database and
+run extract -> chunk -> embed -> store -> summarize. No external broker is needed.
+The same workers also run queued re-index jobs (`python manage.py reindex --background`).
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PDFDocument, IngestionJob, DocumentSummary, ReindexJob
+from .utils import process_pdf, get_qa_engine, record_trace
+from tracing import trace, span
+
+# Progress range (percent) covered by each pipeline stage
+STAGE_PROGRESS = {
+    'extract': (0, 30),
+    'chunk': (30, 40),
+    'embed': (40, 75),
+    'store': (75, 90),
+    'summarize': (90, 100),
+}
+
+
+def default_worker_name():
+    """Identify a worker by host and process id"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_ingestion(pdf_document):
+    """
+    Queue a PDF document for background ingestion
+    Args:
+        pdf_document: Saved PDFDocument model instance
+    Returns:
+        The created IngestionJob
+    """
+    with transaction.atomic():
+        PDFDocument.objects.filter(pk=pdf_document.pk).update(
+            status=PDFDocument.STATUS_QUEUED,
+            progress=0,
+            processing_error=None
+        )
+        job = IngestionJob.objects.create(document=pdf_document)
+
+    pdf_document.status = PDFDocument.STATUS_QUEUED
+    pdf_document.progress = 0
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Put back jobs whose worker stopped sending heartbeats (crashed or killed)
+    Returns:
+        Number of jobs requeued or failed
+    """
+    timeout = getattr(settings, 'INGESTION_JOB_TIMEOUT', 1800)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = IngestionJob.objects.filter(status=IngestionJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+
+    retried = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=IngestionJob.STATUS_QUEUED,
+        worker=''
+    )
+    # Whatever is still 'running' here has used up its attempts
+    exhausted_docs = list(stale.values_list('document_id', flat=True))
+    failed = stale.update(
+        status=IngestionJob.STATUS_FAILED,
+        error='Worker stopped responding',
+        finished_at=timezone.now()
+    )
+    PDFDocument.objects.filter(pk__in=exhausted_docs).update(
+        status=PDFDocument.STATUS_FAILED,
+        processing_error='Worker stopped responding'
+    )
+
+    # Re-indexing resumes the unfinished version, so a retry doesn't start over
+    stale_reindex = ReindexJob.objects.filter(status=ReindexJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+    reindex_retried = stale_reindex.filter(attempts__lt=F('max_attempts')).update(
+        status=ReindexJob.STATUS_QUEUED,
+        worker=''
+    )
+    reindex_failed = stale_reindex.update(
+        status=ReindexJob.STATUS_FAILED,
+        error='Worker stopped responding',
+        finished_at=timezone.now()
+    )
+    return retried + failed + reindex_retried + reindex_failed
+
+
+def claim_next_job(worker_name):
+    """
+    Atomically claim the oldest queued job
+    Args:
+        worker_name: Name recorded on the claimed job
+    Returns:
+        IngestionJob or None if the queue is empty
+    """
+    candidates = IngestionJob.objects.filter(
+        status=IngestionJob.STATUS_QUEUED
+    ).order_by('created_at').values_list('pk', flat=True)[:10]
+
+    for pk in candidates:
+        now = timezone.now()
+        # Conditional UPDATE: only one worker can move the row out of 'queued'
+        claimed = IngestionJob.objects.filter(pk=pk, status=IngestionJob.STATUS_QUEUED).update(
+            status=IngestionJob.STATUS_RUNNING,
+            worker=worker_name,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now,
+            error=None
+        )
+        if claimed:
+            return IngestionJob.objects.select_related('document').get(pk=pk)
+
+    return None
+
+
+@contextmanager
+def _heartbeat(model, pk):
+    """
+    Refresh a running job's heartbeat_at every INGESTION_HEARTBEAT_INTERVAL seconds
+    Progress reports also heartbeat, but a single long step (a large embedding batch,
+    a slow summary prompt) may not move progress for longer than INGESTION_JOB_TIMEOUT.
+    """
+    interval = getattr(settings, 'INGESTION_HEARTBEAT_INTERVAL', 60)
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval):
+                model.objects.filter(pk=pk, status=model.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+        finally:
+            # The thread has its own database connection
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def _set_progress(job, stage, fraction):
+    """Record stage progress on the job and its document (doubles as heartbeat)"""
+    start, end = STAGE_PROGRESS[stage]
+    progress = int(start + (end - start) * min(max(fraction, 0.0), 1.0))
+
+    # Per-page reports are frequent; only write when something visible changes
+    if (stage, progress) == getattr(job, '_last_progress', None):
+        return
+    job._last_progress = (stage, progress)
+
+    IngestionJob.objects.filter(pk=job.pk).update(
+        stage=stage,
+        progress=progress,
+        heartbeat_at=timezone.now()
+    )
+    PDFDocument.objects.filter(pk=job.document_id).update(
+        status=PDFDocument.STATUS_PROCESSING,
+        progress=progress
+    )
+
+
+def _finish_job(job, status, error=None):
+    """Mark a job (and its document) as done or failed"""
+    IngestionJob.objects.filter(pk=job.pk).update(
+        status=status,
+        progress=100 if status == IngestionJob.STATUS_DONE else F('progress'),
+        error=error,
+        finished_at=timezone.now()
+    )
+
+    if status == IngestionJob.STATUS_DONE:
+        PDFDocument.objects.filter(pk=job.document_id).update(
+            status=PDFDocument.STATUS_COMPLETED,
+            progress=100
+        )
+    else:
+        PDFDocument.objects.filter(pk=job.document_id).update(
+            status=PDFDocument.STATUS_FAILED,
+            processing_error=error
+        )
+
+
+def run_job(job):
+    """
+    Run the full ingestion pipeline for a claimed job
+    The per-stage timings are stored on the document (ingest_trace) and in the metrics.
+    Args:
+        job: IngestionJob in 'running' state
+    Returns:
+        True if the document was ingested
+    """
+    with _heartbeat(IngestionJob, job.pk), trace('ingest') as ingest_trace:
+        ingested = _run_pipeline(job)
+    record_trace(ingest_trace)
+    PDFDocument.objects.filter(pk=job.document_id).update(ingest_trace=ingest_trace.to_dict())
+    return ingested
+
+
+def _run_pipeline(job):
+    """Extract -> chunk -> embed -> store -> summarize; returns True if the document was ingested"""
+    document = job.document
+
+    try:
+        success, message, chunks_count, pages_count = process_pdf(
+            document,
+            progress_callback=lambda stage, fraction: _set_progress(job, stage, fraction)
+        )
+    except Exception:
+        _finish_job(job, IngestionJob.STATUS_FAILED, traceback.format_exc())
+        return False
+
+    if not success:
+        _finish_job(job, IngestionJob.STATUS_FAILED, message)
+        return False
+
+    PDFDocument.objects.filter(pk=document.pk).update(
+        processed=True,
+        num_chunks=chunks_count,
+        num_pages=pages_count
+    )
+
+    # Auto-generate summary (don't fail the job if Ollama is not running)
+    _set_progress(job, 'summarize', 0.0)
+    try:
+        if not DocumentSummary.objects.filter(document_id=document.pk).exists():
+            # Identical content was summarized before: copy instead of asking Ollama again
+            existing = DocumentSummary.objects.filter(
+                document__content_hash=document.content_hash
+            ).exclude(document_id=document.pk).first() if document.content_hash else None
+
+            if existing:
+                summary_text = existing.summary_text
+            else:
+                engine = get_qa_engine()
+                with span('summarize'):
+                    summary_text = engine.summarize_document(
+                        progress_callback=lambda fraction: _set_progress(job, 'summarize', fraction),
+                        **document.get_vector_filter()
+                    )
+            DocumentSummary.objects.create(
+                document_id=document.pk,
+                summary_text=summary_text
+            )
+    except Exception as e:
+        print(f"Summary generation failed for {document.title}: {e}")
+
+    _finish_job(job, IngestionJob.STATUS_DONE)
+    return True
+
+
+def enqueue_reindex(force=False):
+    """
+    Queue a re-index run (one at a time: an already queued or running job is returned instead)
+    Args:
+        force: Rebuild even if the index config is unchanged
+    Returns:
+        The queued or running ReindexJob
+    """
+    with transaction.atomic():
+        pending = ReindexJob.objects.filter(
+            status__in=[ReindexJob.STATUS_QUEUED, ReindexJob.STATUS_RUNNING]
+        ).first()
+        if pending:
+            return pending
+        return ReindexJob.objects.create(force=force)
+
+
+def claim_next_reindex_job(worker_name):
+    """
+    Atomically claim the oldest queued re-index job (never while another one runs)
+    Returns:
+        ReindexJob or None
+    """
+    if ReindexJob.objects.filter(status=ReindexJob.STATUS_RUNNING).exists():
+        return None
+    pk = ReindexJob.objects.filter(
+        status=ReindexJob.STATUS_QUEUED
+    ).order_by('created_at').values_list('pk', flat=True).first()
+    if pk is None:
+        return None
+
+    now = timezone.now()
+    claimed = ReindexJob.objects.filter(pk=pk, status=ReindexJob.STATUS_QUEUED).update(
+        status=ReindexJob.STATUS_RUNNING,
+        worker=worker_name,
+        attempts=F('attempts') + 1,
+        started_at=now,
+        heartbeat_at=now,
+        error=None
+    )
+    return ReindexJob.objects.get(pk=pk) if claimed else None
+
+
+def run_reindex_job(job):
+    """
+    Re-index the corpus for a claimed job
+    Returns:
+        True if the index is up to date afterwards
+    """
+    from .reindex import reindex
+
+    def report(fraction):
+        progress = int(100 * fraction)
+        if progress != getattr(job, '_last_progress', None):
+            job._last_progress = progress
+            ReindexJob.objects.filter(pk=job.pk).update(progress=progress, heartbeat_at=timezone.now())
+
+    try:
+        with _heartbeat(ReindexJob, job.pk):
+            result = reindex(force=job.force, progress_callback=report)
+    except Exception:
+        ReindexJob.objects.filter(pk=job.pk).update(
+            status=ReindexJob.STATUS_FAILED,
+            error=traceback.format_exc(),
+            finished_at=timezone.now()
+        )
+        return False
+
+    ReindexJob.objects.filter(pk=job.pk).update(
+        status=ReindexJob.STATUS_DONE,
+        progress=100,
+        version=result['version'],
+        finished_at=timezone.now()
+    )
+    return True
+
+
+def run_worker(worker_name=None, poll_interval=None, burst=False):
+    """
+    Worker loop: claim and run jobs until stopped
+    Args:
+        worker_name: Name recorded on claimed jobs
+        poll_interval: Seconds to sleep when the queue is empty
+        burst: Exit as soon as the queue is empty (useful for tests and cron)
+    Returns:
+        Number of jobs processed
+    """
+    worker_name = worker_name or default_worker_name()
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'INGESTION_POLL_INTERVAL', 2.0)
+
+    processed = 0
+    print(f"Ingestion worker started: {worker_name}")
+
+    while True:
+        requeue_stale_jobs()
+        job = claim_next_job(worker_name)
+
+        if job is None:
+            # Re-indexing only runs when no upload is waiting
+            reindex_job = claim_next_reindex_job(worker_name)
+            if reindex_job is not None:
+                print(f"[{worker_name}] Re-indexing (job #{reindex_job.pk})")
+                ok = run_reindex_job(reindex_job)
+                processed += 1
+                print(f"[{worker_name}] Re-index job #{reindex_job.pk} {'done' if ok else 'failed'}")
+                continue
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        print(f"[{worker_name}] Processing job #{job.pk}: {job.document.title}")
+        ok = run_job(job)
+        processed += 1
+        print(f"[{worker_name}] Job #{job.pk} {'done' if ok else 'failed'}")
+
+    print(f"Ingestion worker stopped: {worker_name} ({processed} jobs)")
+    return processed
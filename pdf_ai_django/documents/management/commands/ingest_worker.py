@@ -0,0 +1,83 @@
+"""
+Run local ingestion workers that process queued PDF uploads
+
+Usage:
+    python manage.py ingest_worker                # workers from settings.INGESTION_WORKERS
+    python manage.py ingest_worker --workers 4
+    python manage.py ingest_worker --burst        # drain the queue and exit
+"""
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _worker_process(worker_name, poll_interval, burst):
+    """Entry point of a spawned worker process (sets Django up again)"""
+    import django
+    django.setup()
+
+    from documents.jobs import run_worker
+    run_worker(worker_name=worker_name, poll_interval=poll_interval, burst=burst)
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of local workers that process queued PDF ingestion jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of worker processes (default: settings.INGESTION_WORKERS)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=None,
+            help='Seconds to wait when the queue is empty (default: settings.INGESTION_POLL_INTERVAL)'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once the queue is empty instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        from documents.jobs import run_worker, default_worker_name
+
+        workers = options['workers']
+        if workers is None:
+            workers = getattr(settings, 'INGESTION_WORKERS', 1)
+        if workers < 1:
+            raise CommandError(f'--workers must be at least 1 (got {workers})')
+        poll_interval = options['poll_interval']
+        burst = options['burst']
+
+        # A single worker runs in this process (simplest to debug and test)
+        if workers <= 1:
+            processed = run_worker(poll_interval=poll_interval, burst=burst)
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s)'))
+            return
+
+        # 'spawn' so each worker loads its own embedding model / Chroma client
+        ctx = multiprocessing.get_context('spawn')
+        base_name = default_worker_name()
+        processes = [
+            ctx.Process(
+                target=_worker_process,
+                args=(f'{base_name}-{i}', poll_interval, burst),
+                daemon=False
+            )
+            for i in range(workers)
+        ]
+
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {workers} ingestion workers')
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+
+        self.stdout.write(self.style.SUCCESS('All ingestion workers stopped'))
@@ -0,0 +1,72 @@
+"""
+Rebuild the vector index after changing the embedding model or chunking settings
+
+Usage:
+    python manage.py reindex                 # rebuild if the config changed, then switch
+    python manage.py reindex --check         # only report whether a rebuild is needed
+    python manage.py reindex --background    # queue it for the ingestion workers
+    python manage.py reindex --force         # rebuild even if the config is unchanged
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Re-index all documents into a new index version and switch to it atomically'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report the active and configured index config'
+        )
+        parser.add_argument(
+            '--background', action='store_true',
+            help='Queue a re-index job for `python manage.py ingest_worker` instead of running it here'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Rebuild even if the active version already matches the config'
+        )
+        parser.add_argument(
+            '--keep-versions', type=int, default=None,
+            help='Inactive versions to keep after the switch (default: settings.INDEX_KEEP_VERSIONS)'
+        )
+
+    def handle(self, *args, **options):
+        from documents.utils import get_vector_store, get_index_config
+
+        if options['check']:
+            store = get_vector_store()
+            active = store.index_config()
+            configured = get_index_config()
+            self.stdout.write(f'Active version: {store.active_name}')
+            self.stdout.write(f'Active config:     {json.dumps(active, sort_keys=True)}')
+            self.stdout.write(f'Configured config: {json.dumps(configured, sort_keys=True)}')
+            if active == configured:
+                self.stdout.write(self.style.SUCCESS('Index is up to date'))
+            else:
+                self.stdout.write(self.style.WARNING('Re-index needed'))
+            return
+
+        if options['background']:
+            from documents.jobs import enqueue_reindex
+
+            job = enqueue_reindex(force=options['force'])
+            self.stdout.write(self.style.SUCCESS(f'Re-index job #{job.pk} is {job.status}'))
+            return
+
+        from documents.reindex import reindex
+
+        result = reindex(force=options['force'], keep_versions=options['keep_versions'])
+        if result['status'] == 'up_to_date':
+            self.stdout.write(self.style.SUCCESS(f"Index is up to date ({result['version']})"))
+            return
+
+        self.stdout.write(
+            f"Indexed {result['indexed']} document(s): {result['rechunked']} re-chunked, "
+            f"{result['embedded']} chunk(s) embedded, {result['removed']} removed"
+        )
+        if result['dropped']:
+            self.stdout.write(f"Dropped old version(s): {', '.join(result['dropped'])}")
+        self.stdout.write(self.style.SUCCESS(f"Active version: {result['version']} (was {result['previous']})"))
@@ -0,0 +1,28 @@
+"""
+Preload the embedding model (downloading it if needed), open Chroma and check Ollama
+
+Usage:
+    python manage.py warmup
+    python manage.py warmup --components embedding_generator
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Preload the embedding model and other shared components'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--components', nargs='+',
+            default=['embedding_generator', 'vector_store', 'qa_engine'],
+            choices=['embedding_generator', 'vector_store', 'reranker', 'qa_engine'],
+            help='Components to load'
+        )
+
+    def handle(self, *args, **options):
+        from documents.utils import warm_up
+
+        timings = warm_up(options['components'])
+        for name, seconds in timings.items():
+            self.stdout.write(f'{name}: {seconds:.2f}s')
+        self.stdout.write(self.style.SUCCESS('Warm-up complete'))
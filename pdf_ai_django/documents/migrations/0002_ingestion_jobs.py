@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_processed_documents(apps, schema_editor):
+    """Documents ingested before the job queue existed are already complete"""
+    PDFDocument = apps.get_model('documents', 'PDFDocument')
+    PDFDocument.objects.filter(processed=True).update(status='completed', progress=100)
+    PDFDocument.objects.filter(processed=False, processing_error__isnull=False).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Ingestion progress (0-100)'),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='IngestionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('stage', models.CharField(blank=True, choices=[('extract', 'Extracting text'), ('chunk', 'Chunking'), ('embed', 'Generating embeddings'), ('store', 'Storing vectors'), ('summarize', 'Summarizing')], max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Job progress (0-100)')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('worker', models.CharField(blank=True, help_text='Worker that claimed the job', max_length=255)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='documents.pdfdocument')),
+            ],
+            options={
+                'verbose_name': 'Ingestion Job',
+                'verbose_name_plural': 'Ingestion Jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='documents_i_status_5c65bb_idx')],
+            },
+        ),
+        migrations.RunPython(mark_processed_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_ingestion_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the PDF bytes (identical uploads share vectors)', max_length=64),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReindexJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('force', models.BooleanField(default=False, help_text='Rebuild even if the index config is unchanged')),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Job progress (0-100)')),
+                ('worker', models.CharField(blank=True, help_text='Worker that claimed the job', max_length=255)),
+                ('version', models.CharField(blank=True, help_text='Index version active after the job', max_length=255)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Re-index Job',
+                'verbose_name_plural': 'Re-index Jobs',
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_reindex_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='ingest_trace',
+            field=models.JSONField(blank=True, help_text='Per-stage timings and counters of the last ingestion', null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='trace',
+            field=models.JSONField(blank=True, help_text='Per-stage timings, token counts and cache hits of the answer', null=True),
+        ),
+    ]
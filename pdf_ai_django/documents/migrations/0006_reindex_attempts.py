@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_traces'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reindexjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reindexjob',
+            name='max_attempts',
+            field=models.PositiveSmallIntegerField(default=3),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -6,6 +7,17 @@ from django.utils import timezone
 class PDFDocument(models.Model):
     """Model to store PDF document metadata"""
 
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to='pdfs/')
     uploaded_at = models.DateTimeField(default=timezone.now)
@@ -15,6 +27,12 @@ class PDFDocument(models.Model):
     num_chunks = models.IntegerField(default=0, help_text="Number of text chunks created")
     processed = models.BooleanField(default=False)
     processing_error = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Ingestion progress (0-100)")
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True,
+                                    help_text="SHA-256 of the PDF bytes (identical uploads share vectors)")
+    ingest_trace = models.JSONField(null=True, blank=True,
+                                    help_text="Per-stage timings and counters of the last ingestion")
 
     class Meta:
         ordering = ['-uploaded_at']
@@ -28,6 +46,153 @@ class PDFDocument(models.Model):
         """Get just the filename without path"""
         return self.file.name.split('/')[-1]
 
+    def get_vector_filter(self):
+        """
+        Keyword arguments that scope QAEngine calls to this document's chunks
+        (by content hash, or by filename for documents ingested before hashing)
+        """
+        if self.content_hash:
+            vector_filter = {'content_hash': self.content_hash}
+        else:
+            vector_filter = {'pdf_source': self.get_filename()}
+
+        # Sharded stores: only search the shard holding this document
+        shard_key = self.get_shard_key()
+        if shard_key:
+            vector_filter['shard_key'] = shard_key
+        return vector_filter
+
+    def get_shard_key(self):
+        """Vector store shard holding this document's chunks (None = main collection)"""
+        from vector_store import VectorStore
+        return VectorStore.make_shard_key(
+            getattr(settings, 'VECTOR_SHARDING', 'none'),
+            getattr(settings, 'VECTOR_NUM_SHARDS', 8),
+            owner=self.uploaded_by_id,
+            content_hash=self.content_hash,
+            pdf_name=self.get_filename()
+        )
+
+    def find_duplicate(self):
+        """Another processed document with identical content (or None)"""
+        if not self.content_hash:
+            return None
+        return PDFDocument.objects.filter(
+            content_hash=self.content_hash,
+            processed=True
+        ).exclude(pk=self.pk).order_by('uploaded_at').first()
+
+    @property
+    def latest_job(self):
+        """Most recent ingestion job for this document (or None)"""
+        return self.jobs.order_by('-created_at').first()
+
+
+class IngestionJob(models.Model):
+    """Model to store queued PDF ingestion jobs (extract -> chunk -> embed -> store -> summarize)"""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    STAGE_CHOICES = [
+        ('extract', 'Extracting text'),
+        ('chunk', 'Chunking'),
+        ('embed', 'Generating embeddings'),
+        ('store', 'Storing vectors'),
+        ('summarize', 'Summarizing'),
+    ]
+
+    document = models.ForeignKey(PDFDocument, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Job progress (0-100)")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    worker = models.CharField(max_length=255, blank=True, help_text="Worker that claimed the job")
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Ingestion Job"
+        verbose_name_plural = "Ingestion Jobs"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.pk} ({self.status}) for {self.document.title}"
+
+    def to_dict(self):
+        """JSON-serializable job status for polling endpoints"""
+        return {
+            'job_id': self.pk,
+            'document_id': self.document_id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ReindexJob(models.Model):
+    """Model to store queued re-index runs (rebuild the vector index after a pipeline config change)"""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = IngestionJob.STATUS_CHOICES
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    force = models.BooleanField(default=False, help_text="Rebuild even if the index config is unchanged")
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Job progress (0-100)")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    worker = models.CharField(max_length=255, blank=True, help_text="Worker that claimed the job")
+    version = models.CharField(max_length=255, blank=True, help_text="Index version active after the job")
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Re-index Job"
+        verbose_name_plural = "Re-index Jobs"
+
+    def __str__(self):
+        return f"Re-index job #{self.pk} ({self.status})"
+
+    def to_dict(self):
+        """JSON-serializable job status for polling endpoints"""
+        return {
+            'job_id': self.pk,
+            'status': self.status,
+            'progress': self.progress,
+            'version': self.version,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
 
 class Question(models.Model):
     """Model to store questions asked about documents"""
@@ -38,6 +203,8 @@ class Question(models.Model):
     asked_at = models.DateTimeField(default=timezone.now)
     asked_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     response_time = models.FloatField(help_text="Response time in seconds", null=True, blank=True)
+    trace = models.JSONField(null=True, blank=True,
+                             help_text="Per-stage timings, token counts and cache hits of the answer")
 
     class Meta:
         ordering = ['-asked_at']
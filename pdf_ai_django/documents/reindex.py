@@ -0,0 +1,225 @@
+"""
+Re-index the corpus after the chunking or embedding config changed
+
+The new index is built as a separate vector store version next to the active one,
+so queries keep using the old version (old vectors only) until the new one is
+complete; then the index manifest is switched atomically and every process
+follows it on its next vector store call.
+
+Work is skipped wherever the config allows it:
+  - same chunking: chunk texts and page ranges are copied from the active version (no PDF parsing)
+  - new chunking: page texts come from the extracted-text store (the PDF is parsed only if none is stored)
+  - same embedding model: vectors of unchanged chunk texts are copied, only new texts are embedded
+    (unless the active version stores them lossy, as float16 or int8)
+"""
+from django.conf import settings
+
+from .models import PDFDocument
+from .utils import get_embedding_generator, get_vector_store, get_index_config, extract_pages, chunk_pages
+
+# Config keys that decide the chunk texts
+CHUNKING_KEYS = ('chunker', 'chunk_max_tokens', 'chunk_overlap_tokens')
+
+# Vector storage that keeps the exact float32 vectors (PQ keeps them for rescoring)
+LOSSLESS_QUANTIZATIONS = ('float32', 'pq')
+
+# Passes over documents uploaded or deleted while the new version was being built
+MAX_CATCH_UP_ROUNDS = 5
+
+
+def needs_reindex():
+    """True when the active index was built with a different (or unknown) pipeline config"""
+    return get_vector_store().index_config() != get_index_config()
+
+
+def _document_key(store, shard_key, content_hash, source):
+    """Catalog identity of one stored PDF: (shard, content hash) or (shard, source name)"""
+    shard = '' if shard_key in (None, store.MAIN_SHARD) else shard_key
+    return (shard, content_hash) if content_hash else (shard, f"source:{source}")
+
+
+def _expected_documents(store):
+    """
+    Stored PDFs the index should contain, from the database
+    Returns:
+        {document key: (PDFDocument that was ingested first, shard key)}
+    """
+    expected = {}
+    documents = PDFDocument.objects.filter(processed=True).order_by('uploaded_at')
+    for document in documents.iterator():
+        shard_key = document.get_shard_key()
+        key = _document_key(store, shard_key, document.content_hash, document.get_filename())
+        expected.setdefault(key, (document, shard_key))
+    return expected
+
+
+def _indexed_documents(store, page_size=500):
+    """Document keys present in a version's source catalog, with their source names"""
+    indexed = {}
+    page = 1
+    while True:
+        listing = store.list_sources(page=page, page_size=page_size)
+        for entry in listing['sources']:
+            shard_key = entry['shard'] or None
+            key = _document_key(store, shard_key, entry['content_hash'], entry['source'])
+            indexed[key] = (entry['source'], shard_key)
+        if page * page_size >= listing['total'] or not listing['sources']:
+            return indexed
+        page += 1
+
+
+def reindex_document(document, shard_key, target, source_store, source_config, config, embedder):
+    """
+    Build one PDF's chunks and vectors in the target version
+    Args:
+        document: PDFDocument whose file (and filename) the chunks belong to
+        shard_key: Shard holding the document
+        target: VectorStore pinned to the version being built
+        source_store: Active VectorStore (chunks and vectors to reuse)
+        source_config: Config of the active version (None = unknown, nothing is reused)
+        config: Config of the version being built
+        embedder: EmbeddingGenerator of the new config
+    Returns:
+        Dict with 'chunks', 'embedded' and 'rechunked' (whether chunks were rebuilt from page texts)
+    """
+    filename = document.get_filename()
+    stored = {'documents': [], 'metadatas': [], 'embeddings': []}
+    if source_config:
+        stored = source_store.get_documents(
+            filter_source=None if document.content_hash else filename,
+            filter_content_hash=document.content_hash or None,
+            shard_key=shard_key,
+            include_embeddings=True
+        )
+
+    same_chunking = bool(source_config) and all(source_config.get(key) == config[key] for key in CHUNKING_KEYS)
+    same_model = bool(source_config) and source_config.get('embedding_model') == config['embedding_model']
+    # Dequantized vectors would carry the quantization error into the new version
+    same_model = same_model and source_config.get('vector_quantization', 'float32') in LOSSLESS_QUANTIZATIONS
+
+    rechunked = False
+    if same_chunking and stored['documents']:
+        chunks = sorted((
+            dict({'text': text, 'chunk_id': metadata['chunk_id']},
+                 **{key: metadata[key] for key in ('page_start', 'page_end') if key in metadata})
+            for text, metadata in zip(stored['documents'], stored['metadatas'])
+        ), key=lambda chunk: chunk['chunk_id'])
+    else:
+        pages, _ = extract_pages(document)
+        chunks = chunk_pages(pages, embedder)
+        rechunked = True
+
+    # Unchanged text under the same model: the stored vector is still valid
+    vectors = dict(zip(stored['documents'], stored['embeddings'])) if same_model else {}
+    to_embed = []
+    for chunk in chunks:
+        if chunk['text'] in vectors:
+            chunk['embedding'] = vectors[chunk['text']]
+        else:
+            to_embed.append(chunk)
+    if to_embed:
+        embedder.encode_chunks(to_embed)
+
+    target.add_documents(chunks, filename, content_hash=document.content_hash or None, shard_key=shard_key)
+    return {'chunks': len(chunks), 'embedded': len(to_embed), 'rechunked': rechunked}
+
+
+def _sync_documents(target, source_store, source_config, config, embedder, progress_callback=None):
+    """
+    Make a version hold exactly the processed PDFs in the database
+    Returns:
+        Dict with the number of documents 'indexed' and 'removed', and per-document chunk counts
+    """
+    expected = _expected_documents(target)
+    indexed = _indexed_documents(target)
+
+    removed = 0
+    for key, (source, shard_key) in indexed.items():
+        if key not in expected:
+            _, identity = key
+            if identity.startswith("source:"):
+                target.delete_by_source(source, shard_key=shard_key or target.MAIN_SHARD)
+            else:
+                target.delete_by_content_hash(identity, shard_key=shard_key or target.MAIN_SHARD)
+            removed += 1
+
+    missing = [key for key in expected if key not in indexed]
+    stats = {'indexed': 0, 'removed': removed, 'chunks': {}, 'embedded': 0, 'rechunked': 0}
+    for i, key in enumerate(missing):
+        document, shard_key = expected[key]
+        result = reindex_document(document, shard_key, target, source_store, source_config, config, embedder)
+        stats['indexed'] += 1
+        stats['chunks'][key] = result['chunks']
+        stats['embedded'] += result['embedded']
+        stats['rechunked'] += int(result['rechunked'])
+        if progress_callback:
+            progress_callback((i + 1) / len(missing))
+    return stats
+
+
+def reindex(force=False, keep_versions=None, progress_callback=None):
+    """
+    Rebuild the index with the current pipeline config and switch to it
+    Safe to re-run after a crash: the unfinished version is resumed.
+
+    Args:
+        force: Rebuild even if the active version already matches the config
+        keep_versions: Inactive versions kept after the switch (default: settings.INDEX_KEEP_VERSIONS)
+        progress_callback: Optional callable(fraction) called as documents are indexed
+
+    Returns:
+        dict: version names and document/chunk counts
+    """
+    store = get_vector_store()
+    config = get_index_config()
+    source_config = store.index_config()
+    previous = store.active_name
+
+    if source_config == config and not force:
+        return {'status': 'up_to_date', 'version': previous}
+
+    embedder = get_embedding_generator()
+    target = store.create_version(config)
+    print(f"Re-indexing into {target.active_name} (active: {previous})")
+
+    def report(fraction):
+        if progress_callback:
+            progress_callback(min(fraction, 1.0) * 0.95)
+
+    # First pass does the bulk of the work; later passes pick up uploads/deletes made meanwhile
+    totals = {'indexed': 0, 'removed': 0, 'embedded': 0, 'rechunked': 0}
+    chunk_counts = {}
+    for round_number in range(MAX_CATCH_UP_ROUNDS):
+        stats = _sync_documents(target, store, source_config, config, embedder,
+                              report if round_number == 0 else None)
+        for name in totals:
+            totals[name] += stats[name]
+        chunk_counts.update(stats['chunks'])
+        if not stats['indexed'] and not stats['removed']:
+            break
+
+    store.activate_version(target.active_name)
+
+    # Writes that reached the old version between the last pass and the switch
+    stats = _sync_documents(store, store, None, config, embedder)
+    chunk_counts.update(stats['chunks'])
+
+    # Chunk counts change with the chunking config
+    for (shard, identity), chunks in chunk_counts.items():
+        if identity.startswith("source:"):
+            documents = PDFDocument.objects.filter(content_hash='', file__endswith=f"/{identity[len('source:'):]}")
+        else:
+            documents = PDFDocument.objects.filter(content_hash=identity)
+        documents.update(num_chunks=chunks)
+
+    if keep_versions is None:
+        keep_versions = getattr(settings, 'INDEX_KEEP_VERSIONS', 1)
+    inactive = [name for name in store.list_versions() if name != store.active_name]
+    dropped = inactive[:max(len(inactive) - keep_versions, 0)]
+    for name in dropped:
+        store.drop_version(name)
+
+    if progress_callback:
+        progress_callback(1.0)
+
+    return dict(totals, status='reindexed', version=store.active_name, previous=previous, dropped=dropped)
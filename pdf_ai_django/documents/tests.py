@@ -0,0 +1,115 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .jobs import claim_next_job, enqueue_ingestion, requeue_stale_jobs, run_worker
+from .models import DocumentSummary, IngestionJob, PDFDocument
+
+
+def fake_process_pdf(document, progress_callback=None):
+    """Stands in for extract -> chunk -> embed -> store (no model, no vector store)"""
+    for stage in ('extract', 'chunk', 'embed', 'store'):
+        progress_callback(stage, 1.0)
+    return True, 'ok', 3, 2
+
+
+@override_settings(INGESTION_JOB_TIMEOUT=60)
+class IngestionQueueTests(TestCase):
+    """The DB-backed job queue, driven the way a local worker process drives it"""
+
+    def setUp(self):
+        self.document = PDFDocument.objects.create(title='Manual', file='pdfs/manual.pdf', file_size=1)
+
+    def stale(self, job, attempts):
+        """Make a job look claimed by a worker that stopped sending heartbeats"""
+        long_ago = timezone.now() - timedelta(seconds=61)
+        IngestionJob.objects.filter(pk=job.pk).update(
+            status=IngestionJob.STATUS_RUNNING, worker='dead-worker', attempts=attempts, heartbeat_at=long_ago
+        )
+
+    @mock.patch('documents.jobs.record_trace')
+    @mock.patch('documents.jobs.get_qa_engine')
+    @mock.patch('documents.jobs.process_pdf', side_effect=fake_process_pdf)
+    def test_burst_worker_runs_queued_job(self, process_pdf, get_qa_engine, record_trace):
+        get_qa_engine.return_value.summarize_document.return_value = 'A short summary'
+        job = enqueue_ingestion(self.document)
+
+        self.assertEqual(run_worker(worker_name='test-worker', burst=True), 1)
+
+        job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_DONE)
+        self.assertEqual((job.worker, job.attempts, job.progress), ('test-worker', 1, 100))
+        self.assertEqual(self.document.status, PDFDocument.STATUS_COMPLETED)
+        self.assertTrue(self.document.processed)
+        self.assertEqual((self.document.num_chunks, self.document.num_pages), (3, 2))
+        self.assertEqual(self.document.ingest_trace['pipeline'], 'ingest')
+        self.assertEqual(DocumentSummary.objects.get(document=self.document).summary_text, 'A short summary')
+        record_trace.assert_called_once()
+
+    @mock.patch('documents.jobs.record_trace')
+    @mock.patch('documents.jobs.process_pdf', return_value=(False, 'No text found', 0, 0))
+    def test_failed_pipeline_fails_job(self, process_pdf, record_trace):
+        job = enqueue_ingestion(self.document)
+
+        self.assertEqual(run_worker(worker_name='test-worker', burst=True), 1)
+
+        job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual((job.status, job.error), (IngestionJob.STATUS_FAILED, 'No text found'))
+        self.assertEqual(self.document.status, PDFDocument.STATUS_FAILED)
+
+    def test_only_one_worker_claims_a_job(self):
+        job = enqueue_ingestion(self.document)
+        real_now = timezone.now
+        rival = {}
+
+        def now():
+            # worker-1 claims the job after worker-2 listed it as queued, before worker-2's UPDATE
+            if not rival:
+                rival['claimed'] = None
+                rival['claimed'] = claim_next_job('worker-1')
+            return real_now()
+
+        with mock.patch('django.utils.timezone.now', side_effect=now):
+            claimed = claim_next_job('worker-2')
+
+        self.assertIsNone(claimed)
+        self.assertEqual(rival['claimed'].pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), (IngestionJob.STATUS_RUNNING, 'worker-1', 1))
+        self.assertIsNone(claim_next_job('worker-3'))
+
+    def test_stale_job_is_requeued(self):
+        job = enqueue_ingestion(self.document)
+        self.stale(job, attempts=1)
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (IngestionJob.STATUS_QUEUED, ''))
+        claimed = claim_next_job('worker-2')
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 2))
+
+    def test_recent_heartbeat_is_not_requeued(self):
+        job = enqueue_ingestion(self.document)
+        claim_next_job('worker-1')
+
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_RUNNING)
+
+    def test_attempts_cap_fails_job(self):
+        job = enqueue_ingestion(self.document)
+        self.stale(job, attempts=job.max_attempts)
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+
+        job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual((job.status, job.error), (IngestionJob.STATUS_FAILED, 'Worker stopped responding'))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.document.status, PDFDocument.STATUS_FAILED)
+        self.assertIsNone(claim_next_job('worker-2'))
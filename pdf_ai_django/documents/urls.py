@@ -5,9 +5,13 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('upload/', views.upload_pdf, name='upload_pdf'),
     path('ask/', views.ask_question, name='ask_question'),
+    path('ask/stream/', views.ask_question_stream, name='ask_question_stream'),
+    path('ask/batch/', views.ask_batch, name='ask_batch'),
     path('documents/', views.document_list, name='document_list'),
     path('documents/<int:pk>/', views.document_detail, name='document_detail'),
     path('documents/<int:pk>/summary/', views.generate_summary, name='generate_summary'),
     path('documents/<int:pk>/delete/', views.delete_document, name='delete_document'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
     path('questions/', views.question_history, name='question_history'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
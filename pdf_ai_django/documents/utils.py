@@ -1,8 +1,11 @@
 """
 Utility functions for the documents app
 """
+import hashlib
 import os
 import sys
+import threading
+import time
 from pathlib import Path
 from django.conf import settings
 
@@ -10,80 +13,407 @@ from django.conf import settings
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from pdf_loader import PDFLoader
-from embeddings import EmbeddingGenerator
-from vector_store import VectorStore
-from qa_engine import QAEngine
+# Heavy modules (sentence_transformers, chromadb) are imported on first use, not at import time
 
-# Global instances (singleton pattern)
-_embedding_generator = None
-_vector_store = None
-_qa_engine = None
+# Shared component registry: one embedding model / Chroma client / QA engine per process
+_components = {}
+_components_lock = threading.RLock()  # re-entrant: factories fetch their dependencies
+
+# Number of chunks embedded between two progress reports
+EMBED_PROGRESS_STEP = 256
+
+# Bump when the chunking algorithm changes, so existing indexes are rebuilt
+CHUNKER_VERSION = 'sentence-v1'
+
+
+def _get_component(name, factory):
+    """Return the shared component called name, creating it with factory() on first use"""
+    component = _components.get(name)
+    if component is None:
+        with _components_lock:
+            # Another thread may have built it while we were waiting
+            component = _components.get(name)
+            if component is None:
+                component = factory()
+                _components[name] = component
+    return component
+
+
+def _create_embedding_generator():
+    from embeddings import EmbeddingGenerator
+
+    cache_dir = getattr(settings, 'EMBEDDING_CACHE_DIR', None)
+    return EmbeddingGenerator(
+        model_name=getattr(settings, 'EMBEDDING_MODEL', 'all-MiniLM-L6-v2'),
+        cache_dir=str(cache_dir) if cache_dir else None,
+        cache_max_bytes=getattr(settings, 'EMBEDDING_CACHE_MAX_MB', 512) * 1024 * 1024,
+        cache_dtype=getattr(settings, 'EMBEDDING_CACHE_DTYPE', 'float16')
+    )
+
+
+def _create_vector_store():
+    from vector_store import VectorStore
+
+    persist_dir = str(settings.CHROMA_PERSIST_DIR)
+    store = VectorStore(
+        persist_directory=persist_dir,
+        backend=getattr(settings, 'VECTOR_BACKEND', 'chroma'),
+        sharding=getattr(settings, 'VECTOR_SHARDING', 'none'),
+        num_shards=getattr(settings, 'VECTOR_NUM_SHARDS', 8),
+        query_workers=getattr(settings, 'VECTOR_SHARD_QUERY_WORKERS', 4),
+        quantization=getattr(settings, 'VECTOR_QUANTIZATION', 'float32'),
+        hnsw=get_hnsw_params()
+    )
+    # A new, empty index is built with the current pipeline config by definition
+    config = store.index_config()
+    if config is None and not store.get_stats()['total_chunks']:
+        store.set_index_config(get_index_config())
+    elif config is not None:
+        # Indexes built before these settings existed hold float32 vectors in default HNSW graphs
+        upgraded = dict({'vector_quantization': 'float32'}, **config)
+        if store.backend == 'chroma':
+            upgraded.setdefault('hnsw', dict(store.HNSW_DEFAULTS))
+        if upgraded != config:
+            store.set_index_config(upgraded)
+    return store
+
+
+def _create_text_store():
+    from text_artifacts import PageTextStore
+
+    return PageTextStore(str(settings.TEXT_ARTIFACT_DIR))
+
+
+def _create_reranker():
+    from reranker import CrossEncoderReranker
+
+    return CrossEncoderReranker(
+        model_name=settings.QA_RERANKER_MODEL,
+        batch_size=getattr(settings, 'QA_RERANK_BATCH_SIZE', 32),
+        cache_size=getattr(settings, 'QA_RERANK_CACHE_SIZE', 4096)
+    )
+
+
+def _create_summary_cache():
+    from summarizer import SummaryCache
+
+    path = getattr(settings, 'SUMMARY_CACHE_PATH', None)
+    return SummaryCache(str(path)) if path else None
+
+
+def _create_metrics_store():
+    from tracing import MetricsStore
+
+    return MetricsStore(str(settings.METRICS_PATH))
+
+
+def _create_qa_engine():
+    from functools import partial
+    from qa_engine import QAEngine
+    from ollama_client import AsyncOllamaClient, OllamaClient
+
+    model = settings.OLLAMA_MODEL
+    url = settings.OLLAMA_URL
+    client_options = dict(
+        pool_size=getattr(settings, 'OLLAMA_POOL_SIZE', 10),
+        max_retries=getattr(settings, 'OLLAMA_MAX_RETRIES', 2),
+        connect_timeout=getattr(settings, 'OLLAMA_CONNECT_TIMEOUT', 5),
+        read_timeout=getattr(settings, 'OLLAMA_READ_TIMEOUT', 120),
+        max_concurrent=getattr(settings, 'OLLAMA_MAX_CONCURRENT', 4),
+        queue_timeout=getattr(settings, 'OLLAMA_QUEUE_TIMEOUT', 60)
+    )
+    # Reuse the shared model and Chroma client instead of loading a second copy
+    return QAEngine(
+        model=model,
+        ollama_url=url,
+        ollama_client=OllamaClient(url, **client_options),
+        async_ollama_factory=partial(AsyncOllamaClient, url, **client_options),
+        async_workers=getattr(settings, 'QA_ASYNC_WORKERS', 8),
+        embedding_generator=get_embedding_generator(),
+        vector_store=get_vector_store(),
+        text_store=get_text_store(),
+        embedding_cache_size=getattr(settings, 'QA_EMBEDDING_CACHE_SIZE', 1024),
+        embedding_cache_ttl=getattr(settings, 'QA_EMBEDDING_CACHE_TTL', 3600),
+        answer_cache_size=getattr(settings, 'QA_ANSWER_CACHE_SIZE', 256),
+        answer_cache_ttl=getattr(settings, 'QA_ANSWER_CACHE_TTL', 600),
+        retrieval_mode=getattr(settings, 'QA_RETRIEVAL_MODE', 'hybrid'),
+        hybrid_candidates=getattr(settings, 'QA_HYBRID_CANDIDATES', 20),
+        context_token_budget=getattr(settings, 'QA_CONTEXT_TOKEN_BUDGET', 1500),
+        summary_workers=getattr(settings, 'SUMMARY_WORKERS', 2),
+        summary_cache=_create_summary_cache(),
+        batch_workers=getattr(settings, 'QA_BATCH_WORKERS', 2),
+        reranker=get_reranker(),
+        rerank_candidates=getattr(settings, 'QA_RERANK_CANDIDATES', 40)
+    )
 
 
 def get_embedding_generator():
     """Get or create embedding generator instance"""
-    global _embedding_generator
-    if _embedding_generator is None:
-        _embedding_generator = EmbeddingGenerator()
-    return _embedding_generator
+    return _get_component('embedding_generator', _create_embedding_generator)
 
 
 def get_vector_store():
     """Get or create vector store instance"""
-    global _vector_store
-    if _vector_store is None:
-        persist_dir = str(settings.CHROMA_PERSIST_DIR)
-        _vector_store = VectorStore(persist_directory=persist_dir)
-    return _vector_store
+    return _get_component('vector_store', _create_vector_store)
+
+
+def get_text_store():
+    """Get or create the extracted page text store (None when disabled)"""
+    if not getattr(settings, 'TEXT_ARTIFACT_DIR', None):
+        return None
+    return _get_component('text_store', _create_text_store)
+
+
+def get_reranker():
+    """Get or create the cross-encoder reranker (None when reranking is disabled)"""
+    if not getattr(settings, 'QA_RERANKER_MODEL', ''):
+        return None
+    return _get_component('reranker', _create_reranker)
 
 
 def get_qa_engine():
     """Get or create QA engine instance"""
-    global _qa_engine
-    if _qa_engine is None:
-        model = settings.OLLAMA_MODEL
-        url = settings.OLLAMA_URL
-        _qa_engine = QAEngine(model=model, ollama_url=url)
-    return _qa_engine
+    return _get_component('qa_engine', _create_qa_engine)
+
+
+def get_metrics_store():
+    """Get or create the pipeline metrics store (None when metrics are disabled)"""
+    if not getattr(settings, 'METRICS_PATH', None):
+        return None
+    return _get_component('metrics_store', _create_metrics_store)
+
+
+def record_trace(request_trace):
+    """Add a finished trace to the metrics (no-op when metrics are disabled)"""
+    import sqlite3
+
+    metrics = get_metrics_store()
+    if metrics is None:
+        return
+    try:
+        metrics.record(request_trace)
+    except sqlite3.Error as e:
+        print(f"Could not record metrics: {e}")
 
 
-def process_pdf(pdf_document):
+async def aget_qa_engine():
+    """get_qa_engine() for async views: the first call loads the models off the event loop"""
+    engine = _components.get('qa_engine')
+    if engine is None:
+        from asgiref.sync import sync_to_async
+
+        engine = await sync_to_async(get_qa_engine, thread_sensitive=False)()
+    return engine
+
+
+async def aclose_components():
+    """Release what the async views opened on the running event loop (ASGI server shutdown)"""
+    engine = _components.get('qa_engine')
+    if engine is not None:
+        await engine.aclose()
+
+
+COMPONENT_GETTERS = {
+    'embedding_generator': get_embedding_generator,
+    'vector_store': get_vector_store,
+    'reranker': get_reranker,
+    'qa_engine': get_qa_engine,
+}
+
+
+def warm_up(components=('embedding_generator', 'vector_store')):
+    """
+    Load components ahead of the first request
+
+    Args:
+        components: Names from COMPONENT_GETTERS to load
+
+    Returns:
+        dict: seconds spent loading each component
+    """
+    timings = {}
+    for name in components:
+        start = time.perf_counter()
+        component = COMPONENT_GETTERS[name]()
+        if name == 'embedding_generator':
+            # First encode initializes tokenizer / kernels too
+            component.encode_batch(["warm up"], show_progress=False)
+        elif name == 'reranker' and component is not None:
+            component.score_pairs([("warm up", "warm up")])
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def get_index_config():
+    """
+    Pipeline settings that determine the stored chunks and vectors
+    An index built with a different config is rebuilt by `python manage.py reindex`.
+    """
+    config = {
+        'embedding_model': getattr(settings, 'EMBEDDING_MODEL', 'all-MiniLM-L6-v2'),
+        'chunker': CHUNKER_VERSION,
+        'chunk_max_tokens': getattr(settings, 'CHUNK_MAX_TOKENS', 256),
+        'chunk_overlap_tokens': getattr(settings, 'CHUNK_OVERLAP_TOKENS', 32),
+        'vector_quantization': getattr(settings, 'VECTOR_QUANTIZATION', 'float32'),
+    }
+    # The numpy backend searches exactly and has no graph to configure
+    if getattr(settings, 'VECTOR_BACKEND', 'chroma') == 'chroma':
+        config['hnsw'] = get_hnsw_params()
+    return config
+
+
+def get_hnsw_params():
+    """HNSW parameters of new Chroma collections (see benchmarks/bench_hnsw.py for picking them)"""
+    return {
+        'M': getattr(settings, 'VECTOR_HNSW_M', 16),
+        'construction_ef': getattr(settings, 'VECTOR_HNSW_CONSTRUCTION_EF', 100),
+        'search_ef': getattr(settings, 'VECTOR_HNSW_SEARCH_EF', 50),
+    }
+
+
+def compute_content_hash(file, block_size=1024 * 1024):
+    """
+    SHA-256 of an uploaded/stored file, read in blocks so large PDFs aren't loaded at once
+
+    Args:
+        file: Django File / FieldFile
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    file.open('rb')
+    try:
+        file.seek(0)
+        for block in file.chunks(chunk_size=block_size):
+            digest.update(block)
+    finally:
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def extract_pages(pdf_document, progress_callback=None):
+    """
+    Extract and clean the text of a PDF page by page
+    Reads the stored page texts when the PDF was extracted before (no parsing),
+    otherwise extracts it and stores the texts for next time.
+
+    Args:
+        pdf_document: PDFDocument model instance
+        progress_callback: Optional callable(fraction) called after each page
+
+    Returns:
+        tuple: (list of (page_number, text) for pages with text, page count)
+    """
+    from pdf_loader import PDFLoader
+
+    loader = PDFLoader(
+        pdf_document.file.path,
+        workers=getattr(settings, 'PDF_EXTRACT_WORKERS', 1),
+        text_store=get_text_store(),
+        content_hash=pdf_document.content_hash or None
+    )
+    pages = []
+    for page_number, page_text in loader.iter_pages(method="pdfplumber"):
+        if page_text:
+            pages.append((page_number, loader.clean_text(page_text, keep_paragraphs=True)))
+        if progress_callback:
+            progress_callback(page_number / loader.num_pages)
+    return pages, loader.num_pages
+
+
+def chunk_pages(pages, embedder):
+    """
+    Chunk page texts: whole sentences, within the embedding model's token limit, with page numbers
+
+    Args:
+        pages: (page_number, text) pairs from extract_pages
+        embedder: EmbeddingGenerator whose tokenizer and limit are used
+
+    Returns:
+        list: chunk dicts (text, chunk_id, page_start, page_end)
+    """
+    from chunker import SentenceChunker
+    from tracing import span, count
+
+    chunker = SentenceChunker(
+        max_tokens=min(getattr(settings, 'CHUNK_MAX_TOKENS', 256), embedder.max_tokens),
+        overlap_tokens=getattr(settings, 'CHUNK_OVERLAP_TOKENS', 32),
+        count_tokens=embedder.count_tokens
+    )
+    with span('chunk'):
+        chunks = chunker.chunk_pages(pages)
+    count('chunks', len(chunks))
+    return chunks
+
+
+def process_pdf(pdf_document, progress_callback=None):
     """
     Process a PDF document: extract text, create chunks, generate embeddings, store in vector DB
 
     Args:
         pdf_document: PDFDocument model instance
+        progress_callback: Optional callable(stage, fraction) called as each stage advances
 
     Returns:
         tuple: (success: bool, message: str, chunks_count: int, pages_count: int)
     """
+    def report(stage, fraction):
+        if progress_callback:
+            progress_callback(stage, fraction)
+
     try:
         # Get file path
         file_path = pdf_document.file.path
 
-        # Load and process PDF
-        loader = PDFLoader(file_path)
-        chunks = loader.load_and_process(chunk_size=1000, overlap=200)
+        if not pdf_document.content_hash:
+            pdf_document.content_hash = compute_content_hash(pdf_document.file)
+            type(pdf_document).objects.filter(pk=pdf_document.pk).update(
+                content_hash=pdf_document.content_hash
+            )
 
-        if not chunks:
-            return False, "No text could be extracted from PDF", 0, 0
+        # Identical file already ingested: reuse its chunks and vectors
+        duplicate = pdf_document.find_duplicate()
+        shard_key = pdf_document.get_shard_key()
+        if duplicate and get_vector_store().has_content_hash(pdf_document.content_hash, shard_key=shard_key):
+            report('store', 1.0)
+            return True, f"Reused chunks of {duplicate.title}", duplicate.num_chunks, duplicate.num_pages
 
-        # Count pages (estimate from PyPDF2)
-        import PyPDF2
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            pages_count = len(reader.pages)
+        # Extract and clean text page by page (single pass, also gives the page count)
+        report('extract', 0.0)
+        pages, pages_count = extract_pages(pdf_document, lambda fraction: report('extract', fraction))
 
-        # Generate embeddings
+        # Chunk text: whole sentences, within the embedding model's token limit, with page numbers
+        report('chunk', 0.0)
         embedder = get_embedding_generator()
-        chunks_with_embeddings = embedder.encode_chunks(chunks)
+        chunks = chunk_pages(pages, embedder)
+        del pages
+        for chunk in chunks:
+            chunk['source'] = file_path
+
+        if not chunks:
+            return False, "No text could be extracted from PDF", 0, 0
+        report('chunk', 1.0)
+
+        # Generate embeddings (in slices so progress can be reported)
+        for start in range(0, len(chunks), EMBED_PROGRESS_STEP):
+            report('embed', start / len(chunks))
+            embedder.encode_chunks(chunks[start:start + EMBED_PROGRESS_STEP])
+        report('embed', 1.0)
 
         # Store in vector database
+        report('store', 0.0)
         store = get_vector_store()
-        store.add_documents(chunks_with_embeddings, pdf_document.get_filename())
+        store.add_documents(
+            chunks,
+            pdf_document.get_filename(),
+            content_hash=pdf_document.content_hash,
+            progress_callback=lambda fraction: report('store', fraction),
+            shard_key=shard_key
+        )
+        report('store', 1.0)
 
         return True, "Success", len(chunks), pages_count
 
     except Exception as e:
-        return False, str(e), 0, 0
\ No newline at end of file
+        return False, str(e), 0, 0
@@ -1,14 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+import json
 import time
 import os
 
-from .models import PDFDocument, Question, DocumentSummary
+from .models import PDFDocument, Question, DocumentSummary, IngestionJob
 from .forms import PDFUploadForm, QuestionForm
-from .utils import process_pdf, get_qa_engine
+from .utils import get_qa_engine, aget_qa_engine, compute_content_hash, get_metrics_store, record_trace
+from .jobs import enqueue_ingestion
+from tracing import trace
 
 
 def home(request):
@@ -52,58 +58,43 @@ def upload_pdf(request):
             # Set file size
             pdf_doc.file_size = pdf_doc.file.size
 
+            # Content hash lets ingestion reuse chunks of identical uploads
+            pdf_doc.content_hash = compute_content_hash(pdf_doc.file)
+
             # Set uploader
             if request.user.is_authenticated:
                 pdf_doc.uploaded_by = request.user
 
             pdf_doc.save()
 
-            # Process PDF in background
-            try:
-                success, message, chunks_count, pages_count = process_pdf(pdf_doc)
-
-                if success:
-                    pdf_doc.processed = True
-                    pdf_doc.num_chunks = chunks_count
-                    pdf_doc.num_pages = pages_count
-                    pdf_doc.save()
-
-                    # Auto-generate summary
-                    try:
-                        engine = get_qa_engine()
-                        summary_text = engine.summarize_document(pdf_source=pdf_doc.get_filename())
-
-                        # Save summary
-                        DocumentSummary.objects.create(
-                            document=pdf_doc,
-                            summary_text=summary_text
-                        )
+            # Queue for background processing (ingest_worker picks it up)
+            job = enqueue_ingestion(pdf_doc)
 
-                        messages.success(request, f'✅ PDF processed! {chunks_count} chunks from {pages_count} pages.')
-                    except Exception as e:
-                        messages.success(request, f'✅ PDF processed! {chunks_count} chunks from {pages_count} pages.')
+            # For AJAX requests
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({
+                    'success': True,
+                    'document_id': pdf_doc.pk,
+                    'job_id': job.pk,
+                    'status_url': reverse('job_status', args=[job.pk])
+                })
 
-                    # Redirect to chat page
-                    return redirect('document_detail', pk=pdf_doc.pk)
-                else:
-                    pdf_doc.processing_error = message
-                    pdf_doc.save()
-                    messages.error(request, f'❌ Error: {message}')
-                    return redirect('home')
+            messages.success(request, f'✅ PDF uploaded! Processing started (job #{job.pk}).')
 
-            except Exception as e:
-                pdf_doc.processing_error = str(e)
-                pdf_doc.save()
-                messages.error(request, f'❌ Error: {str(e)}')
-                return redirect('home')
+            # Redirect to chat page (shows progress until processing is done)
+            return redirect('document_detail', pk=pdf_doc.pk)
     else:
         form = PDFUploadForm()
 
     return render(request, 'documents/upload.html', {'form': form})
 
 
-def ask_question(request):
-    """Handle question asking"""
+async def ask_question(request):
+    """
+    Handle question asking
+    Async: under ASGI the LLM call is awaited on the event loop, so a pending question holds no thread.
+    WSGI runs each request in a new event loop, so it uses the sync, pooled Ollama client in a thread.
+    """
     if request.method == 'POST':
         form = QuestionForm(request.POST)
         if form.is_valid():
@@ -114,36 +105,39 @@ def ask_question(request):
             document_id = request.POST.get('document')
             document = None
             if document_id:
-                try:
-                    document = PDFDocument.objects.get(pk=document_id)
-                except PDFDocument.DoesNotExist:
-                    document = None
+                document = await PDFDocument.objects.filter(pk=document_id).afirst()
 
             # Get QA engine
-            engine = get_qa_engine()
+            engine = await aget_qa_engine()
 
             # Start timer
             start_time = time.time()
 
             # Get answer
             try:
-                pdf_source = document.get_filename() if document else None
-                result = engine.answer_question(
-                    question=question_text,
-                    top_k=top_k,
-                    pdf_source=pdf_source
-                )
+                scope = document.get_vector_filter() if document else {}
+                with trace('question') as question_trace:
+                    if isinstance(request, ASGIRequest):
+                        result = await engine.answer_question_async(question=question_text, top_k=top_k, **scope)
+                    else:
+                        result = await sync_to_async(engine.answer_question, thread_sensitive=False)(
+                            question=question_text, top_k=top_k, **scope
+                        )
+                # SQLite may wait for a lock: keep the write off the event loop
+                await sync_to_async(record_trace, thread_sensitive=False)(question_trace)
 
                 # Calculate response time
                 response_time = time.time() - start_time
 
                 # Save question and answer
-                question_obj = Question.objects.create(
+                user = await request.auser()
+                question_obj = await Question.objects.acreate(
                     document=document,
                     question_text=question_text,
                     answer_text=result['answer'],
                     response_time=response_time,
-                    asked_by=request.user if request.user.is_authenticated else None
+                    asked_by=user if user.is_authenticated else None,
+                    trace=question_trace.to_dict()
                 )
 
                 # For AJAX requests
@@ -152,6 +146,8 @@ def ask_question(request):
                         'success': True,
                         'answer': result['answer'],
                         'sources': result['sources'],
+                        'pages': result.get('pages', []),
+                        'timings': result.get('timings', {}),
                         'response_time': response_time
                     })
 
@@ -168,7 +164,8 @@ def ask_question(request):
                     'response_time': response_time,
                     'form': QuestionForm()
                 }
-                return render(request, 'documents/answer.html', context)
+                # The base template reads messages from the session (a database query)
+                return await sync_to_async(render)(request, 'documents/answer.html', context)
 
             except Exception as e:
                 messages.error(request, f'❌ Error: {str(e)}')
@@ -180,6 +177,190 @@ def ask_question(request):
 
 
 
+async def ask_question_stream(request):
+    """
+    Handle question asking, streaming the answer as Server-Sent Events
+    Under ASGI the events come from an async generator (no thread per open stream);
+    WSGI servers can only send a plain iterator, so they get the sync one.
+    """
+    if request.method != 'POST':
+        return redirect('home')
+
+    form = QuestionForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'error': form.errors.as_text()}, status=400)
+
+    question_text = form.cleaned_data['question']
+    top_k = form.cleaned_data.get('top_k', 5)
+
+    document = None
+    document_id = request.POST.get('document')
+    if document_id:
+        document = await PDFDocument.objects.filter(pk=document_id).afirst()
+
+    user = await request.auser()
+    asked_by = user if user.is_authenticated else None
+    engine = await aget_qa_engine()
+    scope = document.get_vector_filter() if document else {}
+
+    def done_event(event, start_time, question_obj):
+        return {
+            'type': 'done',
+            'question_id': question_obj.pk,
+            'sources': event['sources'],
+            'pages': event.get('pages', []),
+            'timings': event.get('timings', {}),
+            'response_time': time.time() - start_time,
+            'cached': event.get('cached', False)
+        }
+
+    def save_question(answer, start_time, question_trace):
+        # Persist the full answer once generation has finished
+        return Question.objects.create(
+            document=document,
+            question_text=question_text,
+            answer_text=answer,
+            response_time=time.time() - start_time,
+            asked_by=asked_by,
+            trace=question_trace.to_dict()
+        )
+
+    def event_stream():
+        start_time = time.time()
+        try:
+            with trace('question') as question_trace:
+                for event in engine.answer_question_stream(question=question_text, top_k=top_k, **scope):
+                    if event['type'] == 'done':
+                        question_obj = save_question(event['answer'], start_time, question_trace)
+                        event = done_event(event, start_time, question_obj)
+                    yield f"data: {json.dumps(event)}\n\n"
+            record_trace(question_trace)
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+
+    async def async_event_stream():
+        start_time = time.time()
+        try:
+            with trace('question') as question_trace:
+                async for event in engine.answer_question_stream_async(question=question_text, top_k=top_k,
+                                                                       **scope):
+                    if event['type'] == 'done':
+                        question_obj = await sync_to_async(save_question)(event['answer'], start_time,
+                                                                          question_trace)
+                        event = done_event(event, start_time, question_obj)
+                    yield f"data: {json.dumps(event)}\n\n"
+            await sync_to_async(record_trace, thread_sensitive=False)(question_trace)
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+
+    stream = async_event_stream() if isinstance(request, ASGIRequest) else event_stream()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+@csrf_exempt
+async def ask_batch(request):
+    """
+    Answer a batch of questions, streaming one JSON line per answer (JSONL)
+
+    POST body (JSON): {"questions": [...], "document": optional document id, "top_k": 5}
+    Each line holds the question's 'index' in the batch; lines arrive as answers are ready.
+    Under ASGI the lines come from an async generator (Django would buffer a sync one);
+    WSGI servers can only send a plain iterator, so they get the sync one.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST a JSON body'}, status=405)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+        questions = payload['questions']
+        top_k = int(payload.get('top_k', 5))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Expected {"questions": [...]}'}, status=400)
+
+    max_questions = getattr(settings, 'QA_BATCH_MAX_QUESTIONS', 500)
+    if (not isinstance(questions, list) or not questions
+            or not all(isinstance(q, str) and q.strip() and len(q) <= 1000 for q in questions)):
+        return JsonResponse({'success': False, 'error': 'questions must be a list of non-empty strings'},
+                            status=400)
+    if len(questions) > max_questions:
+        return JsonResponse({'success': False, 'error': f'At most {max_questions} questions per batch'},
+                            status=400)
+    if not 1 <= top_k <= 20:
+        return JsonResponse({'success': False, 'error': 'top_k must be between 1 and 20'}, status=400)
+
+    document = None
+    document_id = payload.get('document')
+    if document_id:
+        document = await PDFDocument.objects.filter(pk=document_id).afirst()
+        if document is None:
+            return JsonResponse({'success': False, 'error': 'Document not found'}, status=404)
+
+    user = await request.auser()
+    asked_by = user if user.is_authenticated else None
+    engine = await aget_qa_engine()
+    scope = document.get_vector_filter() if document else {}
+
+    def save_result(result, start_time):
+        # Returns the JSON line of one answer, once its Question row is saved
+        response_time = time.time() - start_time
+        question_obj = Question.objects.create(
+            document=document,
+            question_text=result['question'],
+            answer_text=result['answer'],
+            response_time=response_time,
+            asked_by=asked_by,
+            trace={'pipeline': 'batch', 'stages_ms': result.get('timings', {})}
+        )
+        line = {
+            'index': result['index'],
+            'question': result['question'],
+            'question_id': question_obj.pk,
+            'answer': result['answer'],
+            'sources': result['sources'],
+            'pages': result.get('pages', []),
+            'timings': result.get('timings', {}),
+            'response_time': response_time,
+            'cached': result.get('cached', False)
+        }
+        return json.dumps(line) + "\n"
+
+    def result_stream():
+        start_time = time.time()
+        try:
+            # One trace for the whole batch: retrieval is shared, answers are generated concurrently
+            with trace('batch') as batch_trace:
+                for result in engine.answer_questions(questions, top_k=top_k, **scope):
+                    yield save_result(result, start_time)
+            record_trace(batch_trace)
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + "\n"
+
+    async def async_result_stream():
+        start_time = time.time()
+        try:
+            with trace('batch') as batch_trace:
+                results = engine.answer_questions(questions, top_k=top_k, **scope)
+                # The batch runs in a worker thread, one answer per step, so each line is sent when ready
+                next_result = sync_to_async(next, thread_sensitive=False)
+                while True:
+                    result = await next_result(results, None)
+                    if result is None:
+                        break
+                    yield await sync_to_async(save_result)(result, start_time)
+            await sync_to_async(record_trace, thread_sensitive=False)(batch_trace)
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + "\n"
+
+    stream = async_result_stream() if isinstance(request, ASGIRequest) else result_stream()
+    response = StreamingHttpResponse(stream, content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def document_list(request):
     """List all documents"""
     documents = PDFDocument.objects.filter(processed=True)
@@ -208,6 +389,7 @@ def document_detail(request, pk):
         'document': document,
         'questions': questions,
         'summary': summary,
+        'job': document.latest_job,
         'question_form': QuestionForm(initial={'document': document})
     }
 
@@ -229,19 +411,18 @@ def generate_summary(request, pk):
     # Generate summary (kendi kendine)
     try:
         engine = get_qa_engine()
-        summary_text = engine.summarize_document(pdf_source=pdf_doc.get_filename())
+        summary_text = engine.summarize_document(**document.get_vector_filter())
 
         # Save summary
         DocumentSummary.objects.create(
-            document=pdf_doc,
+            document=document,
             summary_text=summary_text
         )
 
-        messages.success(request, f'✅ PDF processed! {chunks_count} chunks from {pages_count} pages. Summary ready!')
+        messages.success(request, f'✅ Summary ready! ({document.num_chunks} chunks from {document.num_pages} pages)')
     except Exception as e:
         # Don't fail if Ollama is not running
-        messages.warning(request,
-                         f'✅ PDF processed! {chunks_count} chunks. (Summary generation failed - make sure Ollama is running)')
+        messages.warning(request, '⚠️ Summary generation failed - make sure Ollama is running')
 
     return redirect('document_detail', pk=pk)
 
@@ -255,10 +436,30 @@ def delete_document(request, pk):
         try:
             from .utils import get_vector_store
             store = get_vector_store()
-            store.delete_by_source(document.get_filename())
+            shard_key = document.get_shard_key()
+            if document.content_hash:
+                # Vectors are shared by identical uploads in the same shard; keep them while another copy exists
+                shared = any(
+                    other.get_shard_key() == shard_key
+                    for other in PDFDocument.objects.filter(
+                        content_hash=document.content_hash
+                    ).exclude(pk=document.pk)
+                )
+                if not shared:
+                    store.delete_by_content_hash(document.content_hash, shard_key=shard_key)
+            else:
+                store.delete_by_source(document.get_filename(), shard_key=shard_key)
         except Exception as e:
             print(f"Error deleting from vector store: {e}")
 
+        # Stored page texts are shared by every copy of the file, in any shard
+        if document.content_hash and not PDFDocument.objects.filter(
+                content_hash=document.content_hash).exclude(pk=document.pk).exists():
+            from .utils import get_text_store
+            text_store = get_text_store()
+            if text_store is not None:
+                text_store.delete(document.content_hash)
+
         # Delete file
         if document.file:
             if os.path.isfile(document.file.path):
@@ -273,6 +474,36 @@ def delete_document(request, pk):
     return render(request, 'documents/document_confirm_delete.html', {'document': document})
 
 
+async def job_status(request, pk):
+    """Polling endpoint: ingestion job status and progress as JSON (async: polls hold no thread)"""
+    job = await IngestionJob.objects.select_related('document').filter(pk=pk).afirst()
+    if job is None:
+        raise Http404('No IngestionJob matches the given query.')
+    document = job.document
+
+    data = job.to_dict()
+    data['document'] = {
+        'id': document.pk,
+        'title': document.title,
+        'status': document.status,
+        'progress': document.progress,
+        'processed': document.processed,
+        'num_pages': document.num_pages,
+        'num_chunks': document.num_chunks,
+        'processing_error': document.processing_error,
+    }
+
+    return JsonResponse(data)
+
+
+def metrics(request):
+    """Per-stage pipeline latency histograms and counters, in the Prometheus text format"""
+    store = get_metrics_store()
+    if store is None:
+        raise Http404('Metrics are disabled (METRICS_PATH is not set)')
+    return HttpResponse(store.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def question_history(request):
     """View all questions asked"""
     questions = Question.objects.all()
@@ -0,0 +1,246 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent on-disk embedding cache keyed by (model name, normalized text hash)
+
+    Vectors live in a fixed-capacity memory-mapped array (float16 or float32);
+    a small SQLite index maps keys to slots and tracks last use for LRU eviction.
+    Safe to share between processes (writes are serialized by SQLite) and threads.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dimension: int,
+                 max_bytes: int = 512 * 1024 * 1024, dtype: str = "float16"):
+        """
+        Open (or create) the cache for one model
+        Args:
+            cache_dir: Root directory for all cached models
+            model_name: Embedding model name (part of the key)
+            dimension: Embedding dimension of the model
+            max_bytes: Size bound of the vector file; least recently used entries are evicted
+            dtype: 'float16' (half the disk/RAM) or 'float32'
+        """
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.capacity = max(1, max_bytes // (dimension * self.dtype.itemsize))
+
+        safe_name = re.sub(r'[^\w\-.]', '_', model_name)
+        self.directory = os.path.join(cache_dir, f"{safe_name}-{dimension}-{dtype}")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"),
+                                   timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+
+        # Slot count is fixed at creation; a changed size bound starts a fresh cache
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'capacity'").fetchone()
+        if row is not None and row[0] != self.capacity:
+            self._db.executescript("DELETE FROM entries; DELETE FROM meta;")
+            for name in ("vectors.bin", "checks.bin"):
+                path = os.path.join(self.directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('capacity', ?)", (self.capacity,))
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('next_slot', 0)")
+
+        self._vectors = self._open_memmap("vectors.bin", self.dtype, (self.capacity, dimension))
+        # First 8 bytes of each slot's key (0 = slot being written): guards against reading a re-used slot
+        self._checks = self._open_memmap("checks.bin", np.dtype("int64"), (self.capacity,))
+
+    def _open_memmap(self, name: str, dtype: np.dtype, shape: tuple) -> np.memmap:
+        """Open a memory-mapped array, creating it (sparse) on first use"""
+        path = os.path.join(self.directory, name)
+        mode = "r+" if os.path.exists(path) else "w+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text so trivially different copies share a cache entry"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def make_key(self, text: str) -> str:
+        """Cache key for a text under this model"""
+        payload = f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    @staticmethod
+    def _check_value(key: str) -> int:
+        return int(key[:16], 16) - (1 << 63)
+
+    def _lookup_slots(self, keys: List[str]) -> dict:
+        """Map keys present in the index to their slots"""
+        slots = {}
+        unique_keys = list(set(keys))
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            slots.update(rows)
+        return slots
+
+    def get_many(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """
+        Look up several texts
+        Args:
+            texts: Input texts
+        Returns:
+            (vectors, keys): float32 vector or None (miss) per text, and the cache keys
+        """
+        keys = [self.make_key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            slots = self._lookup_slots(keys)
+
+        found = set()
+        for i, key in enumerate(keys):
+            slot = slots.get(key)
+            check = self._check_value(key)
+            if slot is None or self._checks[slot] != check:
+                continue
+            vector = np.array(self._vectors[slot], dtype=np.float32)
+            # The slot may have been recycled (by any process) while it was copied
+            if self._checks[slot] == check:
+                results[i] = vector
+                found.add(key)
+
+        hit_count = sum(1 for vector in results if vector is not None)
+        self.hits += hit_count
+        self.misses += len(texts) - hit_count
+
+        if found:
+            now = time.time()
+            with self._lock:
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                     [(now, key) for key in found])
+
+        return results, keys
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """
+        Store vectors, evicting least recently used entries when full
+        Args:
+            keys: Cache keys (from make_key / get_many)
+            vectors: Array of shape (len(keys), dimension)
+        """
+        # One row per key, never more than fits
+        pending = list(dict(zip(keys, range(len(keys)))).items())[-self.capacity:]
+        if not pending:
+            return
+
+        with self._lock:
+            self._put_locked(pending, vectors)
+
+    def _put_locked(self, pending: List[Tuple[str, int]], vectors: np.ndarray) -> None:
+        """Write (key, row index) pairs inside one SQLite write transaction"""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            # Same key means same model and text, so stored vectors never need rewriting
+            existing = self._lookup_slots([key for key, _ in pending])
+            new_items = [(key, index) for key, index in pending if key not in existing]
+            if not new_items:
+                self._db.execute("COMMIT")
+                return
+
+            next_slot = self._db.execute("SELECT value FROM meta WHERE name = 'next_slot'").fetchone()[0]
+            free = min(self.capacity - next_slot, len(new_items))
+            new_slots = list(range(next_slot, next_slot + free))
+            self._db.execute("UPDATE meta SET value = ? WHERE name = 'next_slot'", (next_slot + free,))
+
+            # Cache is full: recycle the least recently used slots
+            needed = len(new_items) - free
+            if needed > 0:
+                victims = self._db.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (needed,)
+                ).fetchall()
+                self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+                new_slots.extend(slot for _, slot in victims)
+                self.evictions += len(victims)
+
+            # Readers don't lock: invalidate the slots, write the vectors, and only then
+            # publish the new checks, so a reader never accepts a half-written vector
+            self._checks[new_slots] = 0
+            self._checks.flush()
+            now = time.time()
+            rows = []
+            for (key, index), slot in zip(new_items, new_slots):
+                self._vectors[slot] = vectors[index]
+                rows.append((key, slot, now))
+            self._vectors.flush()
+            for (key, _), slot in zip(new_items, new_slots):
+                self._checks[slot] = self._check_value(key)
+            self._checks.flush()
+            self._db.executemany("INSERT INTO entries VALUES (?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Hit/miss counters (this process) and cache size"""
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model_name,
+            'dtype': self.dtype.name,
+            'entries': len(self),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        """Drop every cached vector for this model"""
+        with self._lock:
+            self._db.executescript("DELETE FROM entries; UPDATE meta SET value = 0 WHERE name = 'next_slot';")
+            self._checks[:] = 0
+        self._checks.flush()
+
+
+if __name__ == "__main__":
+    # Test the cache with random vectors
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(tmp, "test-model", dimension=4, max_bytes=4 * 2 * 3)
+        texts = ["first text", "second  text", "third text", "fourth text"]
+
+        vectors, keys = cache.get_many(texts)
+        cache.put_many(keys, np.random.rand(len(texts), 4).astype(np.float32))
+
+        vectors, _ = cache.get_many(["second text", "fourth text", "first text"])
+        print(f"Hits: {[v is not None for v in vectors]}")
+        print(f"Stats: {cache.stats()}")
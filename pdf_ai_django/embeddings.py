@@ -1,12 +1,16 @@
-from sentence_transformers import SentenceTransformer
 from typing import List
 import numpy as np
 
+from embedding_cache import EmbeddingCache
+from context_packer import approximate_token_count
+from tracing import span, count
+
 
 class EmbeddingGenerator:
     """Generate embeddings for text using sentence transformers"""
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_dir: str = None,
+                 cache_max_bytes: int = 512 * 1024 * 1024, cache_dtype: str = "float16"):
         """
         Initialize embedding model
         Args:
@@ -14,13 +18,27 @@ class EmbeddingGenerator:
                 - 'all-MiniLM-L6-v2' (fast, 384 dimensions) - RECOMMENDED
                 - 'all-mpnet-base-v2' (better quality, 768 dimensions)
                 - 'multi-qa-MiniLM-L6-cos-v1' (optimized for Q&A)
+            cache_dir: Optional directory for the persistent embedding cache (None = no cache)
+            cache_max_bytes: Size bound of the cache, least recently used vectors are evicted
+            cache_dtype: 'float16' or 'float32' storage for cached vectors
         """
+        # Imported here so importing this module stays cheap (torch loads with it)
+        from sentence_transformers import SentenceTransformer
+
         print(f"Loading embedding model: {model_name}")
         self.model = SentenceTransformer(model_name)
         self.model_name = model_name
         self.dimension = self.model.get_sentence_embedding_dimension()
+        # Longer inputs are truncated by the model (all-MiniLM-L6-v2: 256 tokens)
+        self.max_tokens = getattr(self.model, 'max_seq_length', None) or 256
         print(f"Model loaded. Embedding dimension: {self.dimension}")
 
+        self.cache = None
+        if cache_dir:
+            self.cache = EmbeddingCache(cache_dir, model_name, self.dimension,
+                                        max_bytes=cache_max_bytes, dtype=cache_dtype)
+            print(f"Embedding cache: {self.cache.directory} ({len(self.cache)} vectors)")
+
     def encode_text(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text
@@ -29,7 +47,11 @@ class EmbeddingGenerator:
         Returns:
             Numpy array of embeddings
         """
-        return self.model.encode(text, convert_to_numpy=True)
+        if self.cache is None:
+            with span('embed'):
+                count('texts_embedded')
+                return self.model.encode(text, convert_to_numpy=True)
+        return self.encode_batch([text], show_progress=False)[0]
 
     def encode_batch(self, texts: List[str], batch_size: int = 32,
                      show_progress: bool = True) -> np.ndarray:
@@ -42,13 +64,59 @@ class EmbeddingGenerator:
         Returns:
             Numpy array of shape (len(texts), embedding_dim)
         """
-        embeddings = self.model.encode(
-            texts,
-            batch_size=batch_size,
-            show_progress_bar=show_progress,
-            convert_to_numpy=True
-        )
-        return embeddings
+        with span('embed'):
+            if self.cache is None:
+                count('texts_embedded', len(texts))
+                return self.model.encode(
+                    texts,
+                    batch_size=batch_size,
+                    show_progress_bar=show_progress,
+                    convert_to_numpy=True
+                )
+
+            cached, keys = self.cache.get_many(texts)
+            embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+            # Only cache misses go to the model, all in one batch (duplicates encoded once)
+            misses = {}
+            for i, vector in enumerate(cached):
+                if vector is None:
+                    misses.setdefault(keys[i], []).append(i)
+                else:
+                    embeddings[i] = vector
+
+            missed = sum(len(indices) for indices in misses.values())
+            count('embedding_cache_hits', len(texts) - missed)
+            count('embedding_cache_misses', missed)
+            if misses:
+                count('texts_embedded', len(misses))
+                miss_keys = list(misses)
+                miss_texts = [texts[misses[key][0]] for key in miss_keys]
+                computed = self.model.encode(
+                    miss_texts,
+                    batch_size=batch_size,
+                    show_progress_bar=show_progress,
+                    convert_to_numpy=True
+                )
+                for key, vector in zip(miss_keys, computed):
+                    embeddings[misses[key]] = vector
+                self.cache.put_many(miss_keys, computed)
+
+            return embeddings
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Token count of a text with the model's own (local) tokenizer
+        Falls back to ~4 characters per token if the model exposes no tokenizer.
+        """
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is None:
+            return approximate_token_count(text)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def cache_stats(self) -> dict:
+        """Embedding cache hit/miss counters (empty dict when caching is off)"""
+        return self.cache.stats() if self.cache else {}
 
     def encode_chunks(self, chunks: List[dict]) -> List[dict]:
         """
@@ -80,20 +148,27 @@ class EmbeddingGenerator:
 
     def find_most_similar(self, query_embedding: np.ndarray,
                           chunk_embeddings: np.ndarray,
-                          top_k: int = 5) -> List[tuple]:
+                          top_k: int = 5, normalized: bool = False) -> List[tuple]:
         """
         Find most similar chunks to a query
         Args:
             query_embedding: Query embedding vector
             chunk_embeddings: Array of chunk embeddings
             top_k: Number of top results to return
+            normalized: Embeddings are already unit length (skips re-normalizing every row)
         Returns:
             List of (index, similarity_score) tuples
         """
-        similarities = np.dot(chunk_embeddings, query_embedding) / (
-                np.linalg.norm(chunk_embeddings, axis=1) * np.linalg.norm(query_embedding)
-        )
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        similarities = np.dot(chunk_embeddings, query_embedding)
+        if not normalized:
+            similarities = similarities / (np.linalg.norm(chunk_embeddings, axis=1) * np.linalg.norm(query_embedding))
+
+        # Partial selection of the top k, then sort only those
+        top_k = min(top_k, len(similarities))
+        if top_k <= 0:
+            return []
+        top_indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
 
         results = [(int(idx), float(similarities[idx])) for idx in top_indices]
         return results
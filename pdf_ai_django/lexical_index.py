@@ -0,0 +1,316 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Words, numbers and codes such as "AB-1234.5" or "v2/rev3" (kept whole, plus their parts)
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+PART_SPLIT = re.compile(r"[-./]")
+
+# Question words and fillers (English and Turkish): they match most chunks and rank none
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it of on or that the this to was
+what when where which who why will with you your
+bir bu da de için ile mi mı mu mü ne nedir nasıl ve veya
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased lexical tokens of a text
+    Compound codes are indexed whole and as their parts, so both
+    "AB-1234" and "1234" match a chunk that mentions AB-1234.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if PART_SPLIT.search(token):
+            tokens.extend(part for part in PART_SPLIT.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index over chunk texts, stored in SQLite
+
+    Built incrementally as chunks are added; deletes remove postings and keep
+    the collection statistics (document count, total length) exact.
+    Safe to share between processes (writes are serialized by SQLite) and threads.
+    """
+
+    # Posting lists shorter than this are cheap to score: their terms are never skipped
+    MIN_SKIPPED_DF = 1000
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, max_df: float = 0.2):
+        """
+        Open (or create) the index
+        Args:
+            path: SQLite file of the index
+            k1: Term frequency saturation
+            b: Length normalization strength
+            max_df: Query terms found in more than this fraction of the chunks (and in at least
+                    MIN_SKIPPED_DF) are skipped when the query has rarer ones: their posting
+                    lists are long and their weight is low
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        self.created = not os.path.exists(path)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+
+        # Indexes written before chunks were keyed by shard: drop them (the vector store re-indexes)
+        posting_columns = [row[1] for row in self._db.execute("PRAGMA table_info(postings)")]
+        if posting_columns and 'shard' not in posting_columns:
+            self._db.executescript("DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS stats;")
+            self.created = True
+
+        # The same PDF can be stored in several shards under the same chunk IDs: key chunks by (shard, id)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                shard TEXT NOT NULL,
+                id TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                source TEXT,
+                content_hash TEXT,
+                PRIMARY KEY (shard, id)
+            );
+            CREATE INDEX IF NOT EXISTS docs_source ON docs (source);
+            CREATE INDEX IF NOT EXISTS docs_content_hash ON docs (content_hash);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                shard TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, shard, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (shard, doc_id);
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._db.execute("INSERT OR IGNORE INTO stats VALUES ('num_docs', 0)")
+        self._db.execute("INSERT OR IGNORE INTO stats VALUES ('total_length', 0)")
+
+    def _stat(self, name: str) -> int:
+        return self._db.execute("SELECT value FROM stats WHERE name = ?", (name,)).fetchone()[0]
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict], shard: str = None) -> None:
+        """
+        Index (or re-index) chunks
+        Args:
+            ids: Chunk IDs (same as in the vector store)
+            texts: Chunk texts
+            metadatas: Chunk metadata ('source', optional 'content_hash')
+            shard: Vector store shard holding the chunks (None = main collection)
+        """
+        shard = shard or ''
+        docs = []
+        postings = []
+        total_length = 0
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            counts = Counter(tokenize(text))
+            length = sum(counts.values())
+            total_length += length
+            docs.append((shard, chunk_id, length, metadata.get('source'), metadata.get('content_hash')))
+            postings.extend((term, shard, chunk_id, tf) for term, tf in counts.items())
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-added chunks replace their old postings in this shard (upsert semantics, like the vectors)
+                self._delete_ids_locked(ids, shard)
+                self._db.executemany(
+                    "INSERT INTO docs (shard, id, length, source, content_hash) VALUES (?, ?, ?, ?, ?)", docs
+                )
+                self._db.executemany("INSERT INTO postings (term, shard, doc_id, tf) VALUES (?, ?, ?, ?)", postings)
+                self._db.execute("UPDATE stats SET value = value + ? WHERE name = 'num_docs'", (len(docs),))
+                self._db.execute("UPDATE stats SET value = value + ? WHERE name = 'total_length'", (total_length,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _delete_ids_locked(self, ids: List[str], shard: str) -> int:
+        """Remove chunks of one shard and their postings (inside a write transaction)"""
+        removed = 0
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(batch))
+            count, length = self._db.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE shard = ? AND id IN ({placeholders})",
+                [shard] + batch
+            ).fetchone()
+            if not count:
+                continue
+            self._db.execute(f"DELETE FROM postings WHERE shard = ? AND doc_id IN ({placeholders})", [shard] + batch)
+            self._db.execute(f"DELETE FROM docs WHERE shard = ? AND id IN ({placeholders})", [shard] + batch)
+            self._db.execute("UPDATE stats SET value = value - ? WHERE name = 'num_docs'", (count,))
+            self._db.execute("UPDATE stats SET value = value - ? WHERE name = 'total_length'", (length,))
+            removed += count
+        return removed
+
+    @staticmethod
+    def _filter_sql(source: str = None, content_hash: str = None, shard: str = None) -> tuple:
+        """WHERE clause (on docs) and parameters for the optional filters"""
+        clauses, params = [], []
+        if content_hash:
+            clauses.append("d.content_hash = ?")
+            params.append(content_hash)
+        elif source:
+            clauses.append("d.source = ?")
+            params.append(source)
+        if shard is not None:
+            clauses.append("d.shard = ?")
+            params.append(shard)
+        return (" AND " + " AND ".join(clauses)) if clauses else "", params
+
+    def delete(self, source: str = None, content_hash: str = None, shard: str = None) -> int:
+        """
+        Remove every chunk matching the filters (source or content hash, optionally one shard)
+        Returns:
+            Number of chunks removed
+        """
+        if not source and not content_hash:
+            raise ValueError("delete needs a source or content hash")
+
+        where, params = self._filter_sql(source, content_hash, shard)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                ids_by_shard = {}
+                for doc_shard, chunk_id in self._db.execute(f"SELECT d.shard, d.id FROM docs d WHERE 1 = 1{where}",
+                                                            params):
+                    ids_by_shard.setdefault(doc_shard, []).append(chunk_id)
+                removed = sum(self._delete_ids_locked(ids, doc_shard) for doc_shard, ids in ids_by_shard.items())
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return removed
+
+    def clear(self) -> None:
+        """Drop the whole index"""
+        with self._lock:
+            self._db.executescript("""
+                DELETE FROM postings; DELETE FROM docs;
+                UPDATE stats SET value = 0;
+            """)
+
+    def search(self, query: str, top_k: int = 10, source: str = None,
+               content_hash: str = None, shard: str = None) -> List[tuple]:
+        """
+        Rank chunks by BM25 score for a query
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            source, content_hash: Optional document filter
+            shard: Optional shard filter (None = all shards)
+        Returns:
+            List of (chunk_id, score, shard or None), best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        # A query made only of stopwords still searches for them
+        terms = [term for term in terms if term not in STOPWORDS] or terms
+        if not terms:
+            return []
+
+        where, params = self._filter_sql(source, content_hash, shard)
+        with self._lock:
+            num_docs = self._stat('num_docs')
+            total_length = self._stat('total_length')
+            if not num_docs:
+                return []
+            doc_freq = self._doc_freqs_locked(terms, max(int(self.max_df * num_docs), self.MIN_SKIPPED_DF))
+            if not doc_freq:
+                return []
+
+            # Document frequencies are global statistics (like the vectors); scoring and
+            # top-k selection run in SQLite, so only top_k rows come back
+            idf = [(term, math.log(1 + (num_docs - df + 0.5) / (df + 0.5))) for term, df in doc_freq.items()]
+            values = ",".join("(?, ?)" for _ in idf)
+            rows = self._db.execute(
+                f"WITH q(term, idf) AS (VALUES {values}) "
+                f"SELECT p.shard, p.doc_id, SUM(q.idf * p.tf * ? / (p.tf + ? * (1 - ? + ? * d.length / ?))) AS score "
+                f"FROM q JOIN postings p ON p.term = q.term "
+                f"JOIN docs d ON d.shard = p.shard AND d.id = p.doc_id WHERE 1 = 1{where} "
+                f"GROUP BY p.shard, p.doc_id ORDER BY score DESC LIMIT ?",
+                [value for pair in idf for value in pair]
+                + [self.k1 + 1, self.k1, self.b, self.b, total_length / num_docs] + params + [top_k]
+            ).fetchall()
+
+        return [(doc_id, score, doc_shard or None) for doc_shard, doc_id, score in rows]
+
+    def _doc_freqs_locked(self, terms: List[str], max_count: int) -> Dict[str, int]:
+        """
+        Document frequencies of the query terms worth scoring: terms in more than
+        max_count chunks are dropped unless every term is (then the rarest one is kept)
+        Counting stops at max_count + 1, so frequent terms cost no full scan.
+        """
+        doc_freq = {}
+        for term in terms:
+            doc_freq[term] = self._db.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM postings WHERE term = ? LIMIT ?)", (term, max_count + 1)
+            ).fetchone()[0]
+        doc_freq = {term: df for term, df in doc_freq.items() if df}
+        rare = {term: df for term, df in doc_freq.items() if df <= max_count}
+        if rare or not doc_freq:
+            return rare
+        rarest = min(doc_freq, key=doc_freq.get)
+        return {rarest: self._db.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (rarest,)).fetchone()[0]}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._stat('num_docs')
+
+    def stats(self) -> Dict:
+        """Indexed chunk count and average chunk length (tokens)"""
+        with self._lock:
+            num_docs = self._stat('num_docs')
+            total_length = self._stat('total_length')
+        return {
+            'chunks': num_docs,
+            'avg_length': total_length / num_docs if num_docs else 0.0,
+        }
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[tuple]:
+    """
+    Fuse several rankings of IDs with reciprocal rank fusion
+    Args:
+        rankings: Lists of IDs, best first
+        k: RRF constant (dampens the weight of top ranks)
+        weights: Optional weight per ranking
+    Returns:
+        List of (id, fused score), best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + weight / (k + rank + 1)
+    return sorted(fused.items(), key=lambda entry: entry[1], reverse=True)
+
+
+if __name__ == "__main__":
+    # Test the index in a temporary file
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BM25Index(os.path.join(tmp, "lexical.sqlite3"))
+        index.add(
+            ["a_0", "a_1", "b_0"],
+            ["Replace filter part AB-1234 every 6 months.",
+             "The pump uses part XY-99 and a standard filter.",
+             "Machine learning is a subset of artificial intelligence."],
+            [{'source': 'a.pdf'}, {'source': 'a.pdf'}, {'source': 'b.pdf'}]
+        )
+        print(f"Tokens: {tokenize('Part AB-1234 v2.1')}")
+        print(f"'AB-1234': {index.search('which part is AB-1234?')}")
+        print(f"'filter' in a.pdf: {index.search('filter', source='a.pdf')}")
+        print(f"RRF: {reciprocal_rank_fusion([['a_0', 'a_1'], ['a_1', 'b_0']])}")
@@ -0,0 +1,337 @@
+"""
+Pooled, keep-alive HTTP clients for the Ollama API
+OllamaClient is shared by every request in a process; AsyncOllamaClient serves
+async views (one instance per event loop)
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import count, span
+
+
+class OllamaError(Exception):
+    """Raised when Ollama can't be reached or returns an error"""
+
+
+def _count_tokens(data: Dict) -> None:
+    """Add Ollama's token counts of a finished generation to the current trace"""
+    count('prompt_tokens', data.get('prompt_eval_count') or 0)
+    count('generated_tokens', data.get('eval_count') or 0)
+
+
+class OllamaClient:
+    """Ollama client with a persistent connection pool, retries and a concurrency cap"""
+
+    # Status codes worth retrying (server busy / restarting)
+    RETRY_STATUS = {429, 502, 503, 504}
+
+    def __init__(self, base_url: str = "http://localhost:11434", pool_size: int = 10,
+                 max_retries: int = 2, backoff: float = 0.5,
+                 connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 max_concurrent: int = 4, queue_timeout: float = 60.0):
+        """
+        Args:
+            base_url: Ollama API endpoint
+            pool_size: Keep-alive connections kept open to Ollama
+            max_retries: Retries on connection errors / busy responses (before any token is received)
+            backoff: Base delay for exponential backoff with full jitter (seconds)
+            connect_timeout: Seconds to wait for the TCP connection
+            read_timeout: Seconds to wait between bytes of the response
+            max_concurrent: Maximum in-flight generations from this process
+            queue_timeout: Seconds a generation may wait for a free slot before failing
+        """
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def list_models(self) -> List[str]:
+        """Names of the models available on the Ollama server"""
+        response = self._request('GET', '/api/tags', timeout=(self.timeout[0], 5))
+        try:
+            return [m['name'] for m in response.json().get('models', [])]
+        finally:
+            response.close()
+
+    def generate(self, model: str, prompt: str, options: Dict = None) -> str:
+        """
+        Generate a full response (blocks until Ollama is done)
+        Args:
+            model: Ollama model name
+            prompt: The prompt to send
+            options: Sampling options (temperature, top_p, ...)
+        Returns:
+            Generated text
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}}
+
+        with self._generation_slot():
+            response = self._request('POST', '/api/generate', json=payload)
+            try:
+                data = response.json()
+            finally:
+                response.close()
+            _count_tokens(data)
+            return data.get('response', '')
+
+    def generate_stream(self, model: str, prompt: str, options: Dict = None) -> Iterator[str]:
+        """
+        Stream a response token by token (Ollama NDJSON)
+        Args:
+            model: Ollama model name
+            prompt: The prompt to send
+            options: Sampling options (temperature, top_p, ...)
+        Yields:
+            Generated text fragments as soon as Ollama produces them
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options or {}}
+
+        with self._generation_slot():
+            response = self._request('POST', '/api/generate', json=payload, stream=True)
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get('error'):
+                        raise OllamaError(f"Ollama API error: {data['error']}")
+                    if data.get('response'):
+                        yield data['response']
+                    if data.get('done'):
+                        _count_tokens(data)
+                        break
+            except requests.exceptions.RequestException as e:
+                raise OllamaError(f"Ollama stream interrupted: {e}")
+            finally:
+                response.close()
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.session.close()
+
+    @contextmanager
+    def _generation_slot(self):
+        """Hold one of max_concurrent generation slots"""
+        with span('queue'):
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        if not acquired:
+            raise OllamaError(
+                f"Ollama is busy ({self.max_concurrent} generations in flight). Try again shortly."
+            )
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _request(self, method: str, path: str, timeout=None, **kwargs) -> requests.Response:
+        """
+        Send a request over the pooled session, retrying transient failures
+        Returns:
+            Response with status 200 (caller closes it)
+        """
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.exceptions.ConnectTimeout:
+                if last_attempt:
+                    raise OllamaError("Ollama request timed out. The model might be downloading or processing is slow.")
+            except requests.exceptions.ReadTimeout:
+                # The model is working but slow; retrying would only queue more work
+                raise OllamaError("Ollama request timed out. The model might be downloading or processing is slow.")
+            except requests.exceptions.ConnectionError:
+                if last_attempt:
+                    raise OllamaError("Cannot connect to Ollama. Make sure it's running at " + self.base_url)
+            else:
+                if response.status_code == 200:
+                    return response
+                message = f"Ollama API error: {response.status_code} - {response.text}"
+                response.close()
+                if response.status_code not in self.RETRY_STATUS or last_attempt:
+                    raise OllamaError(message)
+
+            # Exponential backoff with full jitter so retries from many requests spread out
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+        raise OllamaError("Ollama request failed")
+
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of OllamaClient: a pending generation holds no thread, so one
+    process can keep hundreds of questions waiting on Ollama
+
+    httpx connections and the concurrency cap belong to the event loop the client is
+    first used on; create one instance per loop.
+    """
+
+    RETRY_STATUS = OllamaClient.RETRY_STATUS
+
+    def __init__(self, base_url: str = "http://localhost:11434", pool_size: int = 10,
+                 max_retries: int = 2, backoff: float = 0.5,
+                 connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 max_concurrent: int = 4, queue_timeout: float = 60.0):
+        """
+        Args:
+            Same as OllamaClient
+        """
+        # Imported here so WSGI-only deployments don't need httpx
+        import httpx
+
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=queue_timeout),
+            # Generations are capped by max_concurrent; only pool_size connections are kept alive
+            limits=httpx.Limits(max_connections=max(pool_size, max_concurrent), max_keepalive_connections=pool_size)
+        )
+
+    async def list_models(self) -> List[str]:
+        """Names of the models available on the Ollama server"""
+        response = await self._request('GET', '/api/tags', timeout=5)
+        return [m['name'] for m in response.json().get('models', [])]
+
+    async def generate(self, model: str, prompt: str, options: Dict = None) -> str:
+        """
+        Generate a full response (waits without blocking the event loop)
+        Args:
+            model: Ollama model name
+            prompt: The prompt to send
+            options: Sampling options (temperature, top_p, ...)
+        Returns:
+            Generated text
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}}
+
+        async with self._generation_slot():
+            response = await self._request('POST', '/api/generate', json=payload)
+            data = response.json()
+            _count_tokens(data)
+            return data.get('response', '')
+
+    async def generate_stream(self, model: str, prompt: str, options: Dict = None) -> AsyncIterator[str]:
+        """
+        Stream a response token by token (Ollama NDJSON)
+        Args:
+            model: Ollama model name
+            prompt: The prompt to send
+            options: Sampling options (temperature, top_p, ...)
+        Yields:
+            Generated text fragments as soon as Ollama produces them
+        """
+        import httpx
+
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options or {}}
+
+        async with self._generation_slot():
+            response = await self._request('POST', '/api/generate', json=payload, stream=True)
+            try:
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get('error'):
+                        raise OllamaError(f"Ollama API error: {data['error']}")
+                    if data.get('response'):
+                        yield data['response']
+                    if data.get('done'):
+                        _count_tokens(data)
+                        break
+            except httpx.HTTPError as e:
+                raise OllamaError(f"Ollama stream interrupted: {e}")
+            finally:
+                await response.aclose()
+
+    async def close(self) -> None:
+        """Close pooled connections"""
+        await self.client.aclose()
+
+    @asynccontextmanager
+    async def _generation_slot(self):
+        """Hold one of max_concurrent generation slots (waiting costs no thread)"""
+        try:
+            with span('queue'):
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise OllamaError(
+                f"Ollama is busy ({self.max_concurrent} generations in flight). Try again shortly."
+            )
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    async def _request(self, method: str, path: str, timeout=None, stream: bool = False, **kwargs):
+        """
+        Send a request over the pooled client, retrying transient failures
+        Returns:
+            httpx.Response with status 200 (streamed responses are closed by the caller)
+        """
+        import httpx
+
+        request = self.client.build_request(method, path, timeout=timeout or httpx.USE_CLIENT_DEFAULT, **kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self.client.send(request, stream=stream)
+            except httpx.ConnectTimeout:
+                if last_attempt:
+                    raise OllamaError("Ollama request timed out. The model might be downloading or processing is slow.")
+            except httpx.ReadTimeout:
+                # The model is working but slow; retrying would only queue more work
+                raise OllamaError("Ollama request timed out. The model might be downloading or processing is slow.")
+            except httpx.PoolTimeout:
+                raise OllamaError(f"No free connection to Ollama within {self.queue_timeout:.0f}s. Try again shortly.")
+            except httpx.TransportError:
+                if last_attempt:
+                    raise OllamaError("Cannot connect to Ollama. Make sure it's running at " + self.base_url)
+            else:
+                if response.status_code == 200:
+                    return response
+                await response.aread()
+                message = f"Ollama API error: {response.status_code} - {response.text}"
+                await response.aclose()
+                if response.status_code not in self.RETRY_STATUS or last_attempt:
+                    raise OllamaError(message)
+
+            # Exponential backoff with full jitter so retries from many requests spread out
+            await asyncio.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+        raise OllamaError("Ollama request failed")
+
+
+if __name__ == "__main__":
+    # Test the client against a running (or fake) Ollama server
+    import sys
+
+    client = OllamaClient(sys.argv[1] if len(sys.argv) > 1 else "http://localhost:11434")
+    print(f"Models: {client.list_models()}")
+    for token in client.generate_stream("llama3.2", "Say hello in five words."):
+        print(token, end="", flush=True)
+    print()
@@ -0,0 +1,32 @@
+"""
+ASGI config for pdf_ai_project.
+
+Serve with an ASGI server so pending questions wait on the event loop instead of a thread:
+    uvicorn pdf_ai_project.asgi:application --workers 2
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pdf_ai_project.settings')
+
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """
+    Django for HTTP; answers the server's lifespan messages (Django doesn't) and
+    closes the async Ollama clients' connections on shutdown
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            from documents.utils import aclose_components
+
+            await aclose_components()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
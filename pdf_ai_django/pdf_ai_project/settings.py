@@ -54,12 +54,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'pdf_ai_project.wsgi.application'
+ASGI_APPLICATION = 'pdf_ai_project.asgi.application'  # e.g. uvicorn pdf_ai_project.asgi:application
 
 # Database
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,  # ingestion workers write concurrently
+        },
     }
 }
 
@@ -108,6 +112,79 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100 MB
 # Ollama Settings
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.2')
 OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_POOL_SIZE = int(os.getenv('OLLAMA_POOL_SIZE', '10'))  # keep-alive connections
+OLLAMA_MAX_RETRIES = int(os.getenv('OLLAMA_MAX_RETRIES', '2'))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '5'))
+OLLAMA_READ_TIMEOUT = float(os.getenv('OLLAMA_READ_TIMEOUT', '120'))
+OLLAMA_MAX_CONCURRENT = int(os.getenv('OLLAMA_MAX_CONCURRENT', '4'))  # in-flight generations per process
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv('OLLAMA_QUEUE_TIMEOUT', '60'))  # wait for a free generation slot
 
 # Vector Store Settings
-CHROMA_PERSIST_DIR = BASE_DIR / 'chroma_db'
\ No newline at end of file
+CHROMA_PERSIST_DIR = BASE_DIR / 'chroma_db'
+VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'chroma')  # 'chroma' or 'numpy' (exact in-process search)
+VECTOR_SHARDING = os.getenv('VECTOR_SHARDING', 'none')  # 'none', 'user' (per uploader) or 'hash'
+VECTOR_NUM_SHARDS = int(os.getenv('VECTOR_NUM_SHARDS', '8'))  # shard count for 'hash' sharding
+VECTOR_SHARD_QUERY_WORKERS = int(os.getenv('VECTOR_SHARD_QUERY_WORKERS', '4'))  # parallel cross-shard queries
+# Vector storage of new collections (numpy backend): 'float32', 'float16', 'int8' or 'pq' (product
+# quantization, rescored with float32). Changing it takes effect through `python manage.py reindex`.
+VECTOR_QUANTIZATION = os.getenv('VECTOR_QUANTIZATION', 'float32')
+# HNSW graph of new Chroma collections (chroma backend). Higher values trade build time, memory and
+# latency for recall; measure them on your corpus with `python -m benchmarks.bench_hnsw`.
+# Changing them takes effect through `python manage.py reindex`.
+VECTOR_HNSW_M = int(os.getenv('VECTOR_HNSW_M', '16'))  # graph links per node
+VECTOR_HNSW_CONSTRUCTION_EF = int(os.getenv('VECTOR_HNSW_CONSTRUCTION_EF', '100'))  # candidate list while building
+VECTOR_HNSW_SEARCH_EF = int(os.getenv('VECTOR_HNSW_SEARCH_EF', '50'))  # candidate list per query (Chroma: 10)
+
+# Ingestion Queue Settings (python manage.py ingest_worker)
+INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', '2'))
+INGESTION_POLL_INTERVAL = float(os.getenv('INGESTION_POLL_INTERVAL', '2'))
+INGESTION_JOB_TIMEOUT = int(os.getenv('INGESTION_JOB_TIMEOUT', '1800'))  # seconds without heartbeat before requeue
+INGESTION_HEARTBEAT_INTERVAL = float(os.getenv('INGESTION_HEARTBEAT_INTERVAL', '60'))  # running jobs' heartbeat
+
+# PDF Extraction Settings
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', '4'))  # processes per document (1 = serial)
+
+# Extracted Text Settings (per-page text of each PDF, kept so it is parsed only once; None disables)
+TEXT_ARTIFACT_DIR = BASE_DIR / 'text_artifacts'
+
+# Chunking Settings (sentence-aligned chunks, capped at the embedding model's own token limit)
+CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', '256'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+
+# Index Settings (changing the model or chunking requires `python manage.py reindex`)
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+INDEX_KEEP_VERSIONS = int(os.getenv('INDEX_KEEP_VERSIONS', '1'))  # inactive versions kept after a switch
+
+# Embedding Cache Settings (set EMBEDDING_CACHE_DIR = None to disable)
+EMBEDDING_CACHE_DIR = BASE_DIR / 'embedding_cache'
+EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', '512'))
+EMBEDDING_CACHE_DTYPE = os.getenv('EMBEDDING_CACHE_DTYPE', 'float16')  # or 'float32'
+
+# Q&A Cache Settings (sizes in entries, TTLs in seconds; 0 disables a level)
+QA_EMBEDDING_CACHE_SIZE = int(os.getenv('QA_EMBEDDING_CACHE_SIZE', '1024'))
+QA_EMBEDDING_CACHE_TTL = int(os.getenv('QA_EMBEDDING_CACHE_TTL', '3600'))
+QA_ANSWER_CACHE_SIZE = int(os.getenv('QA_ANSWER_CACHE_SIZE', '256'))
+QA_ANSWER_CACHE_TTL = int(os.getenv('QA_ANSWER_CACHE_TTL', '600'))
+QA_RETRIEVAL_MODE = os.getenv('QA_RETRIEVAL_MODE', 'hybrid')  # 'hybrid' (dense + BM25) or 'dense'
+QA_HYBRID_CANDIDATES = int(os.getenv('QA_HYBRID_CANDIDATES', '20'))  # per ranking, before fusion
+QA_CONTEXT_TOKEN_BUDGET = int(os.getenv('QA_CONTEXT_TOKEN_BUDGET', '1500'))  # retrieved context per prompt
+QA_BATCH_WORKERS = int(os.getenv('QA_BATCH_WORKERS', '2'))  # batch answers generated concurrently
+QA_BATCH_MAX_QUESTIONS = int(os.getenv('QA_BATCH_MAX_QUESTIONS', '500'))  # questions per batch request
+QA_ASYNC_WORKERS = int(os.getenv('QA_ASYNC_WORKERS', '8'))  # threads for embedding/search work of async views
+
+# Reranking Settings (optional second stage: a local cross-encoder picks the best chunks on CPU)
+QA_RERANKER_MODEL = os.getenv('QA_RERANKER_MODEL', '')  # e.g. 'cross-encoder/ms-marco-MiniLM-L-6-v2' ('' disables)
+QA_RERANK_CANDIDATES = int(os.getenv('QA_RERANK_CANDIDATES', '40'))  # first-stage chunks per question
+QA_RERANK_BATCH_SIZE = int(os.getenv('QA_RERANK_BATCH_SIZE', '32'))  # pairs per cross-encoder pass
+QA_RERANK_CACHE_SIZE = int(os.getenv('QA_RERANK_CACHE_SIZE', '4096'))  # cached (question, chunk) scores
+
+# Summary Settings (map-reduce over the whole document)
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', '2'))  # parts summarized concurrently
+SUMMARY_CACHE_PATH = BASE_DIR / 'summary_cache.sqlite3'  # intermediate summaries (None disables)
+
+# Metrics Settings (per-stage latency of questions and ingestion, served at /metrics/ for Prometheus)
+METRICS_PATH = BASE_DIR / 'metrics.sqlite3'  # shared by web and ingest worker processes (None disables)
+
+# Warm-up Settings (preload the embedding model when runserver / ingest workers start)
+WARM_UP_ON_START = os.getenv('WARM_UP_ON_START', 'false').lower() in ('1', 'true', 'yes')
+WARM_UP_COMPONENTS = ('embedding_generator', 'vector_store')
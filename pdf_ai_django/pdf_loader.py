@@ -1,51 +1,196 @@
 import PyPDF2
 import pdfplumber
-from typing import List, Dict
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Iterable, Iterator, Tuple
+import multiprocessing
+import math
+import os
 import re
 
+from chunker import SentenceChunker, PARAGRAPH_BREAK
+from tracing import traced_iter
+
+# Documents shorter than this are always extracted serially (pool start-up isn't worth it)
+PARALLEL_MIN_PAGES = 32
+# Smallest page range handed to one worker task
+PARALLEL_MIN_RANGE = 8
+
+
+def _extract_page_range(pdf_path: str, method: str, start: int, end: int) -> List[str]:
+    """
+    Extract text for pages [start, end) - runs inside a worker process
+    Args:
+        pdf_path: Path to the PDF file
+        method: 'pypdf2' or 'pdfplumber'
+        start, end: 0-based page range (end exclusive)
+    Returns:
+        List of page texts in page order
+    """
+    texts = []
+    if method == "pypdf2":
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for index in range(start, end):
+                texts.append(pdf_reader.pages[index].extract_text() or "")
+    else:
+        # pdfplumber only parses the requested pages (1-based numbers)
+        with pdfplumber.open(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+            for page in pdf.pages:
+                texts.append(page.extract_text() or "")
+                page.close()
+    return texts
+
 
 class PDFLoader:
     """Load and clean text from PDF files"""
 
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, workers: int = 1, text_store=None, content_hash: str = None):
+        """
+        Args:
+            pdf_path: Path to the PDF file
+            workers: Number of processes for page-parallel extraction (1 = serial)
+            text_store: Optional PageTextStore - page texts are read from it when stored,
+                        and written to it after the first full extraction
+            content_hash: Key of the PDF in text_store (default: SHA-256 of the file)
+        """
         self.pdf_path = pdf_path
+        self.workers = workers
+        self.text_store = text_store
+        self.content_hash = content_hash
+        self.num_pages = 0  # Filled in while pages are extracted
+        self.from_artifact = False  # True when the last iter_pages() read stored texts
 
-    def extract_text(self, method: str = "pypdf2") -> str:
+    def extract_text(self, method: str = "pypdf2", workers: int = None) -> str:
         """
         Extract text from PDF using specified method
         Args:
             method: 'pypdf2' or 'pdfplumber'
+            workers: Process count for parallel extraction (default: self.workers)
         Returns:
             Extracted text as string
         """
-        if method == "pypdf2":
-            return self._extract_with_pypdf2()
-        elif method == "pdfplumber":
-            return self._extract_with_pdfplumber()
-        else:
+        parts = []
+        for _, page_text in self.iter_pages(method=method, workers=workers):
+            if page_text or method == "pypdf2":
+                parts.append(page_text + "\n")
+        return "".join(parts)
+
+    def iter_pages(self, method: str = "pdfplumber", workers: int = None) -> Iterator[Tuple[int, str]]:
+        """
+        Stream text page by page, opening the PDF only once
+        Args:
+            method: 'pypdf2' or 'pdfplumber'
+            workers: Process count for parallel extraction (default: self.workers).
+                     Small documents are always extracted serially.
+        Returns:
+            Iterator of (page_number, page_text) tuples in page order, page numbers start at 1.
+            self.num_pages is set as soon as the file is opened.
+        """
+        if method not in ("pypdf2", "pdfplumber"):
             raise ValueError(f"Unknown method: {method}")
 
-    def _extract_with_pypdf2(self) -> str:
-        """Extract text using PyPDF2"""
-        text = ""
+        self.from_artifact = False
+        if self.text_store is not None:
+            artifact = self.text_store.open(self._artifact_key(), method=method)
+            if artifact is not None:
+                self.from_artifact = True
+                self.num_pages = artifact.num_pages
+                return traced_iter(self._iter_artifact_pages(artifact), 'extract', counter='pages_from_artifact')
+
+        # More processes than cores only adds start-up and IPC overhead
+        workers = min(self.workers if workers is None else workers, os.cpu_count() or 1)
+        if workers > 1:
+            pages = self._iter_pages_parallel(method, workers)
+        elif method == "pypdf2":
+            pages = self._iter_pages_pypdf2()
+        else:
+            pages = self._iter_pages_pdfplumber()
+
+        if self.text_store is not None:
+            pages = self._store_pages(pages, method)
+        return traced_iter(pages, 'extract', counter='pages_extracted')
+
+    def _artifact_key(self) -> str:
+        if not self.content_hash:
+            digest = hashlib.sha256()
+            with open(self.pdf_path, 'rb') as file:
+                for block in iter(lambda: file.read(1024 * 1024), b""):
+                    digest.update(block)
+            self.content_hash = digest.hexdigest()
+        return self.content_hash
+
+    @staticmethod
+    def _iter_artifact_pages(artifact) -> Iterator[Tuple[int, str]]:
+        """Stream stored page texts (no PDF parsing)"""
+        with artifact:
+            yield from artifact.iter_pages()
+
+    def _store_pages(self, pages: Iterator[Tuple[int, str]], method: str) -> Iterator[Tuple[int, str]]:
+        """Pass pages through and write the artifact once every page has been extracted"""
+        extracted = []
+        for page_number, page_text in pages:
+            extracted.append((page_number, page_text))
+            yield page_number, page_text
+        self.text_store.write(self._artifact_key(), extracted, method=method)
+
+    def _iter_pages_pypdf2(self) -> Iterator[Tuple[int, str]]:
+        """Stream pages using PyPDF2"""
         with open(self.pdf_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+            self.num_pages = len(pdf_reader.pages)
+            for page_number, page in enumerate(pdf_reader.pages, start=1):
+                yield page_number, page.extract_text() or ""
 
-    def _extract_with_pdfplumber(self) -> str:
-        """Extract text using pdfplumber (better for complex layouts)"""
-        text = ""
+    def _iter_pages_pdfplumber(self) -> Iterator[Tuple[int, str]]:
+        """Stream pages using pdfplumber (better for complex layouts)"""
         with pdfplumber.open(self.pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
+            self.num_pages = len(pdf.pages)
+            for page_number, page in enumerate(pdf.pages, start=1):
+                page_text = page.extract_text() or ""
+                # Drop the parsed layout so memory stays flat on long documents
+                page.close()
+                yield page_number, page_text
+
+    def _iter_pages_parallel(self, method: str, workers: int) -> Iterator[Tuple[int, str]]:
+        """Fan page ranges out to a process pool and yield pages back in order"""
+        # Reading the page tree is cheap compared to layout analysis
+        with open(self.pdf_path, 'rb') as file:
+            self.num_pages = len(PyPDF2.PdfReader(file).pages)
+
+        if self.num_pages < PARALLEL_MIN_PAGES:
+            serial = self._iter_pages_pypdf2() if method == "pypdf2" else self._iter_pages_pdfplumber()
+            yield from serial
+            return
+
+        # Several ranges per worker so a slow range doesn't leave cores idle
+        range_size = max(PARALLEL_MIN_RANGE, math.ceil(self.num_pages / (workers * 4)))
+        ranges = [(start, min(start + range_size, self.num_pages))
+                  for start in range(0, self.num_pages, range_size)]
+
+        # 'spawn' keeps workers independent of whatever the parent has loaded (torch, DB connections)
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                   mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futures = [pool.submit(_extract_page_range, self.pdf_path, method, start, end)
+                       for start, end in ranges]
+            for (start, _), future in zip(ranges, futures):
+                for offset, page_text in enumerate(future.result()):
+                    yield start + offset + 1, page_text
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def clean_text(self, text: str, keep_paragraphs: bool = False) -> str:
+        """
+        Clean extracted text
+        Args:
+            text: Raw page text
+            keep_paragraphs: Keep blank-line paragraph breaks (used by the sentence chunker)
+        """
+        if keep_paragraphs:
+            paragraphs = (self.clean_text(paragraph) for paragraph in PARAGRAPH_BREAK.split(text))
+            return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
 
-    def clean_text(self, text: str) -> str:
-        """Clean extracted text"""
         # Remove extra whitespace
         text = re.sub(r'\s+', ' ', text)
         # Remove special characters but keep punctuation
@@ -67,6 +212,9 @@ class PDFLoader:
         words = text.split()
         chunks = []
 
+        if not words:
+            return chunks
+
         # Calculate words per chunk based on average word length
         avg_word_length = sum(len(word) for word in words[:100]) / min(100, len(words))
         words_per_chunk = int(chunk_size / (avg_word_length + 1))
@@ -88,22 +236,41 @@ class PDFLoader:
 
         return chunks
 
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]], max_tokens: int = 256,
+                    overlap_tokens: int = 32, count_tokens: Callable[[str], int] = None) -> List[Dict[str, any]]:
+        """
+        Split cleaned page texts into sentence-aligned chunks within a token limit
+        Args:
+            pages: (page_number, text) pairs, cleaned with keep_paragraphs=True
+            max_tokens: Token limit of the embedding model
+            overlap_tokens: Tokens repeated between consecutive chunks of a paragraph
+            count_tokens: Token counter of the embedding model (default: ~4 chars per token)
+        Returns:
+            List of dicts with chunk text, chunk_id and the page range (page_start, page_end)
+        """
+        chunker = SentenceChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens,
+                                  count_tokens=count_tokens)
+        return chunker.chunk_pages(pages)
+
     def load_and_process(self, method: str = "pdfplumber",
-                         chunk_size: int = 1000,
-                         overlap: int = 200) -> List[Dict[str, any]]:
+                         max_tokens: int = 256,
+                         overlap_tokens: int = 32,
+                         count_tokens: Callable[[str], int] = None) -> List[Dict[str, any]]:
         """
         Complete pipeline: extract, clean, and chunk PDF
         Returns:
             List of processed text chunks with metadata
         """
-        # Extract text
-        raw_text = self.extract_text(method=method)
-
-        # Clean text
-        cleaned_text = self.clean_text(raw_text)
+        # Extract and clean text page by page (single pass over the file)
+        pages = [
+            (page_number, self.clean_text(page_text, keep_paragraphs=True))
+            for page_number, page_text in self.iter_pages(method=method)
+            if page_text
+        ]
 
         # Chunk text
-        chunks = self.chunk_text(cleaned_text, chunk_size=chunk_size, overlap=overlap)
+        chunks = self.chunk_pages(pages, max_tokens=max_tokens, overlap_tokens=overlap_tokens,
+                                  count_tokens=count_tokens)
 
         # Add source metadata
         for chunk in chunks:
@@ -3,29 +3,112 @@ QA Engine using Ollama (FREE local LLM)
 No API key needed, runs completely on your computer
 """
 
-import requests
-import json
-from typing import List, Dict
+import asyncio
+import logging
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Callable, List, Dict, Iterator
 from embeddings import EmbeddingGenerator
 from vector_store import VectorStore
+from ttl_cache import TTLCache
+from context_packer import ContextPacker
+from summarizer import MapReduceSummarizer
+from ollama_client import AsyncOllamaClient, OllamaClient, OllamaError
+from tracing import add_time, count, in_context, span, traced
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in the uploaded documents."
+
+# Retrieval modes: dense vectors only, or dense + BM25 fused with reciprocal rank fusion
+RETRIEVAL_MODES = ("dense", "hybrid")
+
+# Keys of a search result that hold one value per retrieved chunk
+RESULT_ROW_KEYS = ("ids", "documents", "metadatas", "distances", "fused_scores")
+
+# Sampling options sent with every generation
+GENERATION_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+}
 
 
 class QAEngine:
     """Question Answering engine using Ollama"""
 
-    def __init__(self, model: str = "llama3.2", ollama_url: str = "http://localhost:11434"):
+    def __init__(self, model: str = "llama3.2", ollama_url: str = "http://localhost:11434",
+                 embedding_cache_size: int = 1024, embedding_cache_ttl: float = 3600,
+                 answer_cache_size: int = 256, answer_cache_ttl: float = 600,
+                 ollama_client: OllamaClient = None,
+                 embedding_generator: EmbeddingGenerator = None,
+                 vector_store: VectorStore = None,
+                 retrieval_mode: str = "hybrid", hybrid_candidates: int = 20,
+                 context_token_budget: int = 1500, text_store=None,
+                 summary_workers: int = 2, summary_cache=None, batch_workers: int = 2,
+                 reranker=None, rerank_candidates: int = 40,
+                 async_ollama_factory: Callable[[], AsyncOllamaClient] = None, async_workers: int = 8):
         """
         Initialize QA engine with Ollama
         Args:
             model: Ollama model to use (llama3.2, mistral, phi, etc.)
             ollama_url: Ollama API endpoint
+            embedding_cache_size, embedding_cache_ttl: Limits of the question embedding cache
+            answer_cache_size, answer_cache_ttl: Limits of the final answer cache (0 disables)
+            ollama_client: Optional pre-configured OllamaClient (pool size, retries, timeouts)
+            embedding_generator: Optional shared EmbeddingGenerator (avoids loading the model twice)
+            vector_store: Optional shared VectorStore
+            retrieval_mode: 'hybrid' (dense + BM25, catches exact terms and part numbers) or 'dense'
+            hybrid_candidates: Results taken from each ranking before fusion
+            context_token_budget: Maximum tokens of retrieved context per prompt (keeps prompts
+                                  inside the model's context window instead of being truncated)
+            text_store: Optional PageTextStore with the extracted page texts (used for summaries)
+            summary_workers: Document parts summarized concurrently (keep below the Ollama client's
+                             max_concurrent so questions still get a slot)
+            summary_cache: Optional SummaryCache, lets interrupted summaries resume
+            batch_workers: Answers generated concurrently by answer_questions
+            reranker: Optional CrossEncoderReranker; when set, rerank_candidates chunks are retrieved
+                      and only the top_k best by cross-encoder score go into the prompt
+            rerank_candidates: First-stage candidates per question when reranking
+            async_ollama_factory: Creates the AsyncOllamaClient of an event loop for the async
+                                  methods (default: one with default settings for ollama_url)
+            async_workers: Threads that run the blocking steps (embedding, vector search,
+                           prompt packing) of the async methods
         """
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
+
         self.model = model
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_candidates = hybrid_candidates
         self.ollama_url = ollama_url
-
-        # Initialize components
-        self.embedding_generator = EmbeddingGenerator()
-        self.vector_store = VectorStore()
+        self.ollama = ollama_client or OllamaClient(ollama_url)
+        self.async_ollama_factory = async_ollama_factory or (lambda: AsyncOllamaClient(ollama_url))
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOllamaClient
+
+        # Bounded pool for the blocking steps of the async methods, so the event loop stays free
+        self._blocking_pool = ThreadPoolExecutor(max_workers=async_workers, thread_name_prefix="qa-async")
+
+        # Level 1: question -> embedding, level 2: (question, scope, model, collection version) -> answer
+        self.question_embedding_cache = TTLCache(max_size=embedding_cache_size, ttl=embedding_cache_ttl)
+        self.answer_cache = TTLCache(max_size=answer_cache_size, ttl=answer_cache_ttl)
+        self._answer_cache_version = None
+
+        # Initialize components (reuse shared ones when given)
+        self.embedding_generator = embedding_generator or EmbeddingGenerator()
+        self.vector_store = vector_store or VectorStore()
+        self.text_store = text_store
+        self.summary_workers = summary_workers
+        self.summary_cache = summary_cache
+        self.batch_workers = batch_workers
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+
+        # Tokens are counted with the embedding model's local tokenizer
+        self.context_packer = ContextPacker(
+            token_budget=context_token_budget,
+            count_tokens=self.embedding_generator.count_tokens
+        )
 
         # Test Ollama connection
         self._test_ollama_connection()
@@ -35,19 +118,14 @@ class QAEngine:
     def _test_ollama_connection(self):
         """Test if Ollama is running"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                available_models = [m['name'] for m in models]
-                print(f"✅ Ollama connected! Available models: {available_models}")
-
-                if self.model not in available_models and f"{self.model}:latest" not in available_models:
-                    print(f"⚠️  Model '{self.model}' not found. Downloading...")
-                    print(f"Run: ollama pull {self.model}")
-            else:
-                print("⚠️  Ollama is not responding")
-        except requests.exceptions.ConnectionError:
-            print("❌ Ollama is not running!")
+            available_models = self.ollama.list_models()
+            print(f"✅ Ollama connected! Available models: {available_models}")
+
+            if self.model not in available_models and f"{self.model}:latest" not in available_models:
+                print(f"⚠️  Model '{self.model}' not found. Downloading...")
+                print(f"Run: ollama pull {self.model}")
+        except OllamaError as e:
+            print(f"❌ Ollama is not available: {e}")
             print("Please install and start Ollama:")
             print("1. Download from: https://ollama.ai")
             print(f"2. Run: ollama pull {self.model}")
@@ -56,97 +134,554 @@ class QAEngine:
             print(f"⚠️  Error connecting to Ollama: {e}")
 
     def answer_question(self, question: str, top_k: int = 5,
-                        pdf_source: str = None) -> Dict:
+                        pdf_source: str = None, content_hash: str = None,
+                        shard_key: str = None) -> Dict:
         """
         Answer a question using RAG with Ollama
         Args:
             question: User's question
             top_k: Number of relevant chunks to retrieve
             pdf_source: Optional - search only in specific PDF
+            content_hash: Optional - search only in the PDF with this content hash
+            shard_key: Optional - vector store shard to search (default: all shards)
         Returns:
             Dict with answer and metadata
         """
-        # Step 1: Generate embedding for the question
-        question_embedding = self.embedding_generator.encode_text(question)
+        cache_key = self._answer_cache_key(question, top_k, pdf_source, content_hash, shard_key)
+        cached = self._cached_answer(cache_key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        # Step 1-2: Embed the question and search for relevant chunks (then rerank them)
+        timings = {}
+        search_results = self._retrieve(question, top_k, pdf_source, content_hash, shard_key, timings)
+        return self._answer_from_search(question, search_results, cache_key, timings)
+
+    def answer_questions(self, questions: List[str], top_k: int = 5,
+                         pdf_source: str = None, content_hash: str = None,
+                         shard_key: str = None, max_workers: int = None) -> Iterator[Dict]:
+        """
+        Answer many questions with shared retrieval: all questions are embedded in one
+        batch and searched with one multi-query call, then answers are generated concurrently
+        Args:
+            questions: User questions
+            top_k, pdf_source, content_hash, shard_key: Same as answer_question
+            max_workers: Answers generated at the same time (default: batch_workers)
+        Yields:
+            answer_question result dicts plus 'index' (position in questions) and 'question',
+            as soon as each answer is ready (not in question order). Embed/retrieve/rerank
+            timings are for the whole batch.
+        """
+        # Cached answers are returned right away; repeated questions are answered once
+        pending = {}
+        for index, question in enumerate(questions):
+            cache_key = self._answer_cache_key(question, top_k, pdf_source, content_hash, shard_key)
+            cached = self._cached_answer(cache_key)
+            if cached is not None:
+                yield dict(cached, cached=True, index=index, question=question)
+            else:
+                pending.setdefault(cache_key, []).append(index)
+        if not pending:
+            return
 
-        # Step 2: Search for relevant chunks
-        search_results = self.vector_store.search(
-            query_embedding=question_embedding.tolist(),
-            top_k=top_k,
-            filter_source=pdf_source
-        )
+        cache_keys = list(pending)
+        texts = [questions[pending[cache_key][0]] for cache_key in cache_keys]
+        timings = {}
+        all_results = self._retrieve_batch(texts, top_k, pdf_source, content_hash, shard_key, timings)
 
-        if not search_results['documents'][0]:
-            return {
-                'answer': "I couldn't find any relevant information in the uploaded documents.",
-                'sources': [],
-                'context_used': []
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers or self.batch_workers, len(texts))),
+                                      thread_name_prefix="batch-answer")
+        try:
+            futures = {
+                executor.submit(in_context(self._answer_from_search), text, search_results, cache_key,
+                                dict(timings)): cache_key
+                for text, search_results, cache_key in zip(texts, all_results, cache_keys)
             }
+            for future in as_completed(futures):
+                result = future.result()
+                for index in pending[futures[future]]:
+                    yield dict(result, index=index, question=questions[index])
+        finally:
+            # The consumer may stop early (client disconnected): drop answers not started yet
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _answer_from_search(self, question: str, search_results: Dict, cache_key: tuple,
+                            timings: Dict = None) -> Dict:
+        """
+        Generate the answer for retrieved chunks (steps 3-6 of answer_question)
+        Args:
+            timings: Stage timings so far (seconds), completed with 'generate'
+        Returns:
+            Dict with answer and metadata (cached in the answer cache on success)
+        """
+        timings = timings if timings is not None else {}
+        if not search_results['documents'][0]:
+            return self._no_context_result(timings)
 
-        # Step 3: Prepare context from retrieved chunks
-        retrieved_chunks = search_results['documents'][0]
-        distances = search_results['distances'][0]
-        metadatas = search_results['metadatas'][0]
-
-        context = "\n\n".join([
-            f"[Chunk {i + 1}]:\n{chunk}"
-            for i, chunk in enumerate(retrieved_chunks)
-        ])
-
-        # Step 4: Create prompt
-        prompt = self._create_prompt(question, context)
+        # Steps 3-4: Create prompt (deduplicated, merged and fitted to the token budget)
+        prompt, packing = self._build_prompt(question, search_results)
 
         # Step 5: Get answer from Ollama
+        start = time.perf_counter()
         try:
             answer = self._query_ollama(prompt)
         except Exception as e:
-            return {
-                'answer': f"Error getting response from Ollama: {str(e)}. Make sure Ollama is running and the model is downloaded.",
-                'sources': [],
-                'context_used': []
-            }
+            return self._generation_error(e)
+        timings['generate'] = time.perf_counter() - start
+        add_time('generate', timings['generate'])
 
         # Step 6: Prepare response with metadata
+        result = self._build_result(answer, search_results, packing)
+        self.answer_cache.set(cache_key, result)
+        # Timings describe this call only, so they are not cached
+        return dict(result, cached=False, timings=self._report_timings(timings))
+
+    def _build_prompt(self, question: str, search_results: Dict) -> tuple:
+        """
+        Prompt for retrieved chunks (steps 3-4 of answer_question)
+        Returns:
+            (prompt, packing report from ContextPacker.pack)
+        """
+        with span('prompt'):
+            context, packing = self._pack_context(search_results['documents'][0], search_results['metadatas'][0])
+            count('context_tokens', packing['tokens_used'])
+            return self._create_prompt(question, context), packing
+
+    def _build_result(self, answer: str, search_results: Dict, packing: Dict) -> Dict:
+        """Answer dict with its sources (step 6 of answer_question; this is what gets cached)"""
+        return dict(
+            self._packed_sources(search_results, packing),
+            answer=answer,
+            context_used=[block['text'] for block in packing['blocks']],
+            context_tokens=packing['tokens_used']
+        )
+
+    def _sources_event(self, search_results: Dict, packing: Dict) -> Dict:
+        """First event of a streamed answer: where the answer comes from"""
+        sources = self._packed_sources(search_results, packing)
+        return {'type': 'sources', 'sources': sources['sources'], 'pages': sources['pages'],
+                'relevance_scores': sources['relevance_scores']}
+
+    @staticmethod
+    def _packed_sources(search_results: Dict, packing: Dict) -> Dict:
+        """
+        Sources of the blocks that went into the prompt (not every retrieved chunk), one entry per block
+        Returns:
+            Dict with 'sources', 'pages' ([start, end] or None), 'relevance_scores' and, after
+            reranking, 'rerank_scores' (scores of each block's most relevant chunk)
+        """
+        blocks = packing['blocks']
+        distances = search_results['distances'][0]
+        sources = {
+            'sources': [block['source'] for block in blocks],
+            'pages': [list(block['pages']) if block['pages'] else None for block in blocks],
+            'relevance_scores': [1 - distances[block['rank']] for block in blocks],
+        }
+        if 'rerank_scores' in search_results:
+            sources['rerank_scores'] = [search_results['rerank_scores'][0][block['rank']] for block in blocks]
+        return sources
+
+    def _no_context_result(self, timings: Dict) -> Dict:
         return {
-            'answer': answer,
-            'sources': [meta['source'] for meta in metadatas],
-            'context_used': retrieved_chunks,
-            'relevance_scores': [1 - d for d in distances]
+            'answer': NO_CONTEXT_ANSWER,
+            'sources': [],
+            'context_used': [],
+            'timings': self._report_timings(timings)
         }
 
+    @staticmethod
+    def _generation_error(error: Exception) -> Dict:
+        return {
+            'answer': f"Error getting response from Ollama: {str(error)}. Make sure Ollama is running and the model is downloaded.",
+            'sources': [],
+            'context_used': []
+        }
+
+    def answer_question_stream(self, question: str, top_k: int = 5,
+                               pdf_source: str = None, content_hash: str = None,
+                               shard_key: str = None) -> Iterator[Dict]:
+        """
+        Answer a question like answer_question, but stream the answer as Ollama generates it
+        Args:
+            question: User's question
+            top_k: Number of relevant chunks to retrieve
+            pdf_source: Optional - search only in specific PDF
+            content_hash: Optional - search only in the PDF with this content hash
+            shard_key: Optional - vector store shard to search (default: all shards)
+        Yields:
+            Event dicts: {'type': 'sources', ...} once, {'type': 'token', 'token': str} per token,
+            then {'type': 'done', 'answer': full answer, ...} or {'type': 'error', 'error': str}
+        """
+        cache_key = self._answer_cache_key(question, top_k, pdf_source, content_hash, shard_key)
+        cached = self._cached_answer(cache_key)
+        if cached is not None:
+            yield {'type': 'sources', 'sources': cached['sources'], 'pages': cached.get('pages', []),
+                   'relevance_scores': cached.get('relevance_scores', [])}
+            yield {'type': 'token', 'token': cached['answer']}
+            yield dict(cached, type='done', cached=True)
+            return
+
+        timings = {}
+        search_results = self._retrieve(question, top_k, pdf_source, content_hash, shard_key, timings)
+
+        if not search_results['documents'][0]:
+            yield {'type': 'sources', 'sources': [], 'pages': [], 'relevance_scores': []}
+            yield {'type': 'token', 'token': NO_CONTEXT_ANSWER}
+            yield {'type': 'done', 'answer': NO_CONTEXT_ANSWER, 'sources': [], 'context_used': [],
+                   'cached': False, 'timings': self._report_timings(timings)}
+            return
+
+        # Sources are known before generation starts, so the UI can show them right away
+        prompt, packing = self._build_prompt(question, search_results)
+        yield self._sources_event(search_results, packing)
+
+        tokens = []
+        start = time.perf_counter()
+        try:
+            for token in self._stream_ollama(prompt):
+                tokens.append(token)
+                yield {'type': 'token', 'token': token}
+        except Exception as e:
+            yield {'type': 'error', 'error': self._generation_error(e)['answer']}
+            return
+
+        result = self._build_result("".join(tokens), search_results, packing)
+        self.answer_cache.set(cache_key, result)
+        timings['generate'] = time.perf_counter() - start
+        add_time('generate', timings['generate'])
+        yield dict(result, type='done', cached=False, timings=self._report_timings(timings))
+
+    # ---- async (ASGI) path ----
+
+    async def answer_question_async(self, question: str, top_k: int = 5,
+                                    pdf_source: str = None, content_hash: str = None,
+                                    shard_key: str = None) -> Dict:
+        """
+        Answer a question like answer_question, without blocking the event loop
+        Embedding, search and prompt packing run on the bounded blocking pool; the
+        generation is awaited on the async Ollama client, so a pending answer holds no thread.
+        Returns:
+            Same dict as answer_question
+        """
+        timings = {}
+        prepared = await self._run_blocking(self._prepare_answer, question, top_k, pdf_source,
+                                            content_hash, shard_key, timings)
+        if prepared['cached'] is not None:
+            return dict(prepared['cached'], cached=True)
+        if prepared['prompt'] is None:
+            return self._no_context_result(timings)
+
+        start = time.perf_counter()
+        try:
+            answer = await self._async_ollama().generate(self.model, prepared['prompt'], options=GENERATION_OPTIONS)
+        except Exception as e:
+            return self._generation_error(e)
+        timings['generate'] = time.perf_counter() - start
+        add_time('generate', timings['generate'])
+
+        result = self._build_result(answer, prepared['search_results'], prepared['packing'])
+        self.answer_cache.set(prepared['cache_key'], result)
+        return dict(result, cached=False, timings=self._report_timings(timings))
+
+    async def answer_question_stream_async(self, question: str, top_k: int = 5,
+                                           pdf_source: str = None, content_hash: str = None,
+                                           shard_key: str = None) -> AsyncIterator[Dict]:
+        """
+        Stream an answer like answer_question_stream, without blocking the event loop
+        Yields:
+            Same events as answer_question_stream
+        """
+        timings = {}
+        prepared = await self._run_blocking(self._prepare_answer, question, top_k, pdf_source,
+                                            content_hash, shard_key, timings)
+        cached = prepared['cached']
+        if cached is not None:
+            yield {'type': 'sources', 'sources': cached['sources'], 'pages': cached.get('pages', []),
+                   'relevance_scores': cached.get('relevance_scores', [])}
+            yield {'type': 'token', 'token': cached['answer']}
+            yield dict(cached, type='done', cached=True)
+            return
+        if prepared['prompt'] is None:
+            yield {'type': 'sources', 'sources': [], 'pages': [], 'relevance_scores': []}
+            yield {'type': 'token', 'token': NO_CONTEXT_ANSWER}
+            yield dict(self._no_context_result(timings), type='done', cached=False)
+            return
+
+        search_results = prepared['search_results']
+        yield self._sources_event(search_results, prepared['packing'])
+
+        tokens = []
+        start = time.perf_counter()
+        try:
+            async for token in self._async_ollama().generate_stream(self.model, prepared['prompt'],
+                                                                    options=GENERATION_OPTIONS):
+                tokens.append(token)
+                yield {'type': 'token', 'token': token}
+        except Exception as e:
+            yield {'type': 'error', 'error': self._generation_error(e)['answer']}
+            return
+
+        result = self._build_result("".join(tokens), search_results, prepared['packing'])
+        self.answer_cache.set(prepared['cache_key'], result)
+        timings['generate'] = time.perf_counter() - start
+        add_time('generate', timings['generate'])
+        yield dict(result, type='done', cached=False, timings=self._report_timings(timings))
+
+    def _prepare_answer(self, question: str, top_k: int, pdf_source: str, content_hash: str,
+                        shard_key: str, timings: Dict) -> Dict:
+        """
+        Everything before generation, in one blocking call (steps 1-4 of answer_question)
+        Returns:
+            Dict with 'cache_key' and 'cached' (cached answer or None), and on a cache miss
+            'search_results', 'prompt' (None when nothing relevant was found) and 'packing'
+        """
+        cache_key = self._answer_cache_key(question, top_k, pdf_source, content_hash, shard_key)
+        prepared = {'cache_key': cache_key, 'cached': self._cached_answer(cache_key),
+                    'search_results': None, 'prompt': None, 'packing': None}
+        if prepared['cached'] is None:
+            search_results = self._retrieve(question, top_k, pdf_source, content_hash, shard_key, timings)
+            prepared['search_results'] = search_results
+            if search_results['documents'][0]:
+                prepared['prompt'], prepared['packing'] = self._build_prompt(question, search_results)
+        return prepared
+
+    async def _run_blocking(self, function, *args):
+        """Run a blocking call on the bounded pool and await its result"""
+        # Executor threads don't inherit context variables: bind the call to the current trace
+        return await asyncio.get_running_loop().run_in_executor(self._blocking_pool, in_context(function), *args)
+
+    async def aclose(self) -> None:
+        """Close the async Ollama client of the running event loop (e.g. at ASGI server shutdown)"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _async_ollama(self) -> AsyncOllamaClient:
+        """
+        Async Ollama client of the running event loop (its connections can't be shared across loops)
+        One client, and so one max_concurrent limit, serves every request on the loop; an ASGI
+        server runs one loop per process. Per-request loops (WSGI) should use the sync methods.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = self.async_ollama_factory()
+        return client
+
+    def _cached_answer(self, cache_key: tuple):
+        """Cached answer for the key, or None (counted in the current trace)"""
+        cached = self.answer_cache.get(cache_key)
+        count('answer_cache_misses' if cached is None else 'answer_cache_hits')
+        return cached
+
+    def _answer_cache_key(self, question: str, top_k: int, pdf_source: str, content_hash: str,
+                          shard_key: str = None) -> tuple:
+        """Answer cache key; also drops cached answers once the collection changed"""
+        # Answers are only valid for the collection contents they were built from
+        version = self.vector_store.get_version()
+        if version != self._answer_cache_version:
+            self.answer_cache.clear()
+            self._answer_cache_version = version
+
+        reranker = self.reranker.model_name if self.reranker else None
+        return (self._normalize_question(question).lower(), top_k,
+                pdf_source, content_hash, shard_key, self.retrieval_mode, reranker, self.model, version)
+
+    def _retrieve(self, question: str, top_k: int, pdf_source: str, content_hash: str,
+                  shard_key: str = None, timings: Dict = None) -> Dict:
+        """
+        Embed the question, search the vector store (dense or hybrid) and rerank the candidates
+        Args:
+            timings: Optional dict that receives 'embed', 'retrieve' and 'rerank' seconds
+        """
+        timings = timings if timings is not None else {}
+        start = time.perf_counter()
+        question_embedding = self._embed_question(question)
+        timings['embed'] = time.perf_counter() - start
+
+        # With a reranker, the first stage only has to get the right chunks into a wide candidate set
+        candidates = max(self.rerank_candidates, top_k) if self.reranker else top_k
+        start = time.perf_counter()
+        if self.retrieval_mode == "hybrid":
+            search_results = self.vector_store.hybrid_search(
+                query_text=question,
+                query_embedding=question_embedding.tolist(),
+                top_k=candidates,
+                filter_source=pdf_source,
+                filter_content_hash=content_hash,
+                shard_key=shard_key,
+                candidates=max(self.hybrid_candidates, candidates)
+            )
+        else:
+            search_results = self.vector_store.search(
+                query_embedding=question_embedding.tolist(),
+                top_k=candidates,
+                filter_source=pdf_source,
+                filter_content_hash=content_hash,
+                shard_key=shard_key
+            )
+        timings['retrieve'] = time.perf_counter() - start
+
+        if self.reranker:
+            start = time.perf_counter()
+            search_results = self._rerank([question], [search_results], top_k)[0]
+            timings['rerank'] = time.perf_counter() - start
+        return search_results
+
+    def _retrieve_batch(self, questions: List[str], top_k: int, pdf_source: str,
+                        content_hash: str, shard_key: str = None, timings: Dict = None) -> List[Dict]:
+        """Embed, search and rerank several questions at once (one result per question)"""
+        timings = timings if timings is not None else {}
+        start = time.perf_counter()
+        query_embeddings = [embedding.tolist() for embedding in self._embed_questions(questions)]
+        timings['embed'] = time.perf_counter() - start
+
+        candidates = max(self.rerank_candidates, top_k) if self.reranker else top_k
+        start = time.perf_counter()
+        if self.retrieval_mode == "hybrid":
+            all_results = self.vector_store.hybrid_search_batch(
+                query_texts=questions,
+                query_embeddings=query_embeddings,
+                top_k=candidates,
+                filter_source=pdf_source,
+                filter_content_hash=content_hash,
+                shard_key=shard_key,
+                candidates=max(self.hybrid_candidates, candidates)
+            )
+        else:
+            all_results = self.vector_store.search_batch(
+                query_embeddings=query_embeddings,
+                top_k=candidates,
+                filter_source=pdf_source,
+                filter_content_hash=content_hash,
+                shard_key=shard_key
+            )
+        timings['retrieve'] = time.perf_counter() - start
+
+        if self.reranker:
+            start = time.perf_counter()
+            all_results = self._rerank(questions, all_results, top_k)
+            timings['rerank'] = time.perf_counter() - start
+        return all_results
+
+    @traced('rerank')
+    def _rerank(self, questions: List[str], all_results: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Keep the top_k candidates of each search result by cross-encoder score
+        All (question, candidate) pairs are scored in one batched call.
+        Returns:
+            Search results (same format) in reranked order, plus 'rerank_scores'
+        """
+        pairs = [(question, text) for question, results in zip(questions, all_results)
+                 for text in results['documents'][0]]
+        scores = self.reranker.score_pairs(pairs)
+
+        reranked, offset = [], 0
+        for results in all_results:
+            num_candidates = len(results['documents'][0])
+            own = scores[offset:offset + num_candidates]
+            offset += num_candidates
+            order = sorted(range(num_candidates), key=lambda i: own[i], reverse=True)[:top_k]
+            kept = {key: [[results[key][0][i] for i in order]]
+                    for key in RESULT_ROW_KEYS if results.get(key)}
+            kept['rerank_scores'] = [[own[i] for i in order]]
+            reranked.append(kept)
+        return reranked
+
+    @staticmethod
+    def _report_timings(timings: Dict) -> Dict:
+        """Log the per-stage latency split (debug level) and return it in milliseconds"""
+        report = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+        if report:
+            logger.debug("Timings: %s", ", ".join(f"{stage} {ms} ms" for stage, ms in report.items()))
+        return report
+
+    @staticmethod
+    def _page_label(pages) -> str:
+        """', p. 3' / ', pp. 3-4' for a page range, '' when the chunk has no page numbers"""
+        if not pages:
+            return ""
+        start, end = pages
+        return f", p. {start}" if start == end else f", pp. {start}-{end}"
+
+    def _pack_context(self, retrieved_chunks: List[str], metadatas: List[Dict]) -> tuple:
+        """
+        Fit retrieved chunks into the context token budget
+        Returns:
+            (prompt context, packing report from ContextPacker.pack)
+        """
+        packing = self.context_packer.pack(retrieved_chunks, metadatas)
+        context = "\n\n".join([
+            f"[Chunk {i + 1}{self._page_label(block['pages'])}]:\n{block['text']}"
+            for i, block in enumerate(packing['blocks'])
+        ])
+        logger.debug("Context: %s/%s tokens, %s blocks from %s chunks (%s merged, %s duplicates dropped)",
+                     packing['tokens_used'], packing['token_budget'], len(packing['blocks']),
+                     packing['chunks_in'], packing['chunks_merged'], packing['duplicates_dropped'])
+        return context, packing
+
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """Collapse whitespace so trivially different copies of a question share cache entries"""
+        return " ".join(question.split())
+
+    def _embed_question(self, question: str):
+        """Question embedding, served from the in-memory cache when possible"""
+        key = (self.embedding_generator.model_name, self._normalize_question(question))
+        embedding = self.question_embedding_cache.get(key)
+        count('question_embedding_cache_misses' if embedding is None else 'question_embedding_cache_hits')
+        if embedding is None:
+            embedding = self.embedding_generator.encode_text(question)
+            self.question_embedding_cache.set(key, embedding)
+        return embedding
+
+    def _embed_questions(self, questions: List[str]) -> List:
+        """Embeddings of several questions: cache hits, then the misses in one encode_batch call"""
+        keys = [(self.embedding_generator.model_name, self._normalize_question(q)) for q in questions]
+        embeddings = [self.question_embedding_cache.get(key) for key in keys]
+
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        count('question_embedding_cache_hits', len(questions) - len(misses))
+        count('question_embedding_cache_misses', len(misses))
+        if misses:
+            computed = self.embedding_generator.encode_batch([questions[i] for i in misses], show_progress=False)
+            for i, embedding in zip(misses, computed):
+                embeddings[i] = embedding
+                self.question_embedding_cache.set(keys[i], embedding)
+        return embeddings
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters of the question embedding, answer and rerank score caches"""
+        stats = {
+            'question_embeddings': self.question_embedding_cache.stats(),
+            'answers': self.answer_cache.stats(),
+        }
+        if self.reranker:
+            stats['rerank_scores'] = self.reranker.cache_stats()
+        return stats
+
     def _query_ollama(self, prompt: str, stream: bool = False) -> str:
         """
         Query Ollama API
         Args:
             prompt: The prompt to send
-            stream: Whether to stream the response
+            stream: Whether to stream the response (tokens are joined into the returned text)
         Returns:
             Generated text
         """
-        url = f"{self.ollama_url}/api/generate"
-
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": stream,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-            }
-        }
-
-        try:
-            response = requests.post(url, json=payload, timeout=120)
+        if stream:
+            return "".join(self._stream_ollama(prompt))
+        return self.ollama.generate(self.model, prompt, options=GENERATION_OPTIONS)
 
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', '')
-            else:
-                raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
-        except requests.exceptions.Timeout:
-            raise Exception("Ollama request timed out. The model might be downloading or processing is slow.")
-        except requests.exceptions.ConnectionError:
-            raise Exception("Cannot connect to Ollama. Make sure it's running at " + self.ollama_url)
+    def _stream_ollama(self, prompt: str) -> Iterator[str]:
+        """
+        Stream tokens from the Ollama API (NDJSON, one JSON object per line)
+        Args:
+            prompt: The prompt to send
+        Yields:
+            Generated text fragments as soon as Ollama produces them
+        """
+        return self.ollama.generate_stream(self.model, prompt, options=GENERATION_OPTIONS)
 
     def _create_prompt(self, question: str, context: str) -> str:
         """Create prompt for Ollama with question and context"""
@@ -167,42 +702,59 @@ Instructions:
 Answer:"""
         return prompt
 
-    def summarize_document(self, pdf_source: str = None, max_length: int = 500) -> str:
+    def summarize_document(self, pdf_source: str = None, max_length: int = 500,
+                           content_hash: str = None, shard_key: str = None,
+                           progress_callback=None) -> str:
         """
-        Generate a summary of the document(s)
+        Generate a summary of a whole document (map-reduce over all of its text)
         Args:
             pdf_source: Optional - summarize specific PDF only
             max_length: Target length of summary
+            content_hash: Optional - summarize the PDF with this content hash only
+            shard_key: Optional - vector store shard holding the PDF
+            progress_callback: Optional callable(fraction) called as parts are summarized
         Returns:
             Summary text
         """
-        # Get sample of chunks to summarize
-        all_chunks = self.vector_store.collection.get(
-            where={"source": pdf_source} if pdf_source else None,
-            limit=10
-        )
-
-        if not all_chunks['documents']:
+        # Stored page texts give the document in reading order; otherwise use its stored chunks
+        pages = self._stored_pages(content_hash)
+        if not pages:
+            all_chunks = self.vector_store.get_documents(
+                filter_source=pdf_source,
+                filter_content_hash=content_hash,
+                shard_key=shard_key
+            )
+            pages = sorted(
+                (meta.get('chunk_id', 0), text)
+                for text, meta in zip(all_chunks['documents'], all_chunks['metadatas'])
+            )
+
+        if not pages:
             return "No documents found to summarize."
 
-        # Combine chunks
-        content = "\n\n".join(all_chunks['documents'][:5])
-
-        # Create summary prompt
-        prompt = f"""Please provide a comprehensive summary of the following document excerpt. 
-The summary should be approximately {max_length} words and capture the main points and key information.
-
-Document excerpt:
-{content}
-
-Summary:"""
-
+        summarizer = MapReduceSummarizer(
+            self._query_ollama,
+            count_tokens=self.context_packer.count_tokens,
+            group_tokens=self.context_packer.token_budget,
+            max_workers=self.summary_workers,
+            cache=self.summary_cache,
+            cache_namespace=self.model
+        )
         try:
-            summary = self._query_ollama(prompt)
-            return summary
+            return summarizer.summarize(pages, max_length=max_length, progress_callback=progress_callback)
         except Exception as e:
             return f"Error generating summary: {str(e)}"
 
+    def _stored_pages(self, content_hash: str) -> List[tuple]:
+        """(page_number, text) of a document's stored page texts (empty when not stored)"""
+        if self.text_store is None or not content_hash:
+            return []
+        artifact = self.text_store.open(content_hash)
+        if artifact is None:
+            return []
+        with artifact:
+            return [(page_number, text) for page_number, text in artifact.iter_pages() if text.strip()]
+
     def get_available_documents(self) -> List[str]:
         """Get list of all available PDF documents"""
         return self.vector_store.get_all_sources()
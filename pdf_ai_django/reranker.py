@@ -0,0 +1,106 @@
+import hashlib
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Second-stage reranker: scores (question, chunk) pairs with a small local cross-encoder
+
+    The vector search is cheap but only compares two independent embeddings; the
+    cross-encoder reads question and chunk together, so a wide candidate set can be
+    cut down to the few chunks that are really worth sending to the LLM.
+    Runs on CPU in batches; scores are cached per (question, chunk text).
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 batch_size: int = 32, max_length: int = 512, device: str = "cpu",
+                 cache_size: int = 4096, cache_ttl: float = 3600):
+        """
+        Initialize the cross-encoder
+        Args:
+            model_name: HuggingFace cross-encoder. Options:
+                - 'cross-encoder/ms-marco-MiniLM-L-6-v2' (fast) - RECOMMENDED
+                - 'cross-encoder/ms-marco-MiniLM-L-12-v2' (better quality, ~2x slower)
+                - 'cross-encoder/ms-marco-TinyBERT-L-2-v2' (fastest)
+            batch_size: Pairs scored per forward pass
+            max_length: Longer (question + chunk) inputs are truncated
+            device: Torch device ('cpu' keeps the GPU, if any, for the embedding model)
+            cache_size, cache_ttl: Limits of the (question, chunk) score cache
+        """
+        # Imported here so importing this module stays cheap (torch loads with it)
+        from sentence_transformers import CrossEncoder
+
+        logger.debug("Loading reranker model: %s", model_name)
+        self.model = CrossEncoder(model_name, max_length=max_length, device=device)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.score_cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        logger.debug("Reranker loaded.")
+
+    @staticmethod
+    def _cache_key(question: str, text: str) -> Tuple[str, str]:
+        # Chunk texts are long: key on a digest instead of keeping them in memory twice
+        return " ".join(question.split()).lower(), hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """
+        Relevance scores of (question, chunk text) pairs (higher = more relevant)
+        Only pairs missing from the cache go through the model, in one batched call.
+        """
+        keys = [self._cache_key(question, text) for question, text in pairs]
+        scores = [self.score_cache.get(key) for key in keys]
+
+        # Repeated pairs are scored once
+        misses = {}
+        for i, score in enumerate(scores):
+            if score is None:
+                misses.setdefault(keys[i], []).append(i)
+
+        if misses:
+            computed = self.model.predict(
+                [pairs[indices[0]] for indices in misses.values()],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+            for (key, indices), score in zip(misses.items(), np.asarray(computed, dtype=np.float32).reshape(-1)):
+                self.score_cache.set(key, float(score))
+                for i in indices:
+                    scores[i] = float(score)
+        return scores
+
+    def rerank(self, question: str, texts: List[str], top_n: int = None) -> List[Tuple[int, float]]:
+        """
+        Order candidate chunks by cross-encoder score
+        Args:
+            question: User's question
+            texts: Candidate chunk texts
+            top_n: Keep only the best top_n (None = all)
+        Returns:
+            (candidate index, score) pairs, best first
+        """
+        scores = self.score_pairs([(question, text) for text in texts])
+        order = sorted(range(len(texts)), key=lambda i: scores[i], reverse=True)
+        return [(i, scores[i]) for i in order[:top_n]]
+
+    def cache_stats(self) -> Dict:
+        return self.score_cache.stats()
+
+
+if __name__ == "__main__":
+    # Test the reranker
+    reranker = CrossEncoderReranker()
+    candidates = [
+        "The capital of France is Paris.",
+        "Machine learning is a field of artificial intelligence that learns from data.",
+        "Bananas are rich in potassium.",
+    ]
+    for index, score in reranker.rerank("What is machine learning?", candidates):
+        print(f"{score:7.3f}  {candidates[index]}")
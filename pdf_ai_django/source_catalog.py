@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+
+class SourceCatalog:
+    """
+    Per-source chunk counts for a vector collection, kept in a small SQLite side table
+
+    VectorStore updates it on every add/delete so listing sources and stats
+    never have to scan the collection. Safe to share between processes and threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the catalog
+        Args:
+            path: SQLite file of the catalog
+        """
+        self.path = path
+        self.created = not os.path.exists(path)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+
+        # Catalogs from before sharding have no shard column: start over (VectorStore rebuilds it)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(sources)")]
+        if columns and 'shard' not in columns:
+            self._db.execute("DROP TABLE sources")
+            self.created = True
+
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (
+                shard TEXT NOT NULL DEFAULT '',
+                source TEXT NOT NULL,
+                content_hash TEXT NOT NULL DEFAULT '',
+                chunks INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (shard, source, content_hash)
+            );
+            CREATE INDEX IF NOT EXISTS sources_content_hash ON sources (content_hash);
+        """)
+
+    def record_add(self, source: str, chunks: int, content_hash: str = None, shard: str = None) -> None:
+        """
+        Record chunks stored for a source (in a shard, None = the unsharded collection)
+        Chunk ids are deterministic, so re-adding the same document overwrites
+        its chunks: the count is the larger of the old and new counts, not the sum.
+        """
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO sources VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (shard, source, content_hash)
+                DO UPDATE SET chunks = MAX(chunks, excluded.chunks), updated_at = excluded.updated_at
+            """, (shard or '', source, content_hash or '', chunks, time.time()))
+
+    def _remove(self, column: str, value: str, shard: str = None, all_shards: bool = True) -> None:
+        with self._lock:
+            if all_shards:
+                self._db.execute(f"DELETE FROM sources WHERE {column} = ?", (value,))
+            else:
+                self._db.execute(f"DELETE FROM sources WHERE {column} = ? AND shard = ?", (value, shard or ''))
+
+    def remove_source(self, source: str, shard: str = None, all_shards: bool = True) -> None:
+        """Forget the entries of a source name (in one shard, or in every shard)"""
+        self._remove('source', source, shard, all_shards)
+
+    def remove_content_hash(self, content_hash: str, shard: str = None, all_shards: bool = True) -> None:
+        """Forget the entries stored under a content hash (in one shard, or in every shard)"""
+        self._remove('content_hash', content_hash, shard, all_shards)
+
+    def clear(self) -> None:
+        """Forget every source"""
+        with self._lock:
+            self._db.execute("DELETE FROM sources")
+
+    def replace_all(self, counts: Dict[tuple, int]) -> None:
+        """
+        Replace the catalog contents in one transaction
+        Args:
+            counts: {(shard or '', source, content_hash or ''): chunk count}
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM sources")
+                self._db.executemany(
+                    "INSERT INTO sources VALUES (?, ?, ?, ?, ?)",
+                    [(shard, source, content_hash, chunks, now)
+                     for (shard, source, content_hash), chunks in counts.items()]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def source_names(self) -> List[str]:
+        """Distinct source names, sorted"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT source FROM sources ORDER BY source")]
+
+    def count_sources(self) -> int:
+        """Number of distinct source names"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(DISTINCT source) FROM sources").fetchone()[0]
+
+    def total_chunks(self) -> int:
+        """Sum of chunk counts over all sources"""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(chunks), 0) FROM sources").fetchone()[0]
+
+    def list_sources(self, offset: int = 0, limit: int = 100) -> List[Dict]:
+        """
+        One page of catalog entries, ordered by source name
+        Args:
+            offset: Entries to skip
+            limit: Maximum entries to return
+        Returns:
+            List of dicts with source, content_hash, shard, chunks and updated_at
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT source, content_hash, shard, chunks, updated_at FROM sources "
+                "ORDER BY source, content_hash, shard LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [
+            {'source': source, 'content_hash': content_hash or None, 'shard': shard or None,
+             'chunks': chunks, 'updated_at': updated_at}
+            for source, content_hash, shard, chunks, updated_at in rows
+        ]
+
+
+if __name__ == "__main__":
+    # Test the catalog in a temporary file
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = SourceCatalog(os.path.join(tmp, "catalog.sqlite3"))
+        catalog.record_add("a.pdf", 10, "hash-a")
+        catalog.record_add("a.pdf", 10, "hash-a")
+        catalog.record_add("b.pdf", 4)
+        print(f"Sources: {catalog.source_names()} ({catalog.total_chunks()} chunks)")
+        print(f"Page: {catalog.list_sources(offset=1, limit=1)}")
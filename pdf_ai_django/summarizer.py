@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from chunker import SentenceChunker
+from tracing import in_context
+
+# Reduce levels before the remaining summaries are cut to one prompt (each level shrinks the input)
+MAX_REDUCE_LEVELS = 8
+
+MAP_PROMPT = """Summarize the following part of a document in at most {words} words.
+Keep the key facts, names, numbers and conclusions. Do not add information that is not in the text.
+
+Document part:
+{text}
+
+Summary:"""
+
+REDUCE_PROMPT = """The following are summaries of consecutive parts of one document.
+Combine them into a single summary of at most {words} words, keeping the order and the key information.
+
+Partial summaries:
+{text}
+
+Combined summary:"""
+
+FINAL_PROMPT = """Please provide a comprehensive summary of the following document, given as summaries of its parts in order.
+The summary should be approximately {words} words and capture the main points and key information.
+
+Document:
+{text}
+
+Summary:"""
+
+
+class SummaryCache:
+    """
+    Persistent cache of intermediate summaries, stored in SQLite
+
+    Keyed by (model, prompt), so an interrupted summarization resumes where it
+    stopped and identical document parts are summarized once.
+    Safe to share between processes and threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file of the cache
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def make_key(namespace: str, prompt: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (key, summary, time.time()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM summaries")
+
+
+class MapReduceSummarizer:
+    """
+    Summarize a whole document with prompts that each fit the model's context
+
+    Map: the text is cut into sentence-aligned groups of at most group_tokens tokens,
+    which are summarized concurrently (bounded by max_workers).
+    Reduce: the partial summaries are grouped and summarized again, level by level,
+    until they fit one final prompt.
+    """
+
+    def __init__(self, generate: Callable[[str], str], count_tokens: Callable[[str], int] = None,
+                 group_tokens: int = 1500, max_workers: int = 2, partial_words: int = 150,
+                 cache: SummaryCache = None, cache_namespace: str = ""):
+        """
+        Args:
+            generate: Callable(prompt) -> generated text (e.g. QAEngine._query_ollama)
+            count_tokens: Token counter (default: ~4 chars per token)
+            group_tokens: Maximum document tokens per prompt
+            max_workers: Prompts generated at the same time
+            partial_words: Target length of intermediate summaries
+            cache: Optional SummaryCache for intermediate summaries
+            cache_namespace: Part of the cache key (e.g. the model name)
+        """
+        self.generate = generate
+        self.chunker = SentenceChunker(max_tokens=group_tokens, overlap_tokens=0,
+                                       count_tokens=count_tokens, special_tokens=0)
+        self.max_workers = max_workers
+        self.partial_words = partial_words
+        self.cache = cache
+        self.cache_namespace = cache_namespace
+
+    def _generate_cached(self, prompt: str) -> str:
+        if self.cache is None:
+            return self.generate(prompt)
+        key = SummaryCache.make_key(self.cache_namespace, prompt)
+        summary = self.cache.get(key)
+        if summary is None:
+            summary = self.generate(prompt)
+            self.cache.set(key, summary)
+        return summary
+
+    def _summarize_groups(self, groups: List[str], template: str, on_done: Callable[[], None]) -> List[str]:
+        """Summarize each group (in parallel), keeping the group order"""
+        def run(text):
+            summary = self._generate_cached(template.format(words=self.partial_words, text=text)).strip()
+            on_done()
+            return summary
+
+        if self.max_workers <= 1 or len(groups) <= 1:
+            return [run(text) for text in groups]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(groups)),
+                                thread_name_prefix="summarize") as pool:
+            # Token counts of the parallel calls belong to the caller's trace
+            return list(pool.map(in_context(run), groups))
+
+    def _group(self, texts: List[Tuple[int, str]]) -> List[str]:
+        return [chunk['text'] for chunk in self.chunker.chunk_pages(texts)]
+
+    def summarize(self, pages: List[Tuple[int, str]], max_length: int = 500,
+                  progress_callback: Callable[[float], None] = None) -> str:
+        """
+        Summarize a document
+        Args:
+            pages: (page or chunk number, text) pairs in reading order
+            max_length: Target length of the final summary (words)
+            progress_callback: Optional callable(fraction) called after each generated prompt
+        Returns:
+            Summary text
+        """
+        lock = threading.Lock()
+        state = {'done': 0, 'total': 1, 'start': 0.0, 'span': 0.8}
+
+        def on_done():
+            # Under the lock so reports from worker threads arrive in order
+            with lock:
+                state['done'] += 1
+                fraction = state['start'] + state['span'] * state['done'] / state['total']
+                if progress_callback:
+                    progress_callback(min(fraction, 0.99))
+
+        # Map: every part of the document
+        groups = self._group(pages)
+        if not groups:
+            return ""
+        state['total'] = len(groups)
+        summaries = self._summarize_groups(groups, MAP_PROMPT, on_done)
+
+        # Reduce until the partial summaries fit one prompt (each level gets half the remaining progress)
+        groups = self._group(list(enumerate(summaries)))
+        level = 0
+        while len(groups) > 1 and level < MAX_REDUCE_LEVELS:
+            start = state['start'] + state['span']
+            state.update(done=0, total=len(groups), start=start, span=(1 - start) / 2)
+            summaries = self._summarize_groups(groups, REDUCE_PROMPT, on_done)
+            groups = self._group(list(enumerate(summaries)))
+            level += 1
+
+        summary = self._generate_cached(FINAL_PROMPT.format(words=max_length, text=groups[0])).strip()
+        if progress_callback:
+            progress_callback(1.0)
+        return summary
+
+
+if __name__ == "__main__":
+    # Test the summarizer with a fake model that keeps the first words of its input
+    def fake_generate(prompt: str) -> str:
+        text = prompt.split(":\n", 1)[1].rsplit("\n\n", 1)[0]
+        return " ".join(text.split()[:40])
+
+    pages = [(page, f"Page {page} says something important. " * 60) for page in range(1, 21)]
+    summarizer = MapReduceSummarizer(fake_generate, group_tokens=400, max_workers=4)
+    summary = summarizer.summarize(pages, progress_callback=lambda f: print(f"progress {f:.2f}"))
+    print(f"Summary ({len(summary.split())} words): {summary[:80]}")
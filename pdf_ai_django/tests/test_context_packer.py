@@ -0,0 +1,79 @@
+import unittest
+
+from context_packer import ContextPacker, approximate_token_count
+
+
+def words(start, end, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(start, end))
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class ContextPackerTests(unittest.TestCase):
+
+    def make_packer(self, token_budget=1000, **kwargs):
+        return ContextPacker(token_budget=token_budget, count_tokens=count_words, min_block_tokens=4, **kwargs)
+
+    def test_adjacent_chunks_merge_without_their_overlap(self):
+        texts = [words(25, 55), words(0, 30)]
+        metadatas = [{'source': 'a.pdf', 'chunk_id': 1, 'page_start': 2, 'page_end': 3},
+                     {'source': 'a.pdf', 'chunk_id': 0, 'page_start': 1, 'page_end': 2}]
+
+        result = self.make_packer().pack(texts, metadatas)
+
+        self.assertEqual(result['chunks_merged'], 1)
+        [block] = result['blocks']
+        self.assertEqual(block['text'], words(0, 55))
+        self.assertEqual((block['pages'], block['tokens'], block['rank']), ((1, 3), 55, 0))
+
+    def test_near_duplicate_block_is_dropped(self):
+        passage = words(0, 40)
+        texts = [passage, passage + " extra", words(0, 10, prefix="other")]
+        metadatas = [{'source': 'a.pdf', 'chunk_id': 4},
+                     {'source': 'b.pdf', 'chunk_id': 9},
+                     {'source': 'c.pdf', 'chunk_id': 2}]
+
+        result = self.make_packer().pack(texts, metadatas)
+
+        self.assertEqual(result['duplicates_dropped'], 1)
+        self.assertEqual([block['source'] for block in result['blocks']], ['a.pdf', 'c.pdf'])
+
+    def test_tokens_used_stays_within_budget(self):
+        texts = [words(i * 100, i * 100 + 30) for i in range(10)]
+        metadatas = [{'source': f'{i}.pdf', 'chunk_id': 0} for i in range(10)]
+
+        for count_tokens in (count_words, approximate_token_count):
+            packer = ContextPacker(token_budget=100, count_tokens=count_tokens, min_block_tokens=4)
+            result = packer.pack(texts, metadatas)
+
+            self.assertLessEqual(result['tokens_used'], result['token_budget'])
+            self.assertTrue(result['truncated'])
+            self.assertEqual(result['tokens_used'], sum(block['tokens'] for block in result['blocks']))
+            for block in result['blocks']:
+                self.assertEqual(block['tokens'], count_tokens(block['text']))
+
+    def test_rank_points_back_to_the_retrieved_chunk(self):
+        texts = [
+            words(0, 20, prefix="b"),       # 0: b.pdf chunk 5
+            words(15, 35, prefix="a"),      # 1: a.pdf chunk 1, merges with rank 3
+            words(0, 20, prefix="b"),       # 2: duplicate of rank 0
+            words(0, 20, prefix="a"),       # 3: a.pdf chunk 0
+            words(0, 20, prefix="c"),       # 4: c.pdf chunk 0
+        ]
+        metadatas = [{'source': 'b.pdf', 'chunk_id': 5}, {'source': 'a.pdf', 'chunk_id': 1},
+                     {'source': 'b2.pdf', 'chunk_id': 8}, {'source': 'a.pdf', 'chunk_id': 0},
+                     {'source': 'c.pdf', 'chunk_id': 0}]
+
+        result = self.make_packer().pack(texts, metadatas)
+
+        self.assertEqual([(block['rank'], block['source']) for block in result['blocks']],
+                         [(0, 'b.pdf'), (1, 'a.pdf'), (4, 'c.pdf')])
+        for block in result['blocks']:
+            self.assertEqual(metadatas[block['rank']]['source'], block['source'])
+            self.assertIn(texts[block['rank']], block['text'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import itertools
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIMENSION = 4
+
+
+def vector_of(number):
+    """A vector that identifies the text it was stored for"""
+    return np.full(DIMENSION, number, dtype=np.float32)
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        # Distinct last_used times, so the least recently used entry is well defined
+        clock = itertools.count(1.0)
+        patcher = mock.patch('embedding_cache.time.time', side_effect=lambda: next(clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_cache(self, slots=5):
+        return EmbeddingCache(self.directory.name, "test-model", dimension=DIMENSION,
+                              max_bytes=DIMENSION * 4 * slots, dtype="float32")
+
+    def put(self, cache, numbers):
+        keys = [cache.make_key(f"text {n}") for n in numbers]
+        cache.put_many(keys, np.stack([vector_of(n) for n in numbers]))
+
+    def assert_cached(self, cache, numbers, expected):
+        """expected: number the returned vector must encode per text, or None for a miss"""
+        vectors, _ = cache.get_many([f"text {n}" for n in numbers])
+        for number, vector, want in zip(numbers, vectors, expected):
+            if want is None:
+                self.assertIsNone(vector, f"text {number} should have been evicted")
+            else:
+                self.assertIsNotNone(vector, f"text {number} should be cached")
+                np.testing.assert_array_equal(vector, vector_of(want))
+
+    def test_evicts_least_recently_used_past_capacity(self):
+        cache = self.open_cache(slots=5)
+        self.put(cache, range(5))
+        self.assert_cached(cache, [0, 1], [0, 1])  # recently used: survive eviction
+
+        self.put(cache, [5, 6, 7])
+
+        self.assertEqual(len(cache), 5)
+        self.assertEqual(cache.evictions, 3)
+        self.assert_cached(cache, range(8), [0, 1, None, None, None, 5, 6, 7])
+
+    def test_normalized_copies_share_an_entry(self):
+        cache = self.open_cache()
+        self.put(cache, [1])
+        vectors, _ = cache.get_many(["  text\n1 "])
+        np.testing.assert_array_equal(vectors[0], vector_of(1))
+
+    def test_recycled_slot_is_a_miss(self):
+        writer = self.open_cache(slots=2)
+        reader = self.open_cache(slots=2)
+        self.put(writer, [0, 1])
+        lookup = reader._lookup_slots
+
+        def lookup_then_recycle(keys):
+            # Another process recycles both slots after the reader found them
+            slots = lookup(keys)
+            self.put(writer, [2, 3])
+            return slots
+
+        with mock.patch.object(reader, '_lookup_slots', side_effect=lookup_then_recycle):
+            vectors, _ = reader.get_many(["text 0", "text 1"])
+
+        self.assertEqual(vectors, [None, None])
+        self.assert_cached(reader, [2, 3], [2, 3])
+
+    def test_concurrent_recycling_never_returns_a_wrong_vector(self):
+        writer = self.open_cache(slots=20)
+        self.put(writer, range(20))
+        stop = threading.Event()
+
+        def write():
+            rng = np.random.default_rng(0)
+            while not stop.is_set():
+                self.put(writer, rng.choice(100, 10, replace=False).tolist())
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        try:
+            reader = self.open_cache(slots=20)
+            for _ in range(200):
+                vectors, _ = reader.get_many([f"text {n}" for n in range(100)])
+                for number, vector in enumerate(vectors):
+                    if vector is not None:
+                        np.testing.assert_array_equal(vector, vector_of(number))
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_reopening_keeps_entries(self):
+        self.put(self.open_cache(), [1, 2])
+        self.assert_cached(self.open_cache(), [1, 2], [1, 2])
+
+    def test_changed_size_bound_starts_fresh(self):
+        self.put(self.open_cache(slots=5), [1, 2])
+
+        resized = self.open_cache(slots=8)
+
+        self.assertEqual(len(resized), 0)
+        self.assertEqual(resized.capacity, 8)
+        self.assert_cached(resized, [1, 2], [None, None])
+        self.put(resized, range(8))
+        self.assert_cached(resized, range(8), list(range(8)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+from benchmarks.fake_ollama import start_in_thread
+from ollama_client import AsyncOllamaClient, OllamaClient, OllamaError
+
+
+def free_port_url():
+    """URL of a local port nothing listens on (connections are refused)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+class FakeOllamaTestCase(unittest.TestCase):
+    """Starts a fake Ollama server per test (see benchmarks/fake_ollama.py)"""
+
+    def start_server(self, **kwargs):
+        server, url = start_in_thread(**kwargs)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, url
+
+    def make_client(self, url, **kwargs):
+        client = OllamaClient(url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+
+class RetryTests(FakeOllamaTestCase):
+
+    def test_busy_responses_are_retried_with_backoff(self):
+        server, url = self.start_server(num_tokens=3, fail_first=2)
+        client = self.make_client(url, max_retries=2, backoff=0.01)
+
+        with mock.patch('ollama_client.random.uniform', wraps=lambda low, high: 0.0) as jitter:
+            answer = client.generate("llama3.2", "prompt")
+
+        self.assertEqual(answer, " token0 token1 token2")
+        self.assertEqual(server.generations, 3)
+        # Full jitter over an exponentially growing window
+        self.assertEqual([call.args for call in jitter.call_args_list], [(0, 0.01), (0, 0.02)])
+
+    def test_gives_up_after_max_retries(self):
+        server, url = self.start_server(fail_first=10)
+        client = self.make_client(url, max_retries=2, backoff=0.0)
+
+        with self.assertRaisesRegex(OllamaError, "503"):
+            client.generate("llama3.2", "prompt")
+        self.assertEqual(server.generations, 3)
+
+    def test_other_errors_are_not_retried(self):
+        server, url = self.start_server(fail_first=10, fail_status=500)
+        client = self.make_client(url, max_retries=2, backoff=0.0)
+
+        with self.assertRaisesRegex(OllamaError, "500"):
+            client.generate("llama3.2", "prompt")
+        self.assertEqual(server.generations, 1)
+
+    def test_refused_connection_is_retried_then_reported(self):
+        client = self.make_client(free_port_url(), max_retries=2, backoff=0.0)
+
+        with mock.patch.object(client.session, 'request', wraps=client.session.request) as request:
+            with self.assertRaisesRegex(OllamaError, "Cannot connect"):
+                client.generate("llama3.2", "prompt")
+        self.assertEqual(request.call_count, 3)
+
+
+class TimeoutTests(FakeOllamaTestCase):
+
+    def test_timeouts_are_split(self):
+        client = self.make_client("http://localhost:11434", connect_timeout=1.5, read_timeout=30)
+        self.assertEqual(client.timeout, (1.5, 30))
+
+    def test_slow_first_token_only_needs_the_read_timeout(self):
+        server, url = self.start_server(first_token_delay=0.3, num_tokens=2)
+        client = self.make_client(url, connect_timeout=0.05, read_timeout=5)
+
+        self.assertEqual(client.generate("llama3.2", "prompt"), " token0 token1")
+
+    def test_read_timeout_fails_without_retrying(self):
+        server, url = self.start_server(first_token_delay=1.0)
+        client = self.make_client(url, max_retries=2, backoff=0.0, read_timeout=0.2)
+
+        start = time.perf_counter()
+        with self.assertRaisesRegex(OllamaError, "timed out"):
+            client.generate("llama3.2", "prompt")
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(server.generations, 1)
+
+
+class ConcurrencyTests(FakeOllamaTestCase):
+
+    def test_max_concurrent_caps_generations_in_flight(self):
+        server, url = self.start_server(first_token_delay=0.1, num_tokens=3)
+        client = self.make_client(url, max_concurrent=2)
+        answers = []
+
+        def ask():
+            answers.append("".join(client.generate_stream("llama3.2", "prompt")))
+
+        threads = [threading.Thread(target=ask) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(answers, [" token0 token1 token2"] * 6)
+        self.assertEqual(server.generations, 6)
+        self.assertEqual(server.max_in_flight, 2)
+
+    def test_waiting_longer_than_queue_timeout_fails(self):
+        server, url = self.start_server(first_token_delay=0.5)
+        client = self.make_client(url, max_concurrent=1, queue_timeout=0.05)
+        results = []
+
+        def ask():
+            try:
+                results.append(client.generate("llama3.2", "prompt"))
+            except OllamaError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=ask) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        errors = [result for result in results if isinstance(result, OllamaError)]
+        self.assertEqual(len(errors), 1)
+        self.assertIn("busy", str(errors[0]))
+        self.assertEqual(server.generations, 1)
+
+    def test_async_client_caps_generations_in_flight(self):
+        server, url = self.start_server(first_token_delay=0.1, num_tokens=2)
+
+        async def ask_all():
+            client = AsyncOllamaClient(url, max_concurrent=2)
+            try:
+                return await asyncio.gather(*[client.generate("llama3.2", "prompt") for _ in range(6)])
+            finally:
+                await client.close()
+
+        self.assertEqual(asyncio.run(ask_all()), [" token0 token1"] * 6)
+        self.assertEqual(server.max_in_flight, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
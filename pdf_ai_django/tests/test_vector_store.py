@@ -0,0 +1,101 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from vector_store import VectorStore
+
+DIMENSION = 8
+
+
+def make_chunks(rng, count, prefix="chunk"):
+    return [{'chunk_id': i, 'text': f"{prefix} {i}", 'embedding': rng.normal(size=DIMENSION)}
+            for i in range(count)]
+
+
+class ShardingTests(unittest.TestCase):
+    """Sharded numpy-backend stores in a temporary directory"""
+
+    def make_store(self, sharding, **kwargs):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return VectorStore(persist_directory=directory.name, backend="numpy", sharding=sharding, **kwargs)
+
+    def test_user_sharding_writes_to_the_uploader_shard(self):
+        store = self.make_store("user")
+        rng = np.random.default_rng(0)
+
+        store.add_documents(make_chunks(rng, 3), "alice.pdf", content_hash="a",
+                            shard_key=store.shard_key_for(owner=7))
+        store.add_documents(make_chunks(rng, 2), "anonymous.pdf", content_hash="b",
+                            shard_key=store.shard_key_for(owner=None))
+
+        self.assertEqual(store.shard_keys(), ["user7"])
+        self.assertEqual(store.get_shard("user7").get(include=[])['ids'], ["a_0", "a_1", "a_2"])
+        self.assertEqual(store.get_shard(VectorStore.MAIN_SHARD).get(include=[])['ids'], ["b_0", "b_1"])
+
+        query = make_chunks(rng, 1)[0]['embedding']
+        results = store.search(query, top_k=10, shard_key="user7")
+        self.assertEqual({meta['source'] for meta in results['metadatas'][0]}, {"alice.pdf"})
+
+    def test_hash_sharding_routes_by_content_hash(self):
+        store = self.make_store("hash", num_shards=4)
+        rng = np.random.default_rng(0)
+        hashes = [f"hash{i}" for i in range(8)]
+
+        for content_hash in hashes:
+            store.add_documents(make_chunks(rng, 2), f"{content_hash}.pdf", content_hash=content_hash)
+
+        expected = {}
+        for content_hash in hashes:
+            shard_key = VectorStore.make_shard_key("hash", 4, content_hash=content_hash)
+            expected.setdefault(shard_key, set()).update({f"{content_hash}_0", f"{content_hash}_1"})
+        self.assertEqual(sorted(store.shard_keys()), sorted(expected))
+        for shard_key, ids in expected.items():
+            self.assertEqual(set(store.get_shard(shard_key).get(include=[])['ids']), ids)
+        self.assertEqual(store.get_shard(VectorStore.MAIN_SHARD).count(), 0)
+
+        # A content hash filter only searches the shard the hash routes to
+        results = store.search(make_chunks(rng, 1)[0]['embedding'], top_k=10, filter_content_hash="hash3")
+        self.assertEqual(set(results['ids'][0]), {"hash3_0", "hash3_1"})
+
+    def test_cross_shard_top_k_matches_single_collection(self):
+        sharded = self.make_store("hash", num_shards=4)
+        single = self.make_store("none")
+        rng = np.random.default_rng(0)
+        for i in range(12):
+            chunks = make_chunks(rng, 10, prefix=f"document {i}")
+            sharded.add_documents(chunks, f"doc{i}.pdf", content_hash=f"doc{i}")
+            single.add_documents(chunks, f"doc{i}.pdf", content_hash=f"doc{i}")
+        self.assertGreater(len(sharded.shard_keys()), 1)
+
+        queries = rng.normal(size=(5, DIMENSION))
+        batch = sharded.search_batch(queries, top_k=10)
+        for query, batched in zip(queries, batch):
+            expected = single.search(query, top_k=10)
+            merged = sharded.search(query, top_k=10)
+            for result in (merged, batched):
+                self.assertEqual(result['ids'], expected['ids'])
+                self.assertEqual(result['documents'], expected['documents'])
+                np.testing.assert_allclose(result['distances'][0], expected['distances'][0], rtol=1e-5)
+
+    def test_same_pdf_in_two_shards_is_searched_and_deleted_per_shard(self):
+        store = self.make_store("user")
+        chunks = [{'chunk_id': 0, 'text': "Replace part AB-1234 every 6 months", 'embedding': np.eye(DIMENSION)[0]},
+                  {'chunk_id': 1, 'text': "Pump manual XY-99", 'embedding': np.eye(DIMENSION)[1]}]
+        for owner in (1, 2):
+            store.add_documents([dict(chunk) for chunk in chunks], "manual.pdf", content_hash="m",
+                                shard_key=store.shard_key_for(owner=owner))
+
+        hits = store.lexical_search("AB-1234", shard_key="user1")
+        self.assertEqual([(chunk_id, shard) for chunk_id, _, shard in hits], [("m_0", "user1")])
+
+        store.delete_by_content_hash("m", shard_key="user2")
+
+        self.assertEqual(store.get_shard("user2").count(), 0)
+        self.assertEqual(store.get_shard("user1").count(), 2)
+        self.assertEqual([shard for _, _, shard in store.lexical_search("AB-1234")], ["user1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import re
+import struct
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# File layout (little-endian):
+#   header     MAGIC, format version, page count, metadata length
+#   metadata   JSON (extraction method, creation time)
+#   page index one PAGE_INDEX record per page (offset and stats), readable straight from the mmap
+#   pages      zlib-compressed UTF-8 text of each page, back to back
+MAGIC = b"PDFPAGES"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIII")
+PAGE_INDEX = np.dtype([
+    ('page', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('chars', '<u4'),
+    ('words', '<u4'),
+    ('lines', '<u4'),
+    ('paragraphs', '<u4'),
+])
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def page_layout_stats(text: str) -> Tuple[int, int, int, int]:
+    """(characters, words, lines, paragraphs) of a raw page text"""
+    if not text:
+        return 0, 0, 0, 0
+    paragraphs = sum(1 for paragraph in PARAGRAPH_BREAK.split(text) if paragraph.strip())
+    return len(text), len(text.split()), text.count("\n") + 1, paragraphs
+
+
+class PageTextArtifact:
+    """
+    Read-only view of one document's stored page texts (memory-mapped)
+
+    Only the page index is parsed on open; a page is decompressed when it is read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_pages, meta_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"Not a page text artifact (or unsupported version): {path}")
+
+        self.meta = json.loads(self._mmap[HEADER.size:HEADER.size + meta_length])
+        self.index = np.frombuffer(self._mmap, dtype=PAGE_INDEX, count=num_pages,
+                                   offset=HEADER.size + meta_length)
+
+    @property
+    def num_pages(self) -> int:
+        return len(self.index)
+
+    def page_text(self, position: int) -> str:
+        """Text of the page at a 0-based position"""
+        entry = self.index[position]
+        start = int(entry['offset'])
+        return zlib.decompress(self._mmap[start:start + int(entry['length'])]).decode('utf-8')
+
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        """(page_number, text) for every page in order, like PDFLoader.iter_pages"""
+        for position in range(self.num_pages):
+            yield int(self.index[position]['page']), self.page_text(position)
+
+    def stats(self) -> Dict:
+        """Layout totals over the document (from the index, no decompression)"""
+        return {
+            'pages': self.num_pages,
+            'empty_pages': int(np.count_nonzero(self.index['chars'] == 0)),
+            'chars': int(self.index['chars'].sum()),
+            'words': int(self.index['words'].sum()),
+            'lines': int(self.index['lines'].sum()),
+            'paragraphs': int(self.index['paragraphs'].sum()),
+            'compressed_bytes': int(self.index['length'].sum()),
+        }
+
+    def close(self) -> None:
+        # The index is a view on the map: drop it before closing
+        self.index = None
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PageTextStore:
+    """
+    Extracted page texts of each PDF, written once at extraction
+
+    One compressed, memory-mappable file per document (keyed by content hash),
+    so re-chunking, summaries and re-indexing never have to parse the PDF again.
+    """
+
+    def __init__(self, directory: str, compression_level: int = 6):
+        """
+        Args:
+            directory: Where artifact files are kept
+            compression_level: zlib level (1 = fastest, 9 = smallest)
+        """
+        self.directory = directory
+        self.compression_level = compression_level
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        safe_key = re.sub(r'[^\w\-.]', '_', key)
+        return os.path.join(self.directory, f"{safe_key}.pages")
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def write(self, key: str, pages: List[Tuple[int, str]], method: str = None) -> str:
+        """
+        Store the page texts of a document (atomically replaces an older artifact)
+        Args:
+            key: Document key (content hash)
+            pages: (page_number, raw text) for every page, including empty ones
+            method: Extraction method the texts came from
+        Returns:
+            Path of the artifact
+        """
+        meta = json.dumps({'method': method, 'created_at': time.time()}).encode('utf-8')
+        index = np.zeros(len(pages), dtype=PAGE_INDEX)
+        blobs = []
+        offset = HEADER.size + len(meta) + index.nbytes
+        for position, (page_number, text) in enumerate(pages):
+            blob = zlib.compress((text or "").encode('utf-8'), self.compression_level)
+            chars, words, lines, paragraphs = page_layout_stats(text or "")
+            index[position] = (page_number, offset, len(blob), chars, words, lines, paragraphs)
+            blobs.append(blob)
+            offset += len(blob)
+
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(pages), len(meta)))
+            f.write(meta)
+            f.write(index.tobytes())
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+        return path
+
+    def open(self, key: str, method: str = None) -> Optional[PageTextArtifact]:
+        """
+        Open a document's artifact
+        Args:
+            key: Document key (content hash)
+            method: Only accept texts extracted with this method (None = any)
+        Returns:
+            PageTextArtifact, or None if there is no usable artifact
+        """
+        try:
+            artifact = PageTextArtifact(self.path(key))
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+        if method and artifact.meta.get('method') != method:
+            artifact.close()
+            return None
+        return artifact
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    # Test the store in a temporary directory
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PageTextStore(tmp)
+        store.write("hash-a", [(1, "Title\n\nFirst paragraph.\nSecond line."), (2, ""), (3, "Last page.")],
+                    method="pdfplumber")
+        with store.open("hash-a", method="pdfplumber") as artifact:
+            print(f"Pages: {list(artifact.iter_pages())}")
+            print(f"Stats: {artifact.stats()}")
+        print(f"Other method: {store.open('hash-a', method='pypdf2')}")
@@ -0,0 +1,290 @@
+"""
+Request-scoped latency tracing for the RAG pipeline
+
+A trace covers one question or one ingestion. The pipeline components add to the
+trace of the code that calls them (it travels in a context variable), so they need
+no extra arguments, and outside a trace every call below is a cheap no-op:
+
+    with trace('question', metrics) as question_trace:
+        engine.answer_question(...)        # embed, retrieve, prompt, generate spans
+    question_trace.to_dict()               # per-stage ms, token counts, cache hits
+
+Finished traces are aggregated into a MetricsStore, which web and ingest worker
+processes share, and which renders them in the Prometheus text format.
+"""
+
+import contextvars
+import functools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+# Histogram buckets (seconds): embedding lookups are milliseconds, generations can take minutes
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+# Stages being timed in this context, so nested calls (hybrid_search -> search) count once
+_active_stages = contextvars.ContextVar("active_stages", default=frozenset())
+
+
+class Trace:
+    """Per-stage durations and counters of one request (stages run in threads are summed)"""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.stages = {}    # stage -> seconds
+        self.counters = {}  # name -> count (cache hits, tokens, pages, ...)
+        self.total = None   # wall time, set when the trace ends
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def elapsed(self) -> float:
+        return self.total if self.total is not None else time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable summary (what gets stored with a Question or PDFDocument)"""
+        with self._lock:
+            return {
+                'pipeline': self.pipeline,
+                'total_ms': round(self.elapsed() * 1000, 1),
+                'stages_ms': {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace(pipeline: str, metrics: 'MetricsStore' = None) -> Iterator[Trace]:
+    """
+    Trace the enclosed block as one request
+    Args:
+        pipeline: Kind of request ('question', 'ingest', ...)
+        metrics: Optional MetricsStore the finished trace is recorded in
+    """
+    request_trace = Trace(pipeline)
+    token = _current_trace.set(request_trace)
+    try:
+        yield request_trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A streaming response generator may be closed from another context
+            pass
+        request_trace.total = time.perf_counter() - request_trace._start
+        if metrics is not None:
+            try:
+                metrics.record(request_trace)
+            except sqlite3.Error as e:
+                print(f"Could not record metrics: {e}")
+
+
+@contextmanager
+def span(stage: str):
+    """Add the time spent in the enclosed block to the current trace's stage"""
+    request_trace = _current_trace.get()
+    active = _active_stages.get()
+    if request_trace is None or stage in active:
+        yield
+        return
+
+    token = _active_stages.set(active | {stage})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_trace.add_time(stage, time.perf_counter() - start)
+        _active_stages.reset(token)
+
+
+def traced(stage: str) -> Callable:
+    """Decorator: time every call of the function as stage"""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_time(stage: str, seconds: float) -> None:
+    """Add a duration measured by the caller to the current trace"""
+    request_trace = _current_trace.get()
+    if request_trace is not None:
+        request_trace.add_time(stage, seconds)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add to a counter of the current trace"""
+    request_trace = _current_trace.get()
+    if request_trace is not None and value:
+        request_trace.count(name, value)
+
+
+def traced_iter(items: Iterable, stage: str, counter: str = None) -> Iterator:
+    """
+    Yield from items, timing only the work of producing each item (not the consumer's)
+    Args:
+        counter: Optional counter increased per item
+    """
+    iterator = iter(items)
+    while True:
+        with span(stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        if counter:
+            count(counter)
+        yield item
+
+
+def in_context(function: Callable) -> Callable:
+    """Bind function to the current context, so work handed to a thread pool joins the current trace"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A Context can only be entered by one thread at a time: run each call in its own copy
+        return context.copy().run(function, *args, **kwargs)
+    return run
+
+
+class MetricsStore:
+    """
+    Stage duration histograms and counters of finished traces, stored in SQLite
+
+    Web and ingest worker processes record into the same file, so one metrics
+    endpoint reports the whole deployment. Safe to share between processes and threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file of the metrics
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS stage_buckets (
+                pipeline TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                sum REAL NOT NULL,
+                PRIMARY KEY (pipeline, stage, bucket)
+            );
+            CREATE TABLE IF NOT EXISTS counters (
+                pipeline TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (pipeline, name)
+            );
+        """)
+
+    @staticmethod
+    def _bucket(seconds: float) -> int:
+        """Index of the first bucket holding seconds (len(BUCKETS) = +Inf)"""
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                return i
+        return len(BUCKETS)
+
+    def record(self, request_trace: Trace) -> None:
+        """Add a finished trace: its wall time (stage 'total'), stage durations and counters"""
+        stages = dict(request_trace.stages, total=request_trace.elapsed())
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("""
+                    INSERT INTO stage_buckets VALUES (?, ?, ?, 1, ?)
+                    ON CONFLICT (pipeline, stage, bucket)
+                    DO UPDATE SET count = count + 1, sum = sum + excluded.sum
+                """, [(request_trace.pipeline, stage, self._bucket(seconds), seconds)
+                      for stage, seconds in stages.items()])
+                self._db.executemany("""
+                    INSERT INTO counters VALUES (?, ?, ?)
+                    ON CONFLICT (pipeline, name) DO UPDATE SET value = value + excluded.value
+                """, [(request_trace.pipeline, name, value) for name, value in request_trace.counters.items()])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            buckets = self._db.execute(
+                "SELECT pipeline, stage, bucket, count, sum FROM stage_buckets ORDER BY pipeline, stage, bucket"
+            ).fetchall()
+            counters = self._db.execute(
+                "SELECT pipeline, name, value FROM counters ORDER BY pipeline, name"
+            ).fetchall()
+
+        histograms = {}
+        for pipeline, stage, bucket, bucket_count, bucket_sum in buckets:
+            histogram = histograms.setdefault((pipeline, stage), {'counts': [0] * (len(BUCKETS) + 1), 'sum': 0.0})
+            histogram['counts'][bucket] = bucket_count
+            histogram['sum'] += bucket_sum
+
+        lines = [
+            "# HELP rag_stage_duration_seconds Time spent per request in each pipeline stage "
+            "(stage=\"total\" is the wall time of the request)",
+            "# TYPE rag_stage_duration_seconds histogram",
+        ]
+        for (pipeline, stage), histogram in histograms.items():
+            labels = f'pipeline="{pipeline}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + ("+Inf",), histogram['counts']):
+                cumulative += bucket_count
+                lines.append(f'rag_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"rag_stage_duration_seconds_sum{{{labels}}} {histogram['sum']:.6f}")
+            lines.append(f"rag_stage_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            "# HELP rag_events_total Counts recorded by traces (cache hits and misses, tokens, pages, chunks)",
+            "# TYPE rag_events_total counter",
+        ]
+        for pipeline, name, value in counters:
+            lines.append(f'rag_events_total{{pipeline="{pipeline}",event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM stage_buckets")
+            self._db.execute("DELETE FROM counters")
+
+
+if __name__ == "__main__":
+    # Test tracing: nested spans count once, threads join the trace through in_context
+    from concurrent.futures import ThreadPoolExecutor
+    import tempfile
+
+    metrics = MetricsStore(os.path.join(tempfile.mkdtemp(), "metrics.sqlite3"))
+    with trace('question', metrics) as question_trace:
+        with span('retrieve'):
+            with span('retrieve'):
+                time.sleep(0.01)
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(in_context(lambda _: (add_time('generate', 0.2), count('generated_tokens', 10))), range(2)))
+        for _ in traced_iter(range(3), 'extract', counter='pages'):
+            time.sleep(0.01)
+    print(question_trace.to_dict())
+    print(metrics.render_prometheus())
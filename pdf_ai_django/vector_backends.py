@@ -0,0 +1,630 @@
+"""
+Vector index backends for VectorStore
+
+A backend behaves like (a subset of) a ChromaDB collection: add, upsert, query,
+get, delete and count with Chroma's argument and result formats. The Chroma
+collection itself is the default backend; NumpyCollection is an in-process
+alternative for small and medium corpora.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class VectorBackend:
+    """Interface every VectorStore backend implements (Chroma collection compatible)"""
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results: int = 10, where: Dict = None,
+              include: List[str] = None) -> Dict:
+        raise NotImplementedError
+
+    def get(self, ids: List[str] = None, where: Dict = None, limit: int = None,
+            offset: int = None, include: List[str] = None) -> Dict:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str] = None, where: Dict = None) -> None:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class NumpyCollection(VectorBackend):
+    """
+    Memory-mapped matrix of pre-normalized vectors, searched with one matmul + argpartition
+
+    - Rows are append-only; deletes only clear the row's 'alive' flag (tombstone)
+    - Metadata fields in FILTER_FIELDS are kept as integer code columns for fast filtering
+    - Documents and full metadata live in a SQLite side table
+    - Vectors are stored as float32, or quantized to shrink what a search has to scan:
+        'float16'  half precision (2x smaller)
+        'int8'     scalar quantization with one scale per vector (~4x smaller)
+        'pq'       product quantization codes (one byte per PQ_SUBVECTOR_DIM dimensions, 32x
+                   smaller for 8); the float32 vectors stay on disk and only the best
+                   candidates are rescored with them, so the final top-k is exact-scored
+      Quantized blocks are converted to float32 while scanning: it trades CPU for memory and
+      pays off once the float32 matrix no longer fits in RAM.
+    Several processes can share one directory (writes are serialized by SQLite).
+    """
+
+    FILTER_FIELDS = ('source', 'content_hash')
+    QUANTIZATIONS = ('float32', 'float16', 'int8', 'pq')
+    MIN_CAPACITY = 1024
+    MISSING_CODE = -1   # row has no value for the field
+    UNKNOWN_CODE = -2   # filter value never stored (matches no row)
+    SCAN_BLOCK = 65536  # rows converted to float32 at a time when scanning quantized vectors
+
+    # Product quantization: 256 centroids per subspace (one uint8 code), trained with k-means
+    # once enough rows exist (exact float32 search until then)
+    PQ_SUBVECTOR_DIM = 8
+    PQ_CENTROIDS = 256
+    PQ_MIN_TRAIN_ROWS = 1024
+    PQ_TRAIN_SAMPLE = 20000
+    PQ_KMEANS_ITERATIONS = 15
+    PQ_RESCORE_FACTOR = 40  # candidates rescored with float32 per requested result
+
+    def __init__(self, directory: str, dimension: int = None, quantization: str = None):
+        """
+        Args:
+            directory: Where the index files live (created if missing)
+            dimension: Embedding dimension (taken from the first add when not given)
+            quantization: Vector storage for a new index: 'float32' (default), 'float16', 'int8'
+                          or 'pq'. An existing index keeps the storage it was created with.
+        """
+        if quantization is not None and quantization not in self.QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (choose from {', '.join(self.QUANTIZATIONS)})")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"),
+                                   timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS codes (
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                code INTEGER NOT NULL,
+                PRIMARY KEY (field, value)
+            );
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('n_rows', 0)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('capacity', 0)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('generation', 0)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('pq_trained', 0)")
+        if dimension:
+            self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dimension', ?)", (dimension,))
+
+        # Storage is fixed per index; indexes created before quantization existed are float32
+        stored = self._meta('quantization')
+        if stored is None:
+            requested = quantization or 'float32'
+            stored = self.QUANTIZATIONS.index(requested if not self._meta('n_rows') else 'float32')
+            self._db.execute("INSERT OR IGNORE INTO meta VALUES ('quantization', ?)", (stored,))
+            stored = self._meta('quantization')
+        self.quantization = self.QUANTIZATIONS[stored]
+        if quantization and quantization != self.quantization:
+            print(f"Note: {directory} keeps its {self.quantization} vectors (re-index to change)")
+
+        self.pq_codebooks = None
+        self._pq_trained = -1
+        self._capacity = -1
+        self._generation = -1
+        self._n_rows = 0
+        self._codes: Dict[str, Dict[str, int]] = {}
+        self._sync()
+
+    # ---- file handling ----
+
+    def _meta(self, name: str) -> Optional[int]:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _pq_subvectors(self) -> int:
+        """Number of PQ subspaces (the dimension is split into equal sub-vectors)"""
+        for sub_dim in (self.PQ_SUBVECTOR_DIM, 6, 4, 3, 2, 1):
+            if self.dimension % sub_dim == 0:
+                return self.dimension // sub_dim
+
+    def _column_specs(self) -> Dict[str, tuple]:
+        """File name -> (dtype, row shape) of every column file"""
+        specs = {"alive.u8": (np.bool_, ())}
+        specs.update({f"{field}.i32": (np.int32, ()) for field in self.FILTER_FIELDS})
+        if self.quantization == 'float16':
+            specs["vectors.f16"] = (np.float16, (self.dimension,))
+        elif self.quantization == 'int8':
+            specs["vectors.i8"] = (np.int8, (self.dimension,))
+            specs["scales.f32"] = (np.float32, ())
+        else:
+            specs["vectors.f32"] = (np.float32, (self.dimension,))
+            if self.quantization == 'pq':
+                specs["pq_codes.u8"] = (np.uint8, (self._pq_subvectors(),))
+        return specs
+
+    def _open_arrays(self, capacity: int) -> None:
+        """(Re)map the column files for the given capacity"""
+        self.dimension = self._meta('dimension')
+        if not capacity or not self.dimension:
+            specs = self._column_specs() if self.dimension else {"alive.u8": (np.bool_, ())}
+            self.columns = {name: np.zeros((0,) + shape, dtype=dtype) for name, (dtype, shape) in specs.items()}
+            self.vectors = np.zeros((0, self.dimension or 0), dtype=np.float32)
+            self.alive = np.zeros(0, dtype=np.bool_)
+            self.code_columns = {field: np.zeros(0, dtype=np.int32) for field in self.FILTER_FIELDS}
+            return
+
+        self.columns = {
+            name: np.memmap(os.path.join(self.directory, name), dtype=dtype, mode="r+",
+                            shape=(capacity,) + shape)
+            for name, (dtype, shape) in self._column_specs().items()
+        }
+        # float32 vectors exist for 'float32' and 'pq' (rescoring); the others are dequantized on read
+        self.vectors = self.columns.get("vectors.f32")
+        self.alive = self.columns["alive.u8"]
+        self.code_columns = {field: self.columns[f"{field}.i32"] for field in self.FILTER_FIELDS}
+
+    def _sync(self) -> None:
+        """Pick up rows appended (or a reset) by this or another process"""
+        generation = self._meta('generation')
+        if generation != self._generation:
+            # Index was reset: files were recreated and codes renumbered
+            self._generation = generation
+            self._codes = {field: {} for field in self.FILTER_FIELDS}
+            self._capacity = -1
+
+        capacity = self._meta('capacity')
+        if capacity != self._capacity:
+            self._open_arrays(capacity)
+            self._capacity = capacity
+        self._n_rows = self._meta('n_rows')
+
+        if self.quantization == 'pq':
+            trained = self._meta('pq_trained')
+            if trained != self._pq_trained:
+                self.pq_codebooks = np.load(self._codebook_path()) if trained else None
+                self._pq_trained = trained
+
+    def _grow(self, needed_rows: int) -> None:
+        """Extend the column files so needed_rows fit (called inside a write transaction)"""
+        capacity = self._meta('capacity')
+        if needed_rows <= capacity:
+            return
+
+        new_capacity = max(self.MIN_CAPACITY, capacity * 2, needed_rows)
+        for name, (dtype, shape) in self._column_specs().items():
+            row_bytes = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            path = os.path.join(self.directory, name)
+            with open(path, "ab") as f:
+                f.truncate(new_capacity * row_bytes)
+
+        self._db.execute("UPDATE meta SET value = ? WHERE name = 'capacity'", (new_capacity,))
+        self._open_arrays(new_capacity)
+        self._capacity = new_capacity
+
+    def _code(self, field: str, value, create: bool = False) -> int:
+        """Integer code of a metadata value (UNKNOWN_CODE if never stored and not created)"""
+        if value is None:
+            return self.MISSING_CODE
+        value = str(value)
+        code = self._codes[field].get(value)
+        if code is None:
+            row = self._db.execute("SELECT code FROM codes WHERE field = ? AND value = ?",
+                                   (field, value)).fetchone()
+            if row is None and create:
+                next_code = self._db.execute("SELECT COUNT(*) FROM codes WHERE field = ?",
+                                             (field,)).fetchone()[0]
+                self._db.execute("INSERT INTO codes VALUES (?, ?, ?)", (field, value, next_code))
+                row = (next_code,)
+            if row is None:
+                return self.UNKNOWN_CODE
+            code = row[0]
+            self._codes[field][value] = code
+        return code
+
+    # ---- filtering ----
+
+    def _where_mask(self, where: Optional[Dict]) -> np.ndarray:
+        """Boolean mask over the first n_rows rows: alive and matching the filter"""
+        mask = np.array(self.alive[:self._n_rows], dtype=np.bool_)
+        if not where:
+            return mask
+
+        conditions = where['$and'] if '$and' in where else [{k: v} for k, v in where.items()]
+        for condition in conditions:
+            (field, expected), = condition.items()
+            if isinstance(expected, dict):
+                (op, expected), = expected.items()
+            else:
+                op = '$eq'
+
+            values = expected if op == '$in' else [expected]
+            if op not in ('$eq', '$in'):
+                raise ValueError(f"Unsupported filter operator: {op}")
+
+            if field in self.FILTER_FIELDS:
+                codes = [self._code(field, value) for value in values]
+                mask &= np.isin(self.code_columns[field][:self._n_rows], codes)
+            else:
+                # Not a code column: fall back to scanning metadata in SQLite
+                rows = [r for (r,) in self._db.execute(
+                    f"SELECT row FROM rows WHERE json_extract(metadata, ?) IN ({','.join('?' * len(values))})",
+                    [f"$.{field}", *values]
+                )]
+                field_mask = np.zeros(self._n_rows, dtype=np.bool_)
+                # Another process may have appended rows this one hasn't synced yet
+                field_mask[[r for r in rows if r < self._n_rows]] = True
+                mask &= field_mask
+        return mask
+
+    # ---- quantization ----
+
+    def _codebook_path(self) -> str:
+        return os.path.join(self.directory, "pq_codebooks.npy")
+
+    def _write_vectors(self, start: int, end: int, vectors: np.ndarray) -> None:
+        """Store normalized float32 vectors in rows start:end, in this index's format"""
+        if self.quantization == 'float16':
+            self.columns["vectors.f16"][start:end] = vectors.astype(np.float16)
+        elif self.quantization == 'int8':
+            # Symmetric per-vector scale: the largest component maps to +-127
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.columns["scales.f32"][start:end] = scales
+            self.columns["vectors.i8"][start:end] = np.clip(np.rint(vectors / scales[:, None]), -127, 127)
+        else:
+            self.vectors[start:end] = vectors
+            if self.quantization == 'pq' and self.pq_codebooks is not None:
+                self.columns["pq_codes.u8"][start:end] = self._pq_encode(vectors)
+
+    def _dequantize(self, rows) -> np.ndarray:
+        """float32 vectors of the given rows"""
+        if self.quantization == 'float16':
+            return self.columns["vectors.f16"][rows].astype(np.float32)
+        if self.quantization == 'int8':
+            return self.columns["vectors.i8"][rows].astype(np.float32) * self.columns["scales.f32"][rows][:, None]
+        return np.array(self.vectors[rows])
+
+    def _pq_encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest centroid of every sub-vector (uint8 codes, one per subspace)"""
+        m, _, sub_dim = self.pq_codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        centroid_norms = (self.pq_codebooks ** 2).sum(axis=2)
+        for start in range(0, len(vectors), self.SCAN_BLOCK):
+            block = np.asarray(vectors[start:start + self.SCAN_BLOCK], dtype=np.float32)
+            for j in range(m):
+                sub = block[:, j * sub_dim:(j + 1) * sub_dim]
+                distances = centroid_norms[j][None, :] - 2 * sub @ self.pq_codebooks[j].T
+                codes[start:start + len(block), j] = np.argmin(distances, axis=1)
+        return codes
+
+    @staticmethod
+    def _kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+        """Lloyd's k-means; returns (k, dim) centroids"""
+        centroids = data[rng.choice(len(data), k, replace=False)].copy()
+        for _ in range(iterations):
+            distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * data @ centroids.T
+            assignment = np.argmin(distances, axis=1)
+            counts = np.bincount(assignment, minlength=k)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            # Empty clusters keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled][:, None]
+        return centroids
+
+    def train_pq(self, seed: int = 0) -> bool:
+        """
+        Train the product quantizer on (a sample of) the stored vectors and encode every row
+        Called automatically once PQ_MIN_TRAIN_ROWS rows exist; call again to retrain
+        after the corpus changed a lot.
+        Returns:
+            False if the index is not 'pq' or has too few rows to train on
+        """
+        if self.quantization != 'pq':
+            return False
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                rows = np.flatnonzero(self.alive[:self._n_rows])
+                if len(rows) < self.PQ_MIN_TRAIN_ROWS:
+                    self._db.execute("ROLLBACK")
+                    return False
+
+                rng = np.random.default_rng(seed)
+                sample = np.sort(rng.choice(rows, min(len(rows), self.PQ_TRAIN_SAMPLE), replace=False))
+                data = np.asarray(self.vectors[sample])
+                m = self._pq_subvectors()
+                sub_dim = self.dimension // m
+                codebooks = np.stack([
+                    self._kmeans(data[:, j * sub_dim:(j + 1) * sub_dim], self.PQ_CENTROIDS,
+                                 self.PQ_KMEANS_ITERATIONS, rng)
+                    for j in range(m)
+                ]).astype(np.float32)
+
+                tmp_path = f"{self._codebook_path()}.{os.getpid()}.tmp.npy"
+                np.save(tmp_path, codebooks)
+                os.replace(tmp_path, self._codebook_path())
+                self.pq_codebooks = codebooks
+                self.columns["pq_codes.u8"][:self._n_rows] = self._pq_encode(self.vectors[:self._n_rows])
+                self.columns["pq_codes.u8"].flush()
+
+                self._db.execute("UPDATE meta SET value = value + 1 WHERE name = 'pq_trained'")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._sync()
+        print(f"Trained product quantizer: {m} x {self.PQ_CENTROIDS} centroids on {len(sample)} vectors")
+        return True
+
+    def _scan_scores(self, candidates: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Approximate (or, for float32, exact) scores of the candidate rows: (queries, candidates)"""
+        full = len(candidates) == self._n_rows
+        if self.quantization == 'float32' or (self.quantization == 'pq' and self.pq_codebooks is None):
+            # Filtered searches only touch matching rows; unfiltered ones use the whole matrix
+            # (matrix @ queries.T keeps BLAS on the row-major matrix: one pass over memory)
+            matrix = self.vectors[:self._n_rows] if full else self.vectors[candidates]
+            return (matrix @ queries.T).T
+
+        scores = np.empty((len(queries), len(candidates)), dtype=np.float32)
+        if self.quantization == 'pq':
+            # Asymmetric distance: per query, a (subspace x centroid) table of partial dot products
+            m, _, sub_dim = self.pq_codebooks.shape
+            tables = np.einsum('mkd,qmd->qmk', self.pq_codebooks, queries.reshape(len(queries), m, sub_dim))
+            subspaces = np.arange(m)[None, :]
+
+        for start in range(0, len(candidates), self.SCAN_BLOCK):
+            end = min(start + self.SCAN_BLOCK, len(candidates))
+            rows = slice(start, end) if full else candidates[start:end]
+            if self.quantization == 'pq':
+                codes = self.columns["pq_codes.u8"][rows]
+                for i, table in enumerate(tables):
+                    scores[i, start:end] = table[subspaces, codes].sum(axis=1)
+            else:
+                scores[:, start:end] = (self._dequantize(rows) @ queries.T).T
+        return scores
+
+    def scan_bytes(self) -> int:
+        """Bytes a full search reads: what has to stay in memory (page cache) for fast queries"""
+        n, dimension = self._n_rows, self.dimension or 0
+        if self.quantization == 'float16':
+            return n * dimension * 2
+        if self.quantization == 'int8':
+            return n * (dimension + 4)
+        if self.quantization == 'pq' and self.pq_codebooks is not None:
+            return n * self.pq_codebooks.shape[0] + self.pq_codebooks.nbytes
+        return n * dimension * 4
+
+    # ---- Chroma-compatible API ----
+
+    def add(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        """Append rows; an existing id is replaced (old row tombstoned)"""
+        self.upsert(ids, embeddings, documents, metadatas)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None) -> None:
+        """Insert or replace rows by id"""
+        if not len(ids):
+            return
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._meta('dimension'):
+                    self._db.execute("INSERT INTO meta VALUES ('dimension', ?)", (vectors.shape[1],))
+                    self._open_arrays(0)
+                self._sync()
+                self.dimension = self._meta('dimension')
+
+                deleted = self._tombstone_ids(ids)
+
+                start = self._n_rows
+                end = start + len(ids)
+                self._grow(end)
+
+                self._write_vectors(start, end, vectors)
+                self.alive[start:end] = True
+                for field in self.FILTER_FIELDS:
+                    self.code_columns[field][start:end] = [
+                        self._code(field, meta.get(field), create=True) for meta in metadatas
+                    ]
+                for column in self.columns.values():
+                    column.flush()
+
+                self._db.executemany(
+                    "INSERT INTO rows VALUES (?, ?, ?, ?)",
+                    [(start + i, ids[i], documents[i], json.dumps(metadatas[i]))
+                     for i in range(len(ids))]
+                )
+                self._db.execute("UPDATE meta SET value = ? WHERE name = 'n_rows'", (end,))
+                self._db.execute("COMMIT")
+                self._n_rows = end
+            except Exception:
+                self._db.execute("ROLLBACK")
+                self._sync()
+                raise
+            self._clear_alive(deleted)
+
+        if self.quantization == 'pq' and self.pq_codebooks is None and self._n_rows >= self.PQ_MIN_TRAIN_ROWS:
+            self.train_pq()
+
+    def _rows_of_ids(self, ids) -> List[int]:
+        """Row numbers of the stored ids (looked up in the side table's id index)"""
+        rows = []
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            rows += [r for (r,) in self._db.execute(
+                f"SELECT row FROM rows WHERE id IN ({','.join('?' * len(batch))})", batch
+            )]
+        return rows
+
+    def _tombstone_ids(self, ids) -> List[int]:
+        """Drop the side-table rows of these ids; returns their row numbers (see _tombstone_rows)"""
+        return self._tombstone_rows(self._rows_of_ids(ids))
+
+    def _tombstone_rows(self, rows) -> List[int]:
+        """
+        Drop side-table rows inside the caller's write transaction
+        The memory-mapped alive flags can't roll back, so the caller clears them with
+        _clear_alive only after COMMIT; until then readers skip rows without a record.
+        """
+        for start in range(0, len(rows), 500):
+            batch = [int(r) for r in rows[start:start + 500]]
+            self._db.execute(f"DELETE FROM rows WHERE row IN ({','.join('?' * len(batch))})", batch)
+        return list(rows)
+
+    def _clear_alive(self, rows: List[int]) -> None:
+        """Tombstone committed deletes in the alive column"""
+        if rows:
+            self.alive[rows] = False
+            self.alive.flush()
+
+    def query(self, query_embeddings, n_results: int = 10, where: Dict = None,
+              include: List[str] = None) -> Dict:
+        """Top-n cosine search for each query vector (Chroma result format)"""
+        include = include or ['documents', 'metadatas', 'distances']
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            self._sync()
+            mask = self._where_mask(where)
+            candidates = np.flatnonzero(mask)
+
+            result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': [], 'embeddings': None}
+            if len(candidates) == 0:
+                for _ in queries:
+                    for key in ('ids', 'documents', 'metadatas', 'distances'):
+                        result[key].append([])
+                return result
+
+            scores = self._scan_scores(candidates, queries)
+
+            k = min(n_results, len(candidates))
+            # PQ scores are approximate: rescore the best candidates with the float32 vectors
+            rescore = self.quantization == 'pq' and self.pq_codebooks is not None
+            for query, query_scores in zip(queries, scores):
+                keep = min(len(query_scores), k * self.PQ_RESCORE_FACTOR) if rescore else k
+                top = np.argpartition(-query_scores, keep - 1)[:keep] if keep < len(query_scores) else np.arange(keep)
+                rows = candidates[top] if len(candidates) != self._n_rows else top
+                if rescore:
+                    query_scores = np.asarray(self.vectors[rows]) @ query
+                    top = np.argsort(-query_scores)[:k]
+                    rows = rows[top]
+                else:
+                    order = np.argsort(-query_scores[top])
+                    top, rows = top[order], rows[order]
+                records = self._fetch_rows(rows)
+                # Rows deleted by a commit whose alive flags aren't cleared yet have no record
+                present = np.array([r in records for r in rows.tolist()], dtype=np.bool_)
+                top, rows = top[present], rows[present]
+
+                result['ids'].append([records[r][0] for r in rows])
+                result['documents'].append([records[r][1] for r in rows] if 'documents' in include else None)
+                result['metadatas'].append([records[r][2] for r in rows] if 'metadatas' in include else None)
+                result['distances'].append([float(1 - s) for s in query_scores[top]])
+            return result
+
+    def _fetch_rows(self, rows) -> Dict[int, tuple]:
+        """row -> (id, document, metadata) from the side table"""
+        rows = [int(r) for r in rows]
+        records = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            for row, id_, document, metadata in self._db.execute(
+                    f"SELECT row, id, document, metadata FROM rows WHERE row IN ({','.join('?' * len(batch))})",
+                    batch):
+                records[row] = (id_, document, json.loads(metadata) if metadata else {})
+        return records
+
+    def get(self, ids: List[str] = None, where: Dict = None, limit: int = None,
+            offset: int = None, include: List[str] = None) -> Dict:
+        """Fetch rows by id and/or filter, in insertion order"""
+        include = ['documents', 'metadatas'] if include is None else include
+
+        with self._lock:
+            self._sync()
+            if ids is None:
+                rows = np.flatnonzero(self._where_mask(where))
+            else:
+                # Only the requested rows are checked, not the whole alive column
+                rows = np.array(sorted(self._rows_of_ids(ids)), dtype=np.int64)
+                # Another process may have appended rows this one hasn't synced yet
+                rows = rows[rows < self._n_rows]
+                keep = np.asarray(self.alive[rows], dtype=np.bool_)
+                if where:
+                    keep &= self._where_mask(where)[rows]
+                rows = rows[keep]
+
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+
+            records = self._fetch_rows(rows)
+            rows = np.array([r for r in rows.tolist() if r in records], dtype=np.int64)
+            return {
+                'ids': [records[r][0] for r in rows],
+                'documents': [records[r][1] for r in rows] if 'documents' in include else None,
+                'metadatas': [records[r][2] for r in rows] if 'metadatas' in include else None,
+                'embeddings': self._dequantize(rows) if 'embeddings' in include else None,
+            }
+
+    def delete(self, ids: List[str] = None, where: Dict = None) -> None:
+        """Tombstone rows by id and/or filter"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                deleted = []
+                if ids is not None:
+                    deleted += self._tombstone_ids(ids)
+                if where:
+                    deleted += self._tombstone_rows(np.flatnonzero(self._where_mask(where)).tolist())
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._clear_alive(deleted)
+
+    def count(self) -> int:
+        """Number of live rows"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def reset(self) -> None:
+        """Drop every row and start an empty index"""
+        with self._lock:
+            self._db.executescript("""
+                DELETE FROM rows; DELETE FROM codes;
+                UPDATE meta SET value = 0 WHERE name IN ('n_rows', 'capacity', 'pq_trained');
+                UPDATE meta SET value = value + 1 WHERE name = 'generation';
+            """)
+            names = ["vectors.f32", "vectors.f16", "vectors.i8", "scales.f32", "pq_codes.u8", "alive.u8",
+                     "pq_codebooks.npy"] + [f"{f}.i32" for f in self.FILTER_FIELDS]
+            for name in names:
+                path = os.path.join(self.directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._sync()
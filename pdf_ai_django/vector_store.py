@@ -1,155 +1,945 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict
+from typing import List, Dict, Optional
+import hashlib
+import json
 import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
+
+from tracing import traced
+
+
+class _IndexVersion:
+    """
+    The open state of one index version: its collections, source catalog and lexical index,
+    and the vector storage settings its collections are created with
+
+    Never changed once published (clear_collection publishes a replacement), so a
+    query that takes one snapshot never mixes two versions.
+    """
+
+    def __init__(self, name: str, collection, catalog, lexical, quantization: str, hnsw: Dict):
+        self.name = name
+        self.collection = collection
+        self.catalog = catalog
+        self.lexical = lexical
+        self.quantization = quantization
+        self.hnsw = hnsw
+        self.shards = {}  # shard key -> collection, opened on first use
+
 
 class VectorStore:
     """Manage vector database for document chunks"""
 
+    BACKENDS = ("chroma", "numpy")
+    SHARDING = ("none", "user", "hash")
+    MAIN_SHARD = "main"  # shard key of the main collection (shard_key=None means "route or scatter")
+    UPSERT_BATCH_SIZE = 1000
+    # Chroma's own HNSW defaults; benchmarks/bench_hnsw.py measures other settings on your corpus
+    HNSW_DEFAULTS = {'M': 16, 'construction_ef': 100, 'search_ef': 10}
+
     def __init__(self, collection_name: str = "pdf_documents",
-                 persist_directory: str = "./chroma_db"):
+                 persist_directory: str = "./chroma_db", backend: str = "chroma",
+                 sharding: str = "none", num_shards: int = 8, query_workers: int = 4,
+                 version: str = None, quantization: str = "float32", hnsw: Dict = None):
         """
-        Initialize ChromaDB vector store
+        Initialize the vector store
         Args:
             collection_name: Name of the collection
             persist_directory: Where to save the database
+            backend: 'chroma' (ChromaDB HNSW index) or 'numpy' (in-process exact search,
+                     see vector_backends.NumpyCollection - fastest for small and medium corpora)
+            sharding: How documents are split into shard collections:
+                      'none' (one collection), 'user' (one shard per uploader) or
+                      'hash' (num_shards shards picked by content hash)
+            num_shards: Shard count for 'hash' sharding
+            query_workers: Threads used to query several shards in parallel
+            version: Pin the store to one index version (e.g. one being built by re-indexing).
+                     By default the store follows the active version of the index manifest.
+            quantization: Vector storage of new collections ('numpy' backend only):
+                          'float32', 'float16', 'int8' or 'pq' (see vector_backends.NumpyCollection).
+                          Existing collections keep the storage they were created with.
+            hnsw: HNSW parameters of new collections ('chroma' backend only), any of
+                  'M' (graph links per node), 'construction_ef' (build-time candidate list)
+                  and 'search_ef' (query-time candidate list); missing ones use HNSW_DEFAULTS.
+                  Existing collections keep the parameters they were created with.
         """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown vector backend: {backend} (choose from {', '.join(self.BACKENDS)})")
+        if sharding not in self.SHARDING:
+            raise ValueError(f"Unknown sharding: {sharding} (choose from {', '.join(self.SHARDING)})")
+        if quantization != "float32" and backend != "numpy":
+            raise ValueError("Vector quantization needs the numpy backend (Chroma stores float32 vectors)")
+        unknown = set(hnsw or {}) - set(self.HNSW_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown HNSW parameter(s): {', '.join(sorted(unknown))} "
+                             f"(choose from {', '.join(self.HNSW_DEFAULTS)})")
+
         self.persist_directory = persist_directory
         self.collection_name = collection_name
+        self.backend = backend
+        self.sharding = sharding
+        self.num_shards = num_shards
+        self.query_workers = query_workers
+        # Storage of versions the manifest has no settings for (each version keeps its own)
+        self._default_quantization = quantization
+        self._default_hnsw = dict(self.HNSW_DEFAULTS, **(hnsw or {}))
 
         # Create directory if it doesn't exist
         os.makedirs(persist_directory, exist_ok=True)
 
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.client = None
+        self._state = None
+        self._shards_lock = threading.Lock()
+        self._executor = None
+
+        # Changes whenever documents are added or deleted (shared by all processes via a file)
+        self._version_path = os.path.join(persist_directory, f"{collection_name}.version")
+        if not os.path.exists(self._version_path):
+            self._bump_version()
+
+        # Index versions: the manifest names the version queries use. Re-indexing builds the next
+        # version beside it and switches the manifest atomically (see activate_version).
+        self._manifest_path = os.path.join(persist_directory, f"{collection_name}.index.json")
+        self._manifest_mtime = None
+        self._version_lock = threading.Lock()
+        self.pinned = version is not None
+        if version is None:
+            self._manifest_mtime = self._manifest_stat()
+            version = self._read_manifest().get('active', collection_name)
+        self._open_version(version)
+
+        print(f"Vector store initialized: {self.active_name} ({backend})")
+        print(f"Current documents: {self.collection.count()}")
 
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}  # Use cosine similarity
+    def _open_version(self, name: str) -> None:
+        """
+        Open the collection, catalog and lexical index of one index version and make it current
+        Everything (including catalog or lexical index rebuilds) is done before the
+        version is published, in one assignment, so queries see the old or the new version.
+        """
+        # The collection is the backend: a Chroma collection or a compatible NumpyCollection.
+        # It is also the shard for documents without a shard key (e.g. anonymous uploads).
+        # All collections of a version use the vector storage and HNSW parameters it was built with.
+        config = self._read_manifest().get('versions', {}).get(name) or {}
+        quantization = config.get('vector_quantization', self._default_quantization)
+        # Versions built before the parameters were configurable use Chroma's defaults
+        hnsw = dict(self.HNSW_DEFAULTS, **config.get('hnsw', {})) if config else self._default_hnsw
+        collection = self._open_collection(name, quantization, hnsw)
+
+        # Per-source chunk counts, so listing sources never scans the collection
+        from source_catalog import SourceCatalog
+        catalog = SourceCatalog(os.path.join(self.persist_directory, f"{name}.catalog.sqlite3"))
+        # BM25 inverted index over chunk texts, for lexical and hybrid retrieval
+        from lexical_index import BM25Index
+        lexical = BM25Index(os.path.join(self.persist_directory, f"{name}.bm25.sqlite3"))
+
+        state = _IndexVersion(name, collection, catalog, lexical, quantization, hnsw)
+        if catalog.created and (collection.count() or self.shard_keys(name)):
+            self._rebuild_catalog(state)
+        if lexical.created and (collection.count() or self.shard_keys(name)):
+            self._rebuild_lexical_index(state)
+
+        with self._shards_lock:
+            self._state = state
+
+    def _snapshot(self) -> _IndexVersion:
+        """The current index version (one consistent state for a whole call)"""
+        with self._shards_lock:
+            return self._state
+
+    @property
+    def active_name(self) -> str:
+        return self._snapshot().name
+
+    @property
+    def collection(self):
+        return self._snapshot().collection
+
+    @property
+    def catalog(self):
+        return self._snapshot().catalog
+
+    @property
+    def lexical(self):
+        return self._snapshot().lexical
+
+    @property
+    def quantization(self) -> str:
+        return self._snapshot().quantization
+
+    @property
+    def hnsw(self) -> Dict:
+        return self._snapshot().hnsw
+
+    def _open_collection(self, name: str, quantization: str, hnsw: Dict):
+        """Open (or create) a collection for the configured backend"""
+        if self.backend == "numpy":
+            from vector_backends import NumpyCollection
+            return NumpyCollection(os.path.join(self.persist_directory, f"{name}.npindex"),
+                                   quantization=quantization)
+
+        # Initialize ChromaDB client (imported here so importing this module stays cheap)
+        import chromadb
+        if self.client is None:
+            self.client = chromadb.PersistentClient(path=self.persist_directory)
+
+        return self.client.get_or_create_collection(
+            name=name,
+            metadata=self.hnsw_metadata(hnsw)
         )
 
-        print(f"Vector store initialized: {collection_name}")
-        print(f"Current documents: {self.collection.count()}")
+    @staticmethod
+    def hnsw_metadata(hnsw: Dict) -> Dict:
+        """Chroma collection metadata for cosine similarity and the given HNSW parameters"""
+        return dict({"hnsw:space": "cosine"}, **{f"hnsw:{name}": value for name, value in hnsw.items()})
+
+    # ---- sharding ----
+
+    @staticmethod
+    def make_shard_key(sharding: str, num_shards: int = 8, owner=None,
+                       content_hash: str = None, pdf_name: str = None) -> Optional[str]:
+        """
+        Shard a document belongs to
+        Args:
+            sharding: 'none', 'user' or 'hash'
+            num_shards: Shard count for 'hash' sharding
+            owner: Uploader id ('user' sharding)
+            content_hash: PDF content hash ('hash' sharding, falls back to pdf_name)
+            pdf_name: Source PDF name
+        Returns:
+            Shard key (MAIN_SHARD for the main collection), or None when not sharding
+        """
+        if sharding == "user":
+            return f"user{owner}" if owner is not None else VectorStore.MAIN_SHARD
+        if sharding == "hash":
+            routing_key = content_hash or pdf_name
+            if not routing_key:
+                return VectorStore.MAIN_SHARD
+            digest = hashlib.sha256(routing_key.encode("utf-8")).digest()
+            return f"h{int.from_bytes(digest[:4], 'big') % num_shards}"
+        return None
+
+    def shard_key_for(self, owner=None, content_hash: str = None, pdf_name: str = None) -> Optional[str]:
+        """Shard key of a document under this store's sharding"""
+        return self.make_shard_key(self.sharding, self.num_shards, owner, content_hash, pdf_name)
+
+    def _shard_collection_name(self, shard_key: Optional[str], version: str = None) -> str:
+        version = version or self.active_name
+        if not shard_key or shard_key == self.MAIN_SHARD:
+            return version
+        return f"{version}__{shard_key}"
+
+    def _catalog_shard(self, shard_key: Optional[str]) -> Optional[str]:
+        """Shard name recorded in the source catalog and lexical index (None for the main collection)"""
+        return None if shard_key == self.MAIN_SHARD else shard_key
+
+    def _collection_names(self) -> List[str]:
+        """Names of every collection in the persist directory (all versions and shards)"""
+        if self.backend == "numpy":
+            return [name[:-len(".npindex")] for name in os.listdir(self.persist_directory)
+                    if name.endswith(".npindex")]
+        # Chroma < 0.6 returns collection objects, newer versions return names
+        return [getattr(c, 'name', c) for c in self.client.list_collections()]
+
+    def shard_keys(self, version: str = None) -> List[str]:
+        """Keys of the shard collections that exist (not including the main collection)"""
+        prefix = f"{version or self.active_name}__"
+        return sorted(name[len(prefix):] for name in self._collection_names() if name.startswith(prefix))
+
+    def get_shard(self, shard_key: Optional[str] = None, state: _IndexVersion = None):
+        """
+        Collection of a shard, created on first use (None or MAIN_SHARD = main collection)
+        Args:
+            state: Index version snapshot to use (default: the current version)
+        """
+        state = state or self._snapshot()
+        if not shard_key or shard_key == self.MAIN_SHARD:
+            return state.collection
+        with self._shards_lock:
+            collection = state.shards.get(shard_key)
+            if collection is None:
+                collection = self._open_collection(self._shard_collection_name(shard_key, state.name),
+                                                   state.quantization, state.hnsw)
+                state.shards[shard_key] = collection
+            return collection
+
+    def _target_shards(self, state: _IndexVersion, shard_key: Optional[str] = None,
+                       content_hash: str = None) -> List[Optional[str]]:
+        """
+        Shards an operation has to touch: the given shard, the shard a content hash
+        routes to, or (scatter) the main collection plus every existing shard
+        """
+        if self.sharding == "none" or shard_key == self.MAIN_SHARD:
+            return [None]
+        if shard_key:
+            return [shard_key] if shard_key in state.shards or shard_key in self.shard_keys(state.name) else []
+        if self.sharding == "hash" and content_hash:
+            routed = self.shard_key_for(content_hash=content_hash)
+            return [routed] if routed in state.shards or routed in self.shard_keys(state.name) else []
+        return [None] + self.shard_keys(state.name)
+
+    def _scatter(self, state: _IndexVersion, shard_keys: List[Optional[str]], operation) -> List:
+        """Run operation(collection) on each shard of one index version, in parallel when there are several"""
+        collections = [self.get_shard(key, state) for key in shard_keys]
+        if len(collections) <= 1:
+            return [operation(collection) for collection in collections]
+
+        if self._executor is None:
+            with self._shards_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.query_workers,
+                                                        thread_name_prefix="shard-query")
+        return list(self._executor.map(operation, collections))
+
+    def _bump_version(self) -> None:
+        """Record that the collection contents changed (atomic file replace)"""
+        tmp_path = f"{self._version_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp_path, self._version_path)
+
+    def get_version(self) -> str:
+        """
+        Current collection version - changes on every add/delete,
+        including ones made by other processes (e.g. ingestion workers)
+        """
+        try:
+            with open(self._version_path) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return "0"
+
+    # ---- index versions ----
 
-    def add_documents(self, chunks: List[Dict], pdf_name: str) -> None:
+    def _manifest_stat(self) -> Optional[int]:
+        try:
+            return os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_manifest(self) -> Dict:
+        """
+        Index manifest: {'active': version name, 'previous': version name,
+        'versions': {name: pipeline config}, 'building': name or None}
+        """
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        """Replace the manifest atomically (readers see the old or the new file, never a mix)"""
+        tmp_path = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _sync_version(self) -> _IndexVersion:
+        """
+        Follow a version switch made by another process (costs one stat() per call)
+        Returns:
+            Snapshot of the current index version, for the caller to use throughout
+        """
+        if self.pinned:
+            return self._snapshot()
+        mtime = self._manifest_stat()
+        if mtime == self._manifest_mtime:
+            return self._snapshot()
+        with self._version_lock:
+            if mtime != self._manifest_mtime:
+                active = self._read_manifest().get('active', self.collection_name)
+                if active != self.active_name:
+                    self._open_version(active)
+                    print(f"Vector store switched to index version {active}")
+                self._manifest_mtime = mtime
+        return self._snapshot()
+
+    def index_config(self, version: str = None) -> Optional[Dict]:
+        """Pipeline config (chunking, embedding model) an index version was built with (None = unknown)"""
+        state = self._sync_version()
+        return self._read_manifest().get('versions', {}).get(version or state.name)
+
+    def set_index_config(self, config: Dict, version: str = None) -> None:
+        """Record the pipeline config of an index version"""
+        manifest = self._read_manifest()
+        manifest.setdefault('active', self.collection_name)
+        manifest.setdefault('versions', {})[version or self.active_name] = config
+        self._write_manifest(manifest)
+
+    def list_versions(self) -> List[str]:
+        """Index versions that exist on disk, oldest first"""
+        pattern = re.compile(rf"^{re.escape(self.collection_name)}(_v\d+)?$")
+        names = {name.split("__", 1)[0] for name in self._collection_names()}
+        return sorted((name for name in names if pattern.match(name)), key=self._version_number)
+
+    def _version_number(self, name: str) -> int:
+        suffix = name[len(self.collection_name):]
+        return int(suffix[2:]) if suffix.startswith("_v") else 0
+
+    def create_version(self, config: Dict) -> 'VectorStore':
+        """
+        Start building a new index version next to the active one
+        An unfinished build with the same config is resumed instead of starting over.
+        Args:
+            config: Pipeline config the version is built with
+        Returns:
+            VectorStore pinned to the new version (queries keep using the active one)
+        """
+        manifest = self._read_manifest()
+        building = manifest.get('building')
+        if not (building and manifest.get('versions', {}).get(building) == config):
+            numbers = [self._version_number(name) for name in self.list_versions()]
+            numbers.append(self._version_number(manifest.get('active', self.collection_name)))
+            building = f"{self.collection_name}_v{max(numbers) + 1}"
+            manifest.setdefault('active', self.collection_name)
+            manifest.setdefault('versions', {})[building] = config
+            manifest['building'] = building
+            self._write_manifest(manifest)
+
+        return VectorStore(self.collection_name, self.persist_directory, self.backend, self.sharding,
+                           self.num_shards, self.query_workers, version=building,
+                           quantization=config.get('vector_quantization', self._default_quantization),
+                           hnsw=config.get('hnsw', self._default_hnsw))
+
+    def activate_version(self, version: str) -> None:
+        """
+        Atomically make a version the one every query uses (in every process)
+        Args:
+            version: Name of a built version
+        """
+        manifest = self._read_manifest()
+        previous = manifest.get('active', self.collection_name)
+        manifest.update(active=version, previous=previous, activated_at=time.time())
+        if manifest.get('building') == version:
+            manifest['building'] = None
+        self._write_manifest(manifest)
+        self._bump_version()
+        self._sync_version()
+        print(f"Activated index version {version} (previous: {previous})")
+
+    def drop_version(self, version: str) -> None:
+        """Delete an inactive index version with its shards, catalog and lexical index"""
+        manifest = self._read_manifest()
+        if version == manifest.get('active', self.collection_name):
+            raise ValueError(f"Cannot drop the active index version: {version}")
+
+        for shard_key in [None] + self.shard_keys(version):
+            name = self._shard_collection_name(shard_key, version)
+            if self.backend == "numpy":
+                shutil.rmtree(os.path.join(self.persist_directory, f"{name}.npindex"), ignore_errors=True)
+            else:
+                self.client.delete_collection(name)
+        for suffix in (".catalog.sqlite3", ".bm25.sqlite3"):
+            path = os.path.join(self.persist_directory, f"{version}{suffix}")
+            for side_file in (path, f"{path}-journal", f"{path}-wal", f"{path}-shm"):
+                if os.path.exists(side_file):
+                    os.remove(side_file)
+
+        manifest.get('versions', {}).pop(version, None)
+        if manifest.get('building') == version:
+            manifest['building'] = None
+        if manifest.get('previous') == version:
+            manifest['previous'] = None
+        self._write_manifest(manifest)
+        print(f"Dropped index version {version}")
+
+    # ---- documents ----
+
+    @traced('store')
+    def add_documents(self, chunks: List[Dict], pdf_name: str, content_hash: str = None,
+                      batch_size: int = None, progress_callback=None, shard_key: str = None) -> Dict:
         """
-        Add document chunks to the vector store
+        Add document chunks to the vector store in fixed-size upsert batches
         Args:
             chunks: List of chunk dicts with 'text' and 'embedding' fields
             pdf_name: Name of the source PDF
+            content_hash: Optional SHA-256 of the PDF bytes. Chunk IDs are keyed on it
+                          so they stay stable and identical files share their vectors.
+            batch_size: Chunks per write (default UPSERT_BATCH_SIZE, capped at the backend maximum)
+            progress_callback: Optional callable(fraction) called after each batch
+            shard_key: Shard to write to (default: routed by content hash under 'hash'
+                       sharding, otherwise the main collection)
+        Returns:
+            Dict with chunks, seconds and chunks_per_sec
         """
+        state = self._sync_version()
         if not chunks:
             print("No chunks to add")
-            return
+            return {'chunks': 0, 'seconds': 0.0, 'chunks_per_sec': 0.0}
 
-        # Prepare data for ChromaDB
-        ids = []
-        embeddings = []
-        documents = []
-        metadatas = []
+        if shard_key is None:
+            shard_key = self.shard_key_for(content_hash=content_hash, pdf_name=pdf_name)
+        collection = self.get_shard(shard_key, state)
 
+        batch_size = min(batch_size or self.UPSERT_BATCH_SIZE, self._max_batch_size())
         timestamp = datetime.now().isoformat()
+        start_time = time.perf_counter()
+
+        # Chunk IDs are deterministic, so upsert makes a retried (or crashed) ingestion safe to re-run
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+
+            ids = [f"{content_hash or pdf_name}_{chunk['chunk_id']}" for chunk in batch]
+            # One float32 array per batch; no per-vector Python lists
+            embeddings = np.stack([chunk['embedding'] for chunk in batch]).astype(np.float32, copy=False)
+            documents = [chunk['text'] for chunk in batch]
+
+            metadatas = []
+            for chunk in batch:
+                metadata = {
+                    'source': pdf_name,
+                    'chunk_id': chunk['chunk_id'],
+                    'uploaded_at': timestamp
+                }
+                if content_hash:
+                    metadata['content_hash'] = content_hash
+                if 'page_start' in chunk:
+                    metadata['page_start'] = chunk['page_start']
+                    metadata['page_end'] = chunk['page_end']
+                metadatas.append(metadata)
+
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas
+            )
+            state.lexical.add(ids, documents, metadatas, shard=self._catalog_shard(shard_key))
+
+            if progress_callback:
+                progress_callback(min(start + batch_size, len(chunks)) / len(chunks))
+
+        elapsed = time.perf_counter() - start_time
+        state.catalog.record_add(pdf_name, len(chunks), content_hash, shard=self._catalog_shard(shard_key))
+        self._bump_version()
+
+        chunks_per_sec = len(chunks) / elapsed if elapsed else float('inf')
+        print(f"Added {len(chunks)} chunks from {pdf_name} ({chunks_per_sec:.0f} chunks/sec)")
+        return {'chunks': len(chunks), 'seconds': elapsed, 'chunks_per_sec': chunks_per_sec}
+
+    def _max_batch_size(self) -> int:
+        """Largest single write the backend accepts"""
+        if self.client is not None:
+            if hasattr(self.client, 'get_max_batch_size'):
+                return self.client.get_max_batch_size()
+            return self.client.max_batch_size
+        return self.UPSERT_BATCH_SIZE * 100
+
+    @staticmethod
+    def build_where(filter_source: str = None, filter_content_hash: str = None) -> Dict:
+        """
+        Build a ChromaDB metadata filter
+        Args:
+            filter_source: Optional filter by source PDF name
+            filter_content_hash: Optional filter by PDF content hash (takes precedence)
+        Returns:
+            Where dict or None for no filtering
+        """
+        if filter_content_hash:
+            return {"content_hash": filter_content_hash}
+        if filter_source:
+            return {"source": filter_source}
+        return None
 
-        for chunk in chunks:
-            # Create unique ID
-            chunk_id = f"{pdf_name}_{chunk['chunk_id']}"
-            ids.append(chunk_id)
-
-            # Extract embedding
-            embeddings.append(chunk['embedding'].tolist())
-
-            # Store text
-            documents.append(chunk['text'])
-
-            # Store metadata
-            metadata = {
-                'source': pdf_name,
-                'chunk_id': chunk['chunk_id'],
-                'uploaded_at': timestamp
-            }
-            metadatas.append(metadata)
-
-        # Add to ChromaDB
-        self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas
-        )
-
-        print(f"Added {len(chunks)} chunks from {pdf_name}")
-
+    @traced('retrieve')
     def search(self, query_embedding: List[float], top_k: int = 5,
-               filter_source: str = None) -> Dict:
+               filter_source: str = None, filter_content_hash: str = None,
+               shard_key: str = None) -> Dict:
         """
         Search for similar documents
         Args:
             query_embedding: Query vector
             top_k: Number of results to return
             filter_source: Optional filter by source PDF name
+            filter_content_hash: Optional filter by PDF content hash
+            shard_key: Optional shard to search (otherwise routed, or all shards in parallel)
         Returns:
             Dict with ids, documents, distances, and metadatas
         """
-        where_filter = None
-        if filter_source:
-            where_filter = {"source": filter_source}
+        return self._search(self._sync_version(), query_embedding, top_k, filter_source,
+                            filter_content_hash, shard_key)
+
+    def _search(self, state: _IndexVersion, query_embedding: List[float], top_k: int,
+                filter_source: str, filter_content_hash: str, shard_key: str) -> Dict:
+        where = self.build_where(filter_source, filter_content_hash)
+        shard_keys = self._target_shards(state, shard_key, filter_content_hash)
 
-        results = self.collection.query(
+        results = self._scatter(state, shard_keys, lambda collection: collection.query(
             query_embeddings=[query_embedding],
             n_results=top_k,
-            where=where_filter
-        )
+            where=where
+        ))
 
-        return results
+        if len(results) == 1:
+            return results[0]
+        return self._merge_results(results, top_k)
 
-    def delete_by_source(self, pdf_name: str) -> None:
+    @traced('retrieve')
+    def search_batch(self, query_embeddings: List[List[float]], top_k: int = 5,
+                     filter_source: str = None, filter_content_hash: str = None,
+                     shard_key: str = None) -> List[Dict]:
+        """
+        Search for several query vectors at once (one multi-query call per shard)
+        Args:
+            query_embeddings: Query vectors
+            top_k, filter_source, filter_content_hash, shard_key: Same as search()
+        Returns:
+            One search() result dict per query, in query order
+        """
+        return self._search_batch(self._sync_version(), query_embeddings, top_k, filter_source,
+                                  filter_content_hash, shard_key)
+
+    def _search_batch(self, state: _IndexVersion, query_embeddings: List[List[float]], top_k: int,
+                      filter_source: str, filter_content_hash: str, shard_key: str) -> List[Dict]:
+        if not len(query_embeddings):
+            return []
+        where = self.build_where(filter_source, filter_content_hash)
+        shard_keys = self._target_shards(state, shard_key, filter_content_hash)
+
+        results = self._scatter(state, shard_keys, lambda collection: collection.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            where=where
+        ))
+
+        # Split each shard's multi-query result into per-query results
+        per_query = []
+        for i in range(len(query_embeddings)):
+            shard_results = [{
+                key: [result[key][i]] if result[key] else []
+                for key in ('ids', 'documents', 'metadatas', 'distances')
+            } for result in results]
+            if len(shard_results) == 1:
+                per_query.append(shard_results[0])
+            else:
+                per_query.append(self._merge_results(shard_results, top_k))
+        return per_query
+
+    @staticmethod
+    def _merge_results(results: List[Dict], top_k: int) -> Dict:
+        """Merge per-shard query results into one global top-k (smallest distances)"""
+        rows = []
+        for result in results:
+            if result['ids'] and result['ids'][0]:
+                rows.extend(zip(result['distances'][0], result['ids'][0],
+                                result['documents'][0], result['metadatas'][0]))
+        rows.sort(key=lambda row: row[0])
+        rows = rows[:top_k]
+
+        return {
+            'ids': [[row[1] for row in rows]],
+            'documents': [[row[2] for row in rows]],
+            'metadatas': [[row[3] for row in rows]],
+            'distances': [[row[0] for row in rows]],
+        }
+
+    @traced('retrieve')
+    def lexical_search(self, query_text: str, top_k: int = 5, filter_source: str = None,
+                       filter_content_hash: str = None, shard_key: str = None) -> List[tuple]:
+        """
+        BM25 keyword search (exact terms, codes and numbers)
+        Args:
+            query_text: Query text
+            top_k: Number of results to return
+            filter_source: Optional filter by source PDF name
+            filter_content_hash: Optional filter by PDF content hash
+            shard_key: Optional shard to search (default: all shards)
+        Returns:
+            List of (chunk id, BM25 score, shard key or None), best first
+        """
+        return self._lexical_search(self._sync_version(), query_text, top_k, filter_source,
+                                    filter_content_hash, shard_key)
+
+    def _lexical_search(self, state: _IndexVersion, query_text: str, top_k: int, filter_source: str,
+                        filter_content_hash: str, shard_key: str) -> List[tuple]:
+        if shard_key is None or self.sharding == "none":
+            shard = None
+        else:
+            shard = self._catalog_shard(shard_key) or ''
+        return state.lexical.search(query_text, top_k, source=filter_source,
+                                    content_hash=filter_content_hash, shard=shard)
+
+    @traced('retrieve')
+    def hybrid_search(self, query_text: str, query_embedding: List[float], top_k: int = 5,
+                      filter_source: str = None, filter_content_hash: str = None,
+                      shard_key: str = None, candidates: int = 20, rrf_k: int = 60) -> Dict:
+        """
+        Dense + BM25 search fused with reciprocal rank fusion
+        Args:
+            query_text: Query text (for BM25)
+            query_embedding: Query vector (for dense search)
+            top_k: Number of fused results to return
+            filter_source, filter_content_hash, shard_key: Same as search()
+            candidates: Results taken from each ranking before fusion
+            rrf_k: Reciprocal rank fusion constant
+        Returns:
+            Dict with ids, documents, distances and metadatas (like search),
+            plus 'fused_scores'
+        """
+        # Both rankings and the lookup of lexical-only hits use the same index version
+        state = self._sync_version()
+        candidates = max(candidates, top_k)
+        dense = self._search(state, query_embedding, candidates, filter_source, filter_content_hash, shard_key)
+        lexical = self._lexical_search(state, query_text, candidates, filter_source, filter_content_hash, shard_key)
+        return self._fuse(state, query_embedding, dense, lexical, top_k, rrf_k)
+
+    @traced('retrieve')
+    def hybrid_search_batch(self, query_texts: List[str], query_embeddings: List[List[float]],
+                            top_k: int = 5, filter_source: str = None, filter_content_hash: str = None,
+                            shard_key: str = None, candidates: int = 20, rrf_k: int = 60) -> List[Dict]:
+        """
+        hybrid_search for several queries, with the dense half done by one search_batch call
+        Returns:
+            One hybrid_search() result dict per query, in query order
+        """
+        state = self._sync_version()
+        candidates = max(candidates, top_k)
+        dense_results = self._search_batch(state, query_embeddings, candidates, filter_source,
+                                           filter_content_hash, shard_key)
+        return [
+            self._fuse(state, query_embedding, dense,
+                       self._lexical_search(state, query_text, candidates, filter_source,
+                                            filter_content_hash, shard_key),
+                       top_k, rrf_k)
+            for query_text, query_embedding, dense in zip(query_texts, query_embeddings, dense_results)
+        ]
+
+    def _fuse(self, state: _IndexVersion, query_embedding: List[float], dense: Dict, lexical: List[tuple],
+              top_k: int, rrf_k: int) -> Dict:
+        """Fuse a dense result and a lexical ranking (reciprocal rank fusion) into a search() result"""
+        from lexical_index import reciprocal_rank_fusion
+
+        dense_ids = dense['ids'][0] if dense['ids'] else []
+        # A PDF stored in several shards has the same chunk IDs (and texts) in each: rank its best hit once
+        lexical_shards = {}
+        for chunk_id, _, shard in lexical:
+            lexical_shards.setdefault(chunk_id, shard)
+        fused = reciprocal_rank_fusion([dense_ids, list(lexical_shards)], k=rrf_k)[:top_k]
+
+        # Dense hits already carry text, metadata and distance
+        rows = {}
+        for i, chunk_id in enumerate(dense_ids):
+            rows[chunk_id] = (dense['documents'][0][i], dense['metadatas'][0][i], dense['distances'][0][i])
+
+        # Lexical-only hits: fetch them from their shard and compute the cosine distance
+        missing = {}
+        for chunk_id, _ in fused:
+            if chunk_id not in rows:
+                missing.setdefault(lexical_shards.get(chunk_id), []).append(chunk_id)
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        for shard, ids in missing.items():
+            found = self.get_shard(shard, state).get(ids=ids, include=['documents', 'metadatas', 'embeddings'])
+            for chunk_id, document, metadata, embedding in zip(
+                    found['ids'], found['documents'], found['metadatas'], found['embeddings']):
+                embedding = np.asarray(embedding, dtype=np.float32)
+                similarity = float(embedding @ query / (np.linalg.norm(embedding) or 1.0))
+                rows[chunk_id] = (document, metadata, 1 - similarity)
+
+        fused = [(chunk_id, score) for chunk_id, score in fused if chunk_id in rows]
+        return {
+            'ids': [[chunk_id for chunk_id, _ in fused]],
+            'documents': [[rows[chunk_id][0] for chunk_id, _ in fused]],
+            'metadatas': [[rows[chunk_id][1] for chunk_id, _ in fused]],
+            'distances': [[rows[chunk_id][2] for chunk_id, _ in fused]],
+            'fused_scores': [[score for _, score in fused]],
+        }
+
+    def get_documents(self, filter_source: str = None, filter_content_hash: str = None,
+                      limit: int = None, shard_key: str = None, include_embeddings: bool = False) -> Dict:
+        """
+        Fetch stored chunks (no similarity search) across the relevant shards
+        Returns:
+            Dict with ids, documents and metadatas (at most limit entries),
+            plus embeddings if include_embeddings is set
+        """
+        state = self._sync_version()
+        where = self.build_where(filter_source, filter_content_hash)
+        include = ['documents', 'metadatas'] + (['embeddings'] if include_embeddings else [])
+        results = self._scatter(state, self._target_shards(state, shard_key, filter_content_hash),
+                                lambda collection: collection.get(where=where, limit=limit, include=include))
+
+        merged = {key: [] for key in ['ids'] + include}
+        for result in results:
+            for key in merged:
+                # Embeddings come back as arrays, which have no truth value
+                if result[key] is not None:
+                    merged[key].extend(result[key])
+        if limit is not None:
+            merged = {key: values[:limit] for key, values in merged.items()}
+        return merged
+
+    def has_content_hash(self, content_hash: str, shard_key: str = None) -> bool:
+        """Check whether chunks for a PDF with this content hash are already stored (in the shard)"""
+        state = self._sync_version()
+        results = self._scatter(state, self._target_shards(state, shard_key, content_hash),
+                                lambda collection: collection.get(
+            where={"content_hash": content_hash},
+            limit=1,
+            include=[]
+        ))
+        return any(result['ids'] for result in results)
+
+    def delete_by_source(self, pdf_name: str, shard_key: str = None) -> None:
         """
         Delete all chunks from a specific PDF
         Args:
             pdf_name: Name of the PDF to remove
+            shard_key: Optional shard holding the PDF (default: every shard)
         """
-        self.collection.delete(
-            where={"source": pdf_name}
-        )
+        state = self._sync_version()
+        for key in self._target_shards(state, shard_key):
+            self.get_shard(key, state).delete(
+                where={"source": pdf_name}
+            )
+            state.catalog.remove_source(pdf_name, shard=key, all_shards=False)
+            state.lexical.delete(source=pdf_name, shard=key or '')
+        self._bump_version()
         print(f"Deleted all chunks from {pdf_name}")
 
+    def delete_by_content_hash(self, content_hash: str, shard_key: str = None) -> None:
+        """
+        Delete all chunks of the PDF with the given content hash
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+            shard_key: Optional shard holding the PDF (default: routed, or every shard)
+        """
+        state = self._sync_version()
+        for key in self._target_shards(state, shard_key, content_hash):
+            self.get_shard(key, state).delete(
+                where={"content_hash": content_hash}
+            )
+            state.catalog.remove_content_hash(content_hash, shard=key, all_shards=False)
+            state.lexical.delete(content_hash=content_hash, shard=key or '')
+        self._bump_version()
+        print(f"Deleted all chunks for content hash {content_hash[:12]}")
+
     def get_all_sources(self) -> List[str]:
-        """Get list of all PDF sources in the database"""
-        results = self.collection.get()
-        if not results['metadatas']:
-            return []
+        """Get list of all PDF sources in the database (from the catalog, no collection scan)"""
+        return self._sync_version().catalog.source_names()
+
+    def list_sources(self, page: int = 1, page_size: int = 100) -> Dict:
+        """
+        Paged listing of stored PDFs with their chunk counts
+        Args:
+            page: 1-based page number
+            page_size: Entries per page
+        Returns:
+            Dict with 'sources' (source, content_hash, chunks, updated_at), 'page', 'page_size' and 'total'
+        """
+        catalog = self._sync_version().catalog
+        page = max(page, 1)
+        return {
+            'sources': catalog.list_sources(offset=(page - 1) * page_size, limit=page_size),
+            'page': page,
+            'page_size': page_size,
+            'total': catalog.count_sources(),
+        }
 
-        sources = set(meta['source'] for meta in results['metadatas'])
-        return list(sources)
+    def rebuild_catalog(self, batch_size: int = 5000) -> int:
+        """
+        Recount chunks per source from every shard (metadata only, in pages)
+        Used once for collections created before the catalog existed.
+        Returns:
+            Number of sources found
+        """
+        return self._rebuild_catalog(self._sync_version(), batch_size)
+
+    def _rebuild_catalog(self, state: _IndexVersion, batch_size: int = 5000) -> int:
+        counts = {}
+        for shard_key in [None] + self.shard_keys(state.name):
+            collection = self.get_shard(shard_key, state)
+            offset = 0
+            while True:
+                results = collection.get(include=['metadatas'], limit=batch_size, offset=offset)
+                metadatas = results['metadatas'] or []
+                for meta in metadatas:
+                    key = (shard_key or '', meta.get('source', ''), meta.get('content_hash', ''))
+                    counts[key] = counts.get(key, 0) + 1
+                if len(metadatas) < batch_size:
+                    break
+                offset += batch_size
+
+        state.catalog.replace_all(counts)
+        print(f"Source catalog rebuilt: {len(counts)} sources")
+        return len(counts)
+
+    def rebuild_lexical_index(self, batch_size: int = 2000) -> int:
+        """
+        Re-index every stored chunk text in the BM25 index (reads in pages)
+        Used once for collections created before the lexical index existed.
+        Returns:
+            Number of chunks indexed
+        """
+        return self._rebuild_lexical_index(self._sync_version(), batch_size)
+
+    def _rebuild_lexical_index(self, state: _IndexVersion, batch_size: int = 2000) -> int:
+        state.lexical.clear()
+        indexed = 0
+        for shard_key in [None] + self.shard_keys(state.name):
+            collection = self.get_shard(shard_key, state)
+            offset = 0
+            while True:
+                results = collection.get(include=['documents', 'metadatas'], limit=batch_size, offset=offset)
+                if results['ids']:
+                    state.lexical.add(results['ids'], results['documents'], results['metadatas'],
+                                      shard=self._catalog_shard(shard_key))
+                    indexed += len(results['ids'])
+                if len(results['ids']) < batch_size:
+                    break
+                offset += batch_size
+
+        print(f"Lexical index rebuilt: {indexed} chunks")
+        return indexed
 
     def clear_collection(self) -> None:
-        """Delete all documents from the collection"""
-        self.client.delete_collection(self.collection_name)
-        self.collection = self.client.create_collection(
-            name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-        print(f"Cleared collection: {self.collection_name}")
+        """Delete all documents from the collection and every shard"""
+        state = self._sync_version()
+        for shard_key in [None] + self.shard_keys(state.name):
+            if self.backend == "numpy":
+                self.get_shard(shard_key, state).reset()
+            else:
+                self.client.delete_collection(self._shard_collection_name(shard_key, state.name))
+        if self.backend == "chroma":
+            # The deleted collections are gone: publish the version with a fresh main collection
+            collection = self._open_collection(state.name, state.quantization, state.hnsw)
+            cleared = _IndexVersion(state.name, collection, state.catalog, state.lexical,
+                                    state.quantization, state.hnsw)
+            with self._shards_lock:
+                if self._state is state:
+                    self._state = cleared
+        state.catalog.clear()
+        state.lexical.clear()
+        self._bump_version()
+        print(f"Cleared collection: {state.name}")
 
     def get_stats(self) -> Dict:
-        """Get statistics about the vector store"""
-        total_docs = self.collection.count()
-        sources = self.get_all_sources()
+        """Get statistics about the vector store (O(number of sources + shards))"""
+        state = self._sync_version()
+        shard_keys = [None] + self.shard_keys(state.name) if self.sharding != "none" else [None]
+        total_docs = sum(self._scatter(state, shard_keys, lambda collection: collection.count()))
+        sources = state.catalog.source_names()
 
         return {
             'total_chunks': total_docs,
             'total_pdfs': len(sources),
+            'shards': len(shard_keys),
+            'quantization': getattr(state.collection, 'quantization', 'float32'),
+            'hnsw': state.hnsw if self.backend == "chroma" else None,
             'sources': sources
         }
 
 
 if __name__ == "__main__":
     # Test the vector store
-    import numpy as np
-
     store = VectorStore()
 
     # Test data